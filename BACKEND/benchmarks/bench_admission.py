@@ -0,0 +1,91 @@
+"""
+Simulate upstream admission control under a noisy user
+
+One user fires --spam-threads back-to-back calls while --users ordinary users
+each make a call every --think-ms ms, all against a stub upstream that takes
+--upstream-ms per call behind utils.admission. Reports, per class of user,
+calls admitted and rejected (rate_limited / busy), the latency of the
+ordinary users' admitted calls, and the cost of one admission check.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_admission --seconds 5
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from collections import Counter
+from utils.admission import AdmissionController, AdmissionRejected, UpstreamLimiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--think-ms", type=float, default=500)
+    parser.add_argument("--spam-threads", type=int, default=16)
+    parser.add_argument("--upstream-ms", type=float, default=200)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--rate-per-minute", type=float, default=30)
+    parser.add_argument("--burst", type=int, default=10)
+    args = parser.parse_args()
+
+    controller = AdmissionController([
+        UpstreamLimiter("llm", args.max_concurrency, args.rate_per_minute, args.burst)
+    ])
+    outcomes = {"spammer": Counter(), "users": Counter()}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def call(kind, user_id):
+        start = time.perf_counter()
+        try:
+            with controller.limit("llm", user_id):
+                time.sleep(args.upstream_ms / 1000)
+            outcome = "admitted"
+        except AdmissionRejected as e:
+            outcome = e.reason
+        with lock:
+            outcomes[kind][outcome] += 1
+            if kind == "users" and outcome == "admitted":
+                latencies.append((time.perf_counter() - start) * 1000)
+        return outcome
+
+    def spammer():
+        while time.monotonic() < deadline:
+            if call("spammer", "spammer") != "admitted":
+                time.sleep(0.001)
+
+    def user(i):
+        while time.monotonic() < deadline:
+            call("users", f"user-{i}")
+            time.sleep(args.think_ms / 1000)
+
+    threads = [threading.Thread(target=spammer) for _ in range(args.spam_threads)]
+    threads += [threading.Thread(target=user, args=(i,)) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{'caller':<10}{'admitted':>10}{'rate_limited':>14}{'busy':>8}")
+    for kind, counts in outcomes.items():
+        print(f"{kind:<10}{counts['admitted']:>10}{counts['rate_limited']:>14}{counts['busy']:>8}")
+    if latencies:
+        print(f"ordinary users: p50 {statistics.median(latencies):.0f} ms, max {max(latencies):.0f} ms "
+              f"(upstream {args.upstream_ms:.0f} ms)")
+    print(f"stats: {controller.stats()}")
+
+    limiter = UpstreamLimiter("bench", 10 ** 9, 10 ** 9, 10 ** 9)
+    n = 200000
+    start = time.perf_counter()
+    for i in range(n):
+        limiter.acquire(f"user-{i % 1000}")
+        limiter.release()
+    print(f"admission check: {(time.perf_counter() - start) / n * 1e6:.2f} us per call")
+
+
+if __name__ == "__main__":
+    main()
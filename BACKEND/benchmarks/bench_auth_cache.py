@@ -0,0 +1,82 @@
+"""
+Microbenchmark per-request auth overhead with and without caching
+
+Measures, per call:
+  - token:   get_current_user with the verified-token cache disabled (a JWT
+             verify and JSON parse every time) and enabled
+  - profile: the user lookup behind /me and /profile, get_user_by_email (a
+             Mongo round trip every time) vs get_user_by_id (short-TTL cache)
+Also checks that update_user_profile invalidates the cached profile.
+
+Uses MONGODB_URI (scratch database, dropped afterwards) or, with --in-memory,
+mongomock-motor (no network, so the profile saving is understated).
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_auth_cache --in-memory
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from fastapi.security import HTTPAuthorizationCredentials
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.database import Database
+from config.settings import settings
+from services.db_service import db_service
+from utils.auth import create_access_token, get_current_user, token_cache
+
+
+async def per_call_us(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        await func()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="voxAI_bench")
+    args = parser.parse_args()
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = AsyncIOMotorClient(settings.MONGODB_URI)
+    Database.db = client[args.database]
+
+    try:
+        user = await db_service.create_user_with_hash({
+            "email": "bench@example.com",
+            "password_hash": "x",
+            "name": "Bench",
+        })
+        token = create_access_token(data={"sub": user["id"], "email": user["email"]})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+        size = token_cache.max_size
+        token_cache.max_size = 0
+        token_cache.clear()
+        uncached = await per_call_us(lambda: get_current_user(credentials), args.calls)
+        token_cache.max_size = size
+        cached = await per_call_us(lambda: get_current_user(credentials), args.calls)
+        print(f"token    uncached {uncached:8.1f} us   cached {cached:8.1f} us   ({uncached / cached:.0f}x)")
+
+        by_email = await per_call_us(lambda: db_service.get_user_by_email(user["email"]), args.calls)
+        by_id = await per_call_us(lambda: db_service.get_user_by_id(user["id"]), args.calls)
+        print(f"profile  by email {by_email:8.1f} us   by id   {by_id:8.1f} us   ({by_email / by_id:.0f}x)")
+
+        await db_service.update_user_profile(user["email"], {"name": "Renamed", "updated": datetime.utcnow()})
+        name = (await db_service.get_user_by_id(user["id"]))["name"]
+        print(f"profile after update: {name!r} ({'ok' if name == 'Renamed' else 'STALE'})")
+        print(f"token cache: {token_cache.stats()}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Benchmark chat history page fetches as a chat grows to 100k messages
+
+Grows one chat in steps and, at each size, times:
+  - load-all:   the previous behaviour, every message in one list
+  - first page: ChatService.get_chat_messages without a cursor
+  - deep page:  a page fetched with a cursor from the end of the history
+and reports documents examined by the deep-page query (via explain), which
+should stay at page size + 1 regardless of history size.
+
+Runs against MONGODB_URI in a scratch database that is dropped afterwards.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_chat_pagination --sizes 1000,10000,100000
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.settings import settings
+from services.chat_service import ChatService, decode_cursor, encode_cursor
+
+
+async def timed(coro_factory, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await coro_factory()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--page-size", type=int, default=settings.MESSAGE_PAGE_SIZE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", default="voxAI_bench")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.MONGODB_URI)
+    database = client[args.database]
+    await database.messages.create_index([("chat_id", 1), ("timestamp", 1), ("_id", 1)])
+    chat_service = ChatService(database)
+    chat_id = "bench-chat"
+    base = datetime(2024, 1, 1)
+    inserted = 0
+
+    print(f"{'messages':>10}{'load-all ms':>13}{'first page ms':>15}{'deep page ms':>14}{'docs examined':>15}")
+    try:
+        for size in (int(s) for s in args.sizes.split(",")):
+            batch = [
+                {
+                    "chat_id": chat_id,
+                    "role": "user" if i % 2 == 0 else "assistant",
+                    "content": f"Message number {i} in a long voice session.",
+                    "timestamp": base + timedelta(milliseconds=i)
+                }
+                for i in range(inserted, size)
+            ]
+            for start in range(0, len(batch), 10000):
+                await database.messages.insert_many(batch[start:start + 10000])
+            inserted = size
+
+            # Cursor pointing one page before the end of the history
+            anchor = await database.messages.find({"chat_id": chat_id}).sort(
+                [("timestamp", 1), ("_id", 1)]).skip(max(size - args.page_size - 1, 0)).limit(1).to_list(1)
+            deep_cursor = encode_cursor(anchor[0]["timestamp"], anchor[0]["_id"])
+
+            load_all = await timed(
+                lambda: database.messages.find({"chat_id": chat_id}).sort("timestamp", 1).to_list(None),
+                args.repeat
+            )
+            first = await timed(lambda: chat_service.get_chat_messages(chat_id, limit=args.page_size), args.repeat)
+            deep = await timed(
+                lambda: chat_service.get_chat_messages(chat_id, limit=args.page_size, cursor=deep_cursor),
+                args.repeat
+            )
+
+            timestamp, last_id = decode_cursor(deep_cursor)
+            plan = await database.messages.find({
+                "chat_id": chat_id,
+                "$or": [{"timestamp": {"$gt": timestamp}}, {"timestamp": timestamp, "_id": {"$gt": last_id}}]
+            }).sort([("timestamp", 1), ("_id", 1)]).limit(args.page_size + 1).explain()
+            examined = plan.get("executionStats", {}).get("totalDocsExamined", "n/a")
+
+            print(f"{size:>10}{load_all:>13.1f}{first:>15.2f}{deep:>14.2f}{examined:>15}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
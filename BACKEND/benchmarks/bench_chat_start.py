@@ -0,0 +1,175 @@
+"""
+Benchmark /chat/start end-to-end latency against a stub LLM
+
+The stub LLM sleeps --title-ms for the title completion and --answer-ms for
+the answer. Compares:
+  - sequential: the previous flow, title generated before the chat is created,
+                then the answer (title + answer)
+  - concurrent: POST /api/v1/chat/start, title generated alongside the answer
+                (max(title, answer))
+  - streaming:  POST /api/v1/chat/start/stream, time to the chat event, to the
+                first answer token (the stub streams --answer-ms spread over
+                --stream-chunks chunks) and to [DONE]; fails if the first
+                token takes longer than one chunk plus --ttft-slack-ms
+
+Uses MONGODB_URI (scratch database, dropped afterwards) or, with --in-memory,
+mongomock-motor.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_chat_start --title-ms 400 --answer-ms 1200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime
+from types import SimpleNamespace
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.settings import settings
+from routes import chat_routes
+from services.chat_service import ChatService
+from utils.auth import create_access_token
+
+
+class StubGroqClient:
+    """Stands in for the Groq client used for titles"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        time.sleep(self.delay)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Stub Chat Title"))])
+
+
+class StubLLMService:
+    def __init__(self, delay, chunks=1):
+        self.delay = delay
+        self.chunks = chunks
+
+    def generate_response(self, prompt, context="", history=None, user_id=None):
+        time.sleep(self.delay)
+        return "Stub answer."
+
+    def generate_response_stream(self, prompt, context="", history=None, user_id=None):
+        for i in range(self.chunks):
+            time.sleep(self.delay / self.chunks)
+            yield f"token{i} "
+
+
+async def sequential_start(chat_service, llm, user_id, first_message):
+    """The start flow before concurrent title generation"""
+    title = await chat_service.generate_chat_title(first_message)
+    chat = await chat_service.create_chat(user_id, "smart", first_message, title=title)
+    user_timestamp = datetime.utcnow()
+    answer = llm.generate_response(first_message)
+    await chat_service.save_messages(chat["_id"], [
+        {"role": "user", "content": first_message, "timestamp": user_timestamp},
+        {"role": "assistant", "content": answer},
+    ], touch_chat=False)
+
+
+async def stream_start(http, body, headers):
+    """Consume /chat/start/stream; returns ms to the chat event, first token and [DONE]"""
+    start = time.perf_counter()
+    marks = {}
+    event = None
+    async with http.stream("POST", "/api/v1/chat/start/stream", json=body, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                name = event or ("done" if line == "data: [DONE]" else "token")
+                marks.setdefault(name, (time.perf_counter() - start) * 1000)
+            elif not line:
+                event = None
+    return marks
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--title-ms", type=float, default=400)
+    parser.add_argument("--answer-ms", type=float, default=1200)
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--stream-chunks", type=int, default=50)
+    parser.add_argument("--ttft-slack-ms", type=float, default=200)
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="voxAI_bench")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = AsyncIOMotorClient(settings.MONGODB_URI)
+    database = client[args.database]
+
+    def chat_service_factory():
+        chat_service = ChatService(database)
+        chat_service.groq_client = StubGroqClient(args.title_ms / 1000)
+        return chat_service
+
+    llm = StubLLMService(args.answer_ms / 1000, chunks=args.stream_chunks)
+    app = FastAPI()
+    app.include_router(chat_routes.router, prefix="/api/v1")
+    app.dependency_overrides[chat_routes.get_chat_service] = chat_service_factory
+    app.dependency_overrides[chat_routes.get_llm_service] = lambda: llm
+
+    user_id = "bench-user"
+    token = create_access_token({"sub": user_id, "email": "bench@example.com"})
+    body = {"user_id": user_id, "mode": "smart", "first_message": "How do I apply for the exchange program?"}
+
+    # Served over a real socket: httpx's ASGI transport buffers whole responses
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        sequential = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            await sequential_start(chat_service_factory(), llm, user_id, body["first_message"])
+            sequential.append((time.perf_counter() - start) * 1000)
+
+        concurrent = []
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as http:
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                response = await http.post("/api/v1/chat/start", json=body,
+                                           headers={"Authorization": f"Bearer {token}"})
+                response.raise_for_status()
+                concurrent.append((time.perf_counter() - start) * 1000)
+
+            streamed = [await stream_start(http, body, {"Authorization": f"Bearer {token}"})
+                        for _ in range(args.requests)]
+
+        before, after = statistics.median(sequential), statistics.median(concurrent)
+        print(f"stub LLM: title {args.title_ms:.0f} ms, answer {args.answer_ms:.0f} ms")
+        print(f"sequential start: p50 {before:.0f} ms")
+        print(f"concurrent start: p50 {after:.0f} ms  ({(1 - after / before) * 100:.0f}% faster)")
+        for mark in ("chat", "token", "title", "done"):
+            values = [marks[mark] for marks in streamed if mark in marks]
+            if values:
+                print(f"streaming start, {mark:<5}: p50 {statistics.median(values):.0f} ms")
+
+        ttft = statistics.median(marks["token"] for marks in streamed)
+        limit = args.answer_ms / args.stream_chunks + args.ttft_slack_ms
+        if ttft > limit:
+            raise SystemExit(f"time to first token {ttft:.0f} ms exceeds {limit:.0f} ms")
+    finally:
+        server.should_exit = True
+        await server_task
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+Benchmark DB round trips and write latency per chat turn
+
+A turn persists a user message, an assistant message and the chat's
+updated_at bump. Compares:
+  - per-message: the previous path, save_message twice (insert_one + update_one each)
+  - batched:     ChatService.save_messages for the pair (insert_many + one bulk update)
+  - buffered:    MessageWriteBuffer as used by voice sessions (amortized over flushes)
+
+Round trips are counted with a pymongo command listener. Runs against
+MONGODB_URI in a scratch database that is dropped afterwards.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_chat_writes --turns 200
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from config.settings import settings
+from services.chat_service import ChatService, MessageWriteBuffer
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def per_message(chat_service, chat_id, i):
+    # The write path before batching, kept for comparison
+    for role in ("user", "assistant"):
+        await chat_service.messages_collection.insert_one({
+            "chat_id": chat_id, "role": role, "content": f"turn {i}", "timestamp": datetime.utcnow()
+        })
+        await chat_service.chats_collection.update_one(
+            {"_id": ObjectId(chat_id)}, {"$set": {"updated_at": datetime.utcnow()}}
+        )
+
+
+async def batched(chat_service, chat_id, i):
+    await chat_service.save_messages(chat_id, [
+        {"role": "user", "content": f"turn {i}"},
+        {"role": "assistant", "content": f"turn {i}"},
+    ])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--database", default="voxAI_bench")
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(settings.MONGODB_URI, event_listeners=[counter])
+    database = client[args.database]
+    chat_service = ChatService(database)
+    chat = await chat_service.create_chat("bench-user", "voice", "", title="Benchmark")
+
+    print(f"{'path':<14}{'round trips/turn':>18}{'ms/turn':>10}")
+    try:
+        for name, write_turn in (("per-message", per_message), ("batched", batched)):
+            counter.count = 0
+            start = time.perf_counter()
+            for i in range(args.turns):
+                await write_turn(chat_service, chat["_id"], i)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<14}{counter.count / args.turns:>18.2f}{elapsed * 1000 / args.turns:>10.2f}")
+
+        buffer = MessageWriteBuffer(chat_service)
+        counter.count = 0
+        start = time.perf_counter()
+        for i in range(args.turns):
+            await buffer.add(chat["_id"], "user", f"turn {i}")
+            await buffer.add(chat["_id"], "assistant", f"turn {i}")
+        await buffer.close()
+        elapsed = time.perf_counter() - start
+        print(f"{'buffered':<14}{counter.count / args.turns:>18.2f}{elapsed * 1000 / args.turns:>10.2f}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
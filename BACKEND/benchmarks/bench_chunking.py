@@ -0,0 +1,91 @@
+"""
+Benchmark PDF chunking: chunks produced, duplication, truncation and throughput
+
+Compares the previous sentence/character chunker with the token-aware chunker in
+PDFService.chunk_text. Token counts use the embedding model's tokenizer, so
+"truncated" counts chunks the model would silently cut off.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_chunking path/to/large.pdf [more.pdf ...]
+    python -m benchmarks.bench_chunking --pages 500     # synthetic document
+"""
+
+import argparse
+import random
+import time
+from config.settings import settings
+from services.pdf_service import pdf_service, token_offsets, PAGE_BREAK
+
+WORDS = ("the course covers students faculty semester credits lecture laboratory exam "
+         "assignment project research department admission schedule policy grading "
+         "prerequisite section library campus scholarship registration").split()
+
+
+def legacy_chunk_text(text, chunk_size=400, overlap=50):
+    """The chunker PDFService used before token-aware chunking, kept for comparison"""
+    sentences = text.split('. ')
+    chunks = []
+    current_chunk = []
+    current_length = 0
+    for sentence in sentences:
+        sentence_length = len(sentence)
+        if current_length + sentence_length > chunk_size and current_chunk:
+            chunks.append('. '.join(current_chunk) + '.')
+            overlap_sentences = max(0, len(current_chunk) - overlap//50)
+            current_chunk = current_chunk[overlap_sentences:] if overlap_sentences < len(current_chunk) else []
+            current_length = sum(len(s) for s in current_chunk)
+        current_chunk.append(sentence)
+        current_length += sentence_length
+    if current_chunk:
+        chunks.append('. '.join(current_chunk) + '.')
+    return chunks
+
+
+def synthetic_text(pages, seed=3):
+    """Generate a document of pages made of paragraphs of sentences"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(pages):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))).capitalize()
+                for _ in range(rng.randint(2, 6))
+            ]
+            paragraphs.append(". ".join(sentences) + ".")
+        out.append("\n\n".join(paragraphs))
+    return PAGE_BREAK.join(out)
+
+
+def measure(name, chunker, text, document_tokens):
+    start = time.perf_counter()
+    chunks = chunker(text)
+    elapsed = time.perf_counter() - start
+    lengths = [len(offsets) for offsets in token_offsets(chunks)] if chunks else []
+    limit = settings.EMBEDDING_MAX_TOKENS - 2
+    print(f"{name:<10}{len(chunks):>9}{sum(lengths) / max(len(lengths), 1):>12.1f}"
+          f"{sum(lengths) / max(document_tokens, 1):>10.2f}x{sum(n > limit for n in lengths):>11}"
+          f"{len(text) / elapsed / 1e6:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--pages", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.pdfs:
+        documents = [(path, pdf_service.extract_text(path)) for path in args.pdfs]
+    else:
+        documents = [(f"synthetic ({args.pages} pages)", synthetic_text(args.pages))]
+
+    for name, text in documents:
+        document_tokens = sum(len(offsets) for offsets in token_offsets(text.split(PAGE_BREAK)))
+        print(f"\n{name}: {len(text) / 1e6:.2f} MB, {document_tokens} tokens")
+        print(f"{'chunker':<10}{'chunks':>9}{'avg tokens':>12}{'dup':>11}{'truncated':>11}{'MB/s':>12}")
+        measure("legacy", legacy_chunk_text, text, document_tokens)
+        measure("token", pdf_service.chunk_text, text, document_tokens)
+
+
+if __name__ == "__main__":
+    main()
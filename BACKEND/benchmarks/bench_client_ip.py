@@ -0,0 +1,63 @@
+"""
+Check client IP resolution from forwarding headers and time it
+
+Runs utils.client_ip.resolve_client_ip over a table of peer address /
+header cases (direct clients, spoofed headers, proxy chains, RFC 7239
+Forwarded with quotes, IPv6 brackets and ports, obfuscated hops) and fails
+on any mismatch, then times a resolution through two trusted proxies.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_client_ip
+"""
+
+import time
+from utils.client_ip import parse_networks, resolve_client_ip
+
+TRUSTED = parse_networks("127.0.0.1, ::1, 10.0.0.0/8")
+
+# (peer address, headers, expected client IP)
+CASES = [
+    ("203.0.113.7", {}, "203.0.113.7"),
+    # Untrusted peers cannot spoof their address with headers
+    ("203.0.113.7", {"x-forwarded-for": "1.2.3.4"}, "203.0.113.7"),
+    ("203.0.113.7", {"forwarded": "for=1.2.3.4"}, "203.0.113.7"),
+    # Behind one trusted proxy
+    ("127.0.0.1", {"x-forwarded-for": "198.51.100.9"}, "198.51.100.9"),
+    ("127.0.0.1", {}, "127.0.0.1"),
+    # Client-supplied entries left of the real client are ignored
+    ("10.0.0.2", {"x-forwarded-for": "1.2.3.4, 198.51.100.9, 10.0.0.5"}, "198.51.100.9"),
+    ("10.0.0.2", {"x-forwarded-for": " 198.51.100.9:5123 ,10.0.0.5"}, "198.51.100.9"),
+    # Every hop trusted: the leftmost address is the client
+    ("10.0.0.2", {"x-forwarded-for": "10.0.0.9, 10.0.0.5"}, "10.0.0.9"),
+    # RFC 7239 Forwarded takes precedence over X-Forwarded-For
+    ("127.0.0.1", {"forwarded": "for=198.51.100.9;proto=https", "x-forwarded-for": "1.2.3.4"}, "198.51.100.9"),
+    ("127.0.0.1", {"forwarded": 'for="[2001:db8:cafe::17]:4711"'}, "2001:db8:cafe::17"),
+    ("127.0.0.1", {"forwarded": "For=192.0.2.43, for=10.0.0.5;by=10.0.0.1"}, "192.0.2.43"),
+    ("::1", {"x-forwarded-for": "2001:db8::1"}, "2001:db8::1"),
+    # An obfuscated or unknown hop stops the walk
+    ("127.0.0.1", {"forwarded": "for=_hidden, for=10.0.0.5"}, None),
+    ("127.0.0.1", {"x-forwarded-for": "unknown"}, None),
+    (None, {}, None),
+]
+
+
+def main():
+    failures = 0
+    for remote_addr, headers, expected in CASES:
+        result = resolve_client_ip(remote_addr, headers, TRUSTED)
+        status = "ok" if result == expected else "FAIL"
+        failures += status == "FAIL"
+        print(f"{status:<5}{str(remote_addr):<14}{str(headers):<72}-> {result}")
+
+    headers = {"x-forwarded-for": "198.51.100.9, 10.0.0.5"}
+    n = 100000
+    start = time.perf_counter()
+    for _ in range(n):
+        resolve_client_ip("10.0.0.2", headers, TRUSTED)
+    print(f"resolution through two proxies: {(time.perf_counter() - start) / n * 1e6:.2f} us, no network I/O")
+    if failures:
+        raise SystemExit(f"{failures} case(s) failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark prompt assembly time for long chats
+
+Measures ConversationMemory.get_history on a chat of --messages messages:
+  - cold: first call in a worker, every stored message is fetched and folded
+  - warm: each following turn, only the new user/assistant pair is fetched
+and reports the tokens sent (window + summary) against the whole history.
+It also runs two get_history calls for the same chat concurrently and exits 1
+if either sees a turn twice.
+
+Messages are served by an in-memory stand-in for ChatService with the same
+cursor semantics, so the timings cover assembly rather than MongoDB.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_conversation_memory --messages 1000
+"""
+
+import argparse
+import asyncio
+import bisect
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from services.chat_service import decode_cursor, encode_cursor
+from services.conversation_memory import ConversationMemory, count_tokens
+
+WORDS = ("please explain how the admission process works and which documents the "
+         "department needs before the semester starts for international students").split()
+
+
+class InMemoryChatHistory:
+    """Serves get_chat_messages pages from a list, like ChatService does from MongoDB"""
+
+    def __init__(self):
+        self.messages = []
+        self.clock = datetime(2024, 1, 1)
+
+    def add(self, role, content):
+        self.clock += timedelta(seconds=1)
+        self.messages.append({"_id": ObjectId(), "chat_id": "bench", "role": role,
+                              "content": content, "timestamp": self.clock})
+
+    async def get_chat_messages(self, chat_id, limit=100, cursor=None):
+        await asyncio.sleep(0)  # Yield like a database round trip would
+        start = 0
+        if cursor:
+            start = bisect.bisect_right(self.messages, decode_cursor(cursor),
+                                        key=lambda m: (m["timestamp"], m["_id"]))
+        page = [dict(m, _id=str(m["_id"])) for m in self.messages[start:start + limit]]
+        next_cursor = None
+        if start + limit < len(self.messages):
+            next_cursor = encode_cursor(page[-1]["timestamp"], page[-1]["_id"])
+        return page, next_cursor
+
+
+def sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 60))).capitalize() + "."
+
+
+async def check_concurrent(messages):
+    """Two turns of one chat assembling history at once must not fold the same messages twice"""
+    history = InMemoryChatHistory()
+    for i in range(messages):
+        history.add("user" if i % 2 == 0 else "assistant", f"message {i}")
+
+    memory = ConversationMemory(token_budget=10 ** 9)  # Keep every turn verbatim
+    results = await asyncio.gather(memory.get_history(history, "bench"), memory.get_history(history, "bench"))
+    return all(
+        [m["content"] for m in result] == [m["content"] for m in history.messages]
+        for result in results
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    history = InMemoryChatHistory()
+    for i in range(args.messages):
+        history.add("user" if i % 2 == 0 else "assistant", sentence(rng))
+
+    memory = ConversationMemory()
+    start = time.perf_counter()
+    messages = await memory.get_history(history, "bench")
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    warm = []
+    for _ in range(args.turns):
+        history.add("user", sentence(rng))
+        history.add("assistant", sentence(rng))
+        start = time.perf_counter()
+        messages = await memory.get_history(history, "bench")
+        warm.append((time.perf_counter() - start) * 1000)
+
+    sent_tokens = sum(count_tokens(m["content"]) for m in messages)
+    total_tokens = sum(count_tokens(m["content"]) for m in history.messages)
+    print(f"chat: {len(history.messages)} messages, {total_tokens} tokens")
+    print(f"cold assembly: {cold_ms:.2f} ms")
+    print(f"warm assembly: p50 {statistics.median(warm):.3f} ms, max {max(warm):.3f} ms")
+    print(f"prompt history: {len(messages)} messages, {sent_tokens} tokens "
+          f"(budget {memory.token_budget})")
+
+    if not await check_concurrent(args.messages):
+        raise SystemExit("FAIL: concurrent get_history calls duplicated turns")
+    print("OK: concurrent get_history calls see each turn once")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
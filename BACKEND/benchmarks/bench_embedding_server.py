@@ -0,0 +1,111 @@
+"""
+Benchmark embedding throughput and memory for 1, 4 and 8 API workers
+
+"local": every worker process loads its own model (the default deployment).
+"remote": workers share one embedding server (python -m services.embedding_server).
+
+Each simulated API worker sends --requests embedding requests of --batch texts,
+like PDF queries and small uploads. Total memory is the sum of every process's
+peak RSS, including the server in remote mode.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_embedding_server --workers 1,4,8
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+WORDS = ("what are the prerequisites for the advanced course and how are the labs "
+         "graded in the final semester of the program").split()
+
+
+def worker(mode, args, results):
+    from services.embedding_service import create_embedding_backend
+
+    if mode == "remote":
+        backend = create_embedding_backend("remote", socket_path=args.socket)
+    else:
+        backend = create_embedding_backend(args.local_backend)
+    requests, batch = args.requests, args.batch
+
+    rng = random.Random(os.getpid())
+    texts = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 40))) for _ in range(batch)]
+    backend.encode(texts)  # warm-up
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        backend.encode(texts).tolist()
+    elapsed = time.perf_counter() - start
+    results.put((requests * batch, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def run(mode, workers, args):
+    server = None
+    if mode == "remote":
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = subprocess.Popen([sys.executable, "-m", "services.embedding_server",
+                                   "--socket", args.socket, "--backend", args.local_backend])
+        while not os.path.exists(args.socket):
+            if server.poll() is not None:
+                raise RuntimeError("Embedding server failed to start")
+            time.sleep(0.2)
+
+    try:
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(mode, args, results))
+            for _ in range(workers)
+        ]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        collected = [results.get() for _ in procs]
+        wall = time.perf_counter() - start
+        for p in procs:
+            p.join()
+
+        sentences = sum(r[0] for r in collected)
+        total_rss = sum(r[2] for r in collected) + (peak_rss_mb(server.pid) if server else 0.0)
+        # Throughput over the slowest worker's measured window, excluding model load
+        window = max(r[1] for r in collected)
+        print(f"{mode:<8}{workers:>8}{sentences / window:>12.1f}{total_rss:>14.0f}{wall:>10.1f}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--modes", default="local,remote")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--socket", default="/tmp/voxai-embeddings-bench.sock")
+    parser.add_argument("--local-backend", default="torch", help="Backend loaded by workers or the server")
+    args = parser.parse_args()
+
+    multiprocessing.set_start_method("spawn")
+    print(f"{'mode':<8}{'workers':>8}{'sent/s':>12}{'total RSS MB':>14}{'wall s':>10}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        for mode in args.modes.split(","):
+            run(mode, workers, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark embedding backends and check their parity with the PyTorch backend
+
+Each backend runs in its own subprocess so resident memory is measured in
+isolation. Reports sentences/sec, peak RSS and the cosine agreement of every
+backend's vectors with the "torch" backend; exits non-zero if agreement drops
+below --min-cosine.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_embeddings --sentences 2000
+    EMBEDDING_ONNX_FILE=onnx/model_qint8_avx512_vnni.onnx python -m benchmarks.bench_embeddings
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+WORDS = ("students enrolled in the course attend weekly lectures and laboratory sessions "
+         "assessment combines coursework projects and a final examination the department "
+         "offers scholarships admission requires transcripts and recommendation letters").split()
+
+
+def make_sentences(count, seed=5):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 120))) for _ in range(count)]
+
+
+def run_worker(args):
+    """Embed the sentences with one backend and report throughput and memory"""
+    from services.embedding_service import create_embedding_backend
+
+    sentences = make_sentences(args.sentences)
+    start = time.perf_counter()
+    backend = create_embedding_backend(args.backend, batch_size=args.batch_size, threads=args.threads)
+    load_seconds = time.perf_counter() - start
+
+    backend.encode(sentences[:args.batch_size])  # warm-up
+    start = time.perf_counter()
+    embeddings = backend.encode(sentences)
+    elapsed = time.perf_counter() - start
+
+    np.save(args.output, embeddings)
+    # ru_maxrss is KiB on Linux
+    print(json.dumps({
+        "backend": args.backend,
+        "load_s": load_seconds,
+        "sentences_per_s": len(sentences) / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="torch,onnx")
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        run_worker(args)
+        return
+
+    backends = args.backends.split(",")
+    results, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in backends:
+            output = os.path.join(tmp, f"{name}.npy")
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_embeddings", "--backend", name, "--output", output,
+                 "--sentences", str(args.sentences), "--batch-size", str(args.batch_size),
+                 "--threads", str(args.threads)],
+                capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                print(f"{name}: failed\n{proc.stderr}")
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            vectors[name] = np.load(output)
+
+    reference = vectors.get("torch")
+    failed = False
+    print(f"\n{'backend':<10}{'load s':>8}{'sent/s':>10}{'peak RSS MB':>13}{'min cos':>10}{'mean cos':>10}")
+    for result in results:
+        name = result["backend"]
+        if reference is not None and name != "torch":
+            # Both backends return L2-normalized vectors, so the row-wise dot product is the cosine
+            cosines = (vectors[name] * reference).sum(axis=1)
+            min_cos, mean_cos = f"{cosines.min():.4f}", f"{cosines.mean():.4f}"
+            failed |= cosines.min() < args.min_cosine
+        else:
+            min_cos = mean_cos = "-"
+        print(f"{name:<10}{result['load_s']:>8.1f}{result['sentences_per_s']:>10.1f}"
+              f"{result['peak_rss_mb']:>13.0f}{min_cos:>10}{mean_cos:>10}")
+
+    if failed:
+        print(f"\nParity check failed: cosine agreement below {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Check the cold import time of main.py against a budget
+
+Imports main in --runs fresh interpreters (python -X importtime) and reports
+the median, min and max, plus the slowest direct imports of the median run.
+Fails (exit 1) if the median is over --budget-ms, or if any of the heavy
+modules in utils.import_profile.HEAVY_MODULES (groq, PyMuPDF, numpy,
+webrtcvad, ...) is imported eagerly instead of on first use.
+
+For the full tree: python -m utils.import_profile
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_import_time --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import statistics
+from utils.import_profile import HEAVY_MODULES, profile_imports
+
+
+def imported(node, name):
+    return node.name == name or any(imported(child, name) for child in node.children)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    args = parser.parse_args()
+
+    runs = sorted((profile_imports(args.module) for _ in range(args.runs)), key=lambda node: node.cumulative_us)
+    times = [node.cumulative_us / 1000 for node in runs]
+    median_run = runs[len(runs) // 2]
+    print(f"import {args.module}: median {statistics.median(times):.0f} ms, "
+          f"min {times[0]:.0f} ms, max {times[-1]:.0f} ms over {args.runs} cold runs")
+    for child in sorted(median_run.children, key=lambda c: c.cumulative_us, reverse=True)[:8]:
+        print(f"  {child.cumulative_us / 1000:7.1f} ms  {child.name}")
+
+    failures = []
+    eager = [name for name in HEAVY_MODULES if imported(median_run, name)]
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+    if statistics.median(times) > args.budget_ms:
+        failures.append(f"median {statistics.median(times):.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print(f"OK: within {args.budget_ms:.0f} ms, no heavy module imported eagerly")
+
+
+if __name__ == "__main__":
+    main()
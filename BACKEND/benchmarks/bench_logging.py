@@ -0,0 +1,98 @@
+"""
+Benchmark per-request logging overhead: synchronous handlers vs the queue
+
+Logs --records INFO records shaped like a voice turn (a short line plus a
+--payload-chars transcript/response) from inside a request context, first
+with the previous setup (FileHandler and StreamHandler, I/O in the caller)
+and then with setup_logging (QueueHandler; a listener thread formats, writes
+and rotates). Reports the caller's cost per record (p50 / p99 / max), then
+checks the JSON file output carries the request id, that oversized messages
+were truncated and that the file rotated.
+
+Console output goes to /dev/null and files to a temporary directory.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_logging --records 20000
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from config import logging_config
+from config.settings import settings
+from utils.log_context import request_id_var
+
+logger = logging.getLogger("voxai.bench")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(records, payload):
+    costs = []
+    for i in range(records):
+        token = request_id_var.set(f"req-{i}")
+        start = time.perf_counter()
+        logger.info(f"Voice turn {i}: {len(payload)} chars in")
+        logger.info(f"Generated response: {payload}")
+        costs.append((time.perf_counter() - start) * 1e6)
+        request_id_var.reset(token)
+    return costs
+
+
+def report(label, costs):
+    print(f"{label:<22}{statistics.median(costs):>9.1f}{percentile(costs, 0.99):>9.1f}{max(costs):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--payload-chars", type=int, default=3000)
+    parser.add_argument("--max-bytes", type=int, default=2 * 1024 * 1024, help="Rotation size for the test")
+    args = parser.parse_args()
+
+    payload = "word " * (args.payload_chars // 5)
+    root = logging.getLogger()
+    devnull = open(os.devnull, "w")
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        print(f"{args.records} requests x 2 records, {len(payload)} char payload; us per request in the caller")
+        print(f"{'setup':<22}{'p50':>9}{'p99':>9}{'max':>10}")
+
+        # Previous setup_logging: synchronous handlers
+        handlers = [
+            logging.FileHandler(os.path.join(log_dir, "legacy.log")),
+            logging.StreamHandler(devnull),
+        ]
+        for handler in handlers:
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+            root.addHandler(handler)
+        root.setLevel(logging.INFO)
+        report("sync file + console", run(args.records, payload))
+        for handler in handlers:
+            root.removeHandler(handler)
+            handler.close()
+
+        settings.LOG_MAX_BYTES = args.max_bytes
+        logging_config.setup_logging(log_dir=log_dir, stream=devnull)
+        report("queue listener", run(args.records, payload))
+        logging_config.stop_logging()  # Drains the queue
+
+        log_path = os.path.join(log_dir, "voxAI.log")
+        with open(log_path, encoding="utf-8") as f:
+            last = json.loads(f.readlines()[-1])
+        rotated = [name for name in os.listdir(log_dir) if name.startswith("voxAI.log.")]
+        print(f"\nlast record: request_id={last.get('request_id')}, {len(last['message'])} chars "
+              f"(limit {settings.LOG_MAX_MESSAGE_CHARS} + marker)")
+        print(f"rotated files: {len(rotated)} (max {settings.LOG_BACKUP_COUNT}, {args.max_bytes} bytes each)")
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main()
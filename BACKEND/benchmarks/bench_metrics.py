@@ -0,0 +1,76 @@
+"""
+Microbenchmark the cost of metrics on hot paths
+
+Reports per-call cost of a histogram observe, a stage() timer and a counter
+increment, the per-request overhead of MetricsMiddleware (a bare ASGI app with
+and without it), and how long a /metrics scrape takes.
+Prints the stage and request series of the exposition as a sample.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_metrics
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from utils.metrics import Counter, MetricsMiddleware, STAGE_DURATION, registry, stage
+
+
+def per_call_ns(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+async def asgi_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def per_request_us(app, requests):
+    """Drive an ASGI app directly, so only the middleware's own cost differs"""
+    scope = {"type": "http", "method": "GET", "route": SimpleNamespace(path="/items/{item_id}")}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), None, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+
+    series = STAGE_DURATION.labels("embedding")
+    counter = Counter("bench_total", "Benchmark counter").labels()
+
+    def timed_block():
+        with stage("embedding"):
+            pass
+
+    print(f"histogram observe  {per_call_ns(lambda: series.observe(0.042), args.calls):8.0f} ns")
+    print(f"stage() timer      {per_call_ns(timed_block, args.calls):8.0f} ns")
+    print(f"counter inc        {per_call_ns(counter.inc, args.calls):8.0f} ns")
+
+    without = asyncio.run(per_request_us(asgi_app, args.requests))
+    with_metrics = asyncio.run(per_request_us(MetricsMiddleware(asgi_app), args.requests))
+    print(f"middleware         {(with_metrics - without) * 1000:8.0f} ns per request")
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"scrape             {(time.perf_counter() - start) * 1000:8.2f} ms, {len(text.splitlines())} lines")
+    print()
+    for line in text.splitlines():
+        if 'stage="embedding"' in line and "_bucket" not in line or line.startswith("http_request_duration_seconds_count"):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark login throughput and unrelated-request latency under a login storm
+
+Runs a small app on one in-process uvicorn worker with two login endpoints
+doing the same bcrypt verification: /inline calls verify_password inside the
+async handler (the old auth_routes behaviour), /pooled awaits check_password
+on the bcrypt pool. While --logins concurrent clients hammer one of them for
+--seconds, a probe client calls /ping every --probe-ms ms. Reports logins/s
+and /ping latency for each.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_password_hashing --seconds 5
+    BCRYPT_ROUNDS=10 PASSWORD_HASH_WORKERS=4 python -m benchmarks.bench_password_hashing
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from utils.auth import (
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+    check_password,
+    get_password_hash,
+    verify_password,
+)
+
+PASSWORD = "correct horse battery staple"
+
+
+def build_app(hashed):
+    app = FastAPI()
+
+    @app.post("/inline")
+    async def inline():
+        return {"ok": verify_password(PASSWORD, hashed)}
+
+    @app.post("/pooled")
+    async def pooled():
+        return {"ok": await check_password(PASSWORD, hashed)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def storm(http, path, logins, seconds, probe_ms):
+    deadline = time.monotonic() + seconds
+    completed = 0
+    pings = []
+
+    async def login():
+        nonlocal completed
+        while time.monotonic() < deadline:
+            response = await http.post(path)
+            response.raise_for_status()
+            completed += 1
+
+    async def probe():
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            await http.get("/ping")
+            pings.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(probe_ms / 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(probe(), *(login() for _ in range(logins)))
+    return completed / (time.perf_counter() - start), pings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--probe-ms", type=float, default=50)
+    parser.add_argument("--port", type=int, default=8769)
+    args = parser.parse_args()
+
+    hashed = get_password_hash(PASSWORD)
+    start = time.perf_counter()
+    verify_password(PASSWORD, hashed)
+    print(f"bcrypt cost {BCRYPT_ROUNDS}: one verification {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{PASSWORD_HASH_WORKERS} pool workers, {args.logins} concurrent logins for {args.seconds:.0f}s")
+
+    server = uvicorn.Server(uvicorn.Config(build_app(hashed), port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=args.logins + 1)
+    print(f"{'path':<10}{'logins/s':>10}{'ping p50':>10}{'ping p99':>10}{'ping max':>10}")
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=300) as http:
+            for path in ["/inline", "/pooled"]:
+                rate, pings = await storm(http, path, args.logins, args.seconds, args.probe_ms)
+                print(f"{path[1:]:<10}{rate:>10.1f}{statistics.median(pings):>10.1f}"
+                      f"{percentile(pings, 0.99):>10.1f}{max(pings):>10.1f}")
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+"""
+Check PDF upload and query end to end, and time index loading
+
+Builds a --chunks section course catalogue PDF (see bench_retrieval), uploads
+it through POST /upload-pdf and asks about one course code through POST
+/pdf/load. Checks that the document in Mongo has no BM25 postings (they go to
+the blob store), that the answer context holds the asked course, and reports
+the cold query (index read from the blob store) and warm query times, and the
+longest event loop stall seen while querying.
+
+Embeddings come from a hashing stub (see HashingEmbeddings) and the LLM
+answer echoes its context, so only ingestion, storage and ranking are
+measured. Uses MONGODB_URI (scratch database, dropped afterwards) or, with
+--in-memory, mongomock-motor; indexes go to a temporary local blob store.
+mongomock decodes documents on the event loop, so in-memory stalls include
+reading the document; Motor does that on its own threads.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_pdf_query --in-memory --chunks 2000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import tempfile
+import time
+import bson
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.database import Database
+from config.settings import settings
+from routes import text_routes
+from services.blob_service import LocalBlobStore
+from services.pdf_service import pdf_service
+from services.query_router import query_router
+from services.retrieval_service import retrieval_service, tokenize
+from benchmarks.bench_retrieval import build_corpus
+
+
+class HashingEmbeddings:
+    """
+    Hashed bag of the identifier terms (those with a digit, e.g. course codes);
+    no model download. Word terms are left out so that the stub's ranking
+    agrees with BM25 instead of adding noise: this checks plumbing, not quality
+    """
+
+    name = "hashing-stub"
+
+    def __init__(self, dimensions=1024):
+        self.dimensions = dimensions
+
+    def encode(self, texts):
+        import numpy as np
+
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term in tokenize(text):
+                if not any(c.isdigit() for c in term):
+                    continue
+                vectors[row, int(hashlib.md5(term.encode()).hexdigest(), 16) % self.dimensions] += 1
+        return vectors
+
+
+def write_pdf(path, sections, per_page=20):
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for start in range(0, len(sections), per_page):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), "\n\n".join(sections[start:start + per_page]), fontsize=6)
+    doc.save(path)
+    doc.close()
+
+
+async def watch_loop(stalls, interval=0.005):
+    """Record how late a short sleep wakes up: the longest time the loop was blocked"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000, help="Catalogue sections in the PDF")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="voxAI_bench")
+    args = parser.parse_args()
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = AsyncIOMotorClient(settings.MONGODB_URI)
+    Database.db = client[args.database]
+
+    pdf_service.backend = HashingEmbeddings()
+    query_router.handle_query = lambda query, mode="smart", pdf_context=None, **kwargs: pdf_context["extracted_text"]
+
+    app = FastAPI()
+    app.include_router(text_routes.router, prefix="/api/v1")
+    failures = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            retrieval_service.store = LocalBlobStore(os.path.join(workdir, "blobs"))
+            sections, exact_queries, _ = build_corpus(args.chunks)
+            pdf_path = os.path.join(workdir, "catalogue.pdf")
+            write_pdf(pdf_path, sections)
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+                start = time.perf_counter()
+                with open(pdf_path, "rb") as f:
+                    response = await http.post("/api/v1/upload-pdf", params={"user_id": "bench"},
+                                               files={"file": ("catalogue.pdf", f, "application/pdf")})
+                if response.status_code != 200:
+                    raise SystemExit(f"FAIL: upload answered {response.status_code}: {response.text}")
+                document_id = response.json()["document_id"]
+                print(f"upload: {args.chunks} sections in {time.perf_counter() - start:.2f} s")
+
+                stored = await Database.db.documents.find_one({"_id": bson.ObjectId(document_id)})
+                print(f"document: {len(stored['chunks'])} chunks, {len(bson.encode(stored)) / 1024:.0f} KB in Mongo")
+                if "bm25_index" in stored:
+                    failures.append("BM25 postings stored on the document")
+
+                queries = [query for query, _ in exact_queries[::max(1, len(exact_queries) // args.queries)]]
+                stalls = []
+                watcher = asyncio.create_task(watch_loop(stalls))
+                times = []
+                for i, query in enumerate(queries[:args.queries]):
+                    if i == 0:
+                        retrieval_service.invalidate(document_id)  # Cold: index read from the blob store
+                    start = time.perf_counter()
+                    response = await http.post("/api/v1/pdf/load", params={"document_id": document_id, "query": query})
+                    times.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        failures.append(f"query answered {response.status_code}: {response.text}")
+                        break
+                    code = query.split()[-1].rstrip("?")
+                    if code not in response.json()["response"]:
+                        failures.append(f"context for {query!r} does not mention {code}")
+                watcher.cancel()
+
+                print(f"query: cold {times[0]:.1f} ms, warm p50 {statistics.median(times[1:] or times):.1f} ms")
+                print(f"longest event loop stall while querying: {max(stalls) * 1000:.1f} ms")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("OK: upload and query work, postings are kept off the document")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark user lookups with inline vs blob-stored profile photos
+
+Inserts --users users twice: once with a --photo-kb base64 photo inline on
+the user document (the old layout) and once with only a photo id. Reports
+the per-call time and bytes read by the login lookup (get_user_by_email).
+Then checks the photo endpoints end to end: signup with a photo, GET
+/profile links it, GET /photos/{id} answers 200 with an ETag, then 304 to
+If-None-Match (404 for a photo that isn't stored, even with *), and serves a
+thumbnail (the original without Pillow).
+
+Uses MONGODB_URI (scratch database, dropped afterwards) or, with --in-memory,
+mongomock-motor; photos go to a temporary local blob store.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_profile_photos --in-memory
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import tempfile
+import time
+import bson
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.database import Database
+from config.settings import settings
+from routes import auth_routes
+from services.blob_service import LocalBlobStore, blob_service
+from services.db_service import USER_AUTH_FIELDS, db_service
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+def fake_photo(kb):
+    """Random bytes behind a PNG signature, as a data URL"""
+    data = PNG_HEADER + os.urandom(kb * 1024)
+    return "data:image/png;base64," + base64.b64encode(data).decode()
+
+
+async def time_lookups(emails, fields, rounds):
+    read = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for email in emails:
+            user = await db_service.get_user_by_email(email, fields=fields)
+            read += len(bson.encode({k: v for k, v in user.items() if k != "id"}))
+    calls = rounds * len(emails)
+    return (time.perf_counter() - start) / calls * 1e6, read / calls
+
+
+async def check_endpoints(photo):
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/api/v1/auth")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        response = await http.post("/api/v1/auth/signup", json={
+            "email": "photo@example.com", "password": "secret123", "confirm_password": "secret123",
+            "name": "Photo", "mobile": "1", "date_of_birth": "2000-01-01", "gender": "other",
+            "country": "NZ", "profile_photo": photo,
+        })
+        response.raise_for_status()
+        auth = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        profile = (await http.get("/api/v1/auth/profile", headers=auth)).json()
+        print(f"profile_photo: {profile['profile_photo']}")
+
+        first = await http.get(profile["profile_photo"])
+        again = await http.get(profile["profile_photo"], headers={"If-None-Match": first.headers["etag"]})
+        any_tag = await http.get(profile["profile_photo"], headers={"If-None-Match": "*"})
+        missing_id = "0" * 64
+        missing = await http.get(f"/api/v1/auth/photos/{missing_id}",
+                                 headers={"If-None-Match": f'"{missing_id}-original", *'})
+        thumbnail = await http.get(profile["profile_photo_thumbnail"])
+        print(f"GET photo: {first.status_code} {len(first.content)} bytes, ETag {first.headers['etag']}, "
+              f"Cache-Control {first.headers['cache-control']}")
+        print(f"GET photo with If-None-Match: {again.status_code}, with *: {any_tag.status_code}")
+        print(f"GET missing photo with If-None-Match: {missing.status_code}")
+        print(f"GET thumbnail: {thumbnail.status_code} {len(thumbnail.content)} bytes")
+        ok = (first.status_code == 200 and again.status_code == 304 and any_tag.status_code == 304
+              and missing.status_code == 404 and thumbnail.status_code == 200)
+        print("endpoints ok" if ok else "ENDPOINTS FAILED")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--photo-kb", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="voxAI_bench")
+    args = parser.parse_args()
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = AsyncIOMotorClient(settings.MONGODB_URI)
+    Database.db = client[args.database]
+
+    try:
+        with tempfile.TemporaryDirectory() as blob_dir:
+            blob_service.store = LocalBlobStore(blob_dir)
+            photo = fake_photo(args.photo_kb)
+            inline, linked = [], []
+            for i in range(args.users):
+                common = {"password_hash": "x", "name": f"User {i}", "created_at": time.time()}
+                await Database.db.users.insert_one({"email": f"inline{i}@example.com", "profile_photo": photo, **common})
+                await Database.db.users.insert_one({"email": f"linked{i}@example.com", "profile_photo_id": "0" * 64, **common})
+                inline.append(f"inline{i}@example.com")
+                linked.append(f"linked{i}@example.com")
+
+            # The inline layout had no projection: every lookup read the photo
+            print(f"{args.users} users, {args.photo_kb} KB photo")
+            for label, emails, fields in [
+                ("inline photo, full document", inline, {}),
+                ("photo id, login projection", linked, USER_AUTH_FIELDS),
+            ]:
+                us, size = await time_lookups(emails, fields, args.rounds)
+                print(f"{label:<30}{us:>10.1f} us/lookup{size / 1024:>10.1f} KB read")
+
+            await check_endpoints(photo)
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+"""
+Benchmark database round trips per profile update
+
+Compares the previous update_user_profile (update_one, then a second
+get_user_by_email to return the document) with the current one
+(find_one_and_update returning the projected document). Reports round trips
+and time per update, and checks that a no-op update (same values) still
+returns the user instead of "not found".
+
+Round trips are counted at the collection: every awaited collection call is
+one request to the server.
+
+Uses MONGODB_URI (scratch database, dropped afterwards) or, with --in-memory,
+mongomock-motor (no network, so the time saving is understated).
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_profile_update --in-memory
+"""
+
+import argparse
+import asyncio
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.database import Database
+from config.settings import settings
+from services.db_service import db_service
+
+
+class CountingCollection:
+    """Counts awaited calls on a Motor collection"""
+
+    def __init__(self, collection, counter):
+        self._collection = collection
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            self._counter[0] += 1
+            return await attr(*args, **kwargs)
+        return call
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+        self.round_trips = [0]
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._database, name), self.round_trips)
+
+    __getitem__ = __getattr__
+
+
+async def legacy_update_user_profile(email, update_data):
+    """update_user_profile before find_one_and_update"""
+    result = await Database.db.users.update_one({"email": email}, {"$set": update_data})
+    if result.modified_count == 0:
+        return None
+    return await db_service.get_user_by_email(email)
+
+
+async def run(update, email, updates):
+    Database.db.round_trips[0] = 0
+    start = time.perf_counter()
+    for i in range(updates):
+        await update(email, {"name": f"Name {i}"})
+    elapsed = (time.perf_counter() - start) / updates * 1e6
+    return Database.db.round_trips[0] / updates, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="voxAI_bench")
+    args = parser.parse_args()
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = AsyncIOMotorClient(settings.MONGODB_URI)
+    Database.db = CountingDatabase(client[args.database])
+
+    try:
+        email = "update@example.com"
+        await Database.db.users.insert_one({"email": email, "password_hash": "x", "name": "Start"})
+
+        print(f"{'update_user_profile':<22}{'round trips':>12}{'us/update':>12}")
+        for label, update in [("update_one + find_one", legacy_update_user_profile),
+                              ("find_one_and_update", db_service.update_user_profile)]:
+            trips, us = await run(update, email, args.updates)
+            print(f"{label:<22}{trips:>12.1f}{us:>12.1f}")
+
+        same = {"name": "Unchanged"}
+        await db_service.update_user_profile(email, same)
+        legacy = await legacy_update_user_profile(email, same)
+        current = await db_service.update_user_profile(email, same)
+        print(f"no-op update: previous {'user' if legacy else 'None (404)'}, "
+              f"current {'user' if current else 'None (404)'}")
+        print(f"password hash returned: {'password_hash' in current}")
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Fault-injection checks for upstream timeouts, retries, hedging and breakers
+
+Runs TTSService and WebSearchService against a local stub server whose
+behaviour is chosen by the first path segment of the base URL:
+  - slow:   answers after 5 s; the read timeout must cut the call short
+  - flaky:  every other request gets a 503; retries must hide it
+  - down:   a closed port; after CIRCUIT_FAILURE_THRESHOLD failures the
+            breaker must fail calls without touching the network
+  - tail:   1 in --tail-every requests takes 2 s; hedging must cut the tail
+Each scenario gets a fresh ResiliencePolicy with short timeouts.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_resilience
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from services import tts_service as tts_module, web_search_service as web_search_module
+from services.tts_service import TTSService
+from services.web_search_service import WebSearchService
+from utils.resilience import CircuitOpenError, ResiliencePolicy
+
+counter = itertools.count()
+
+
+class StubUpstream(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        mode = self.path.strip("/").split("/")[0]
+        n = next(counter)
+        if mode == "slow":
+            time.sleep(5)
+        elif mode == "flaky" and n % 2 == 0:
+            self.send_response(503)
+            self.end_headers()
+            return
+        elif mode == "tail" and n % self.server.tail_every == 0:
+            time.sleep(2)
+        body = json.dumps({"answer": "ok", "results": []}).encode() if "search" in self.path else b"ID3audio"
+        try:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client timed out first
+
+    def log_message(self, *args):
+        pass
+
+
+def timed(func):
+    start = time.perf_counter()
+    try:
+        func()
+        outcome = "ok"
+    except CircuitOpenError:
+        outcome = "circuit open"
+    except Exception as e:
+        outcome = type(e).__name__
+    return (time.perf_counter() - start) * 1000, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--tail-every", type=int, default=10)
+    args = parser.parse_args()
+    # The services log every injected failure; keep the report readable
+    logging.disable(logging.ERROR)
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubUpstream)
+    server.tail_every = args.tail_every
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{args.port}"
+    tts, search = TTSService(), WebSearchService()
+    failures = []
+
+    def policy(name, **kwargs):
+        kwargs.setdefault("failure_threshold", 5)
+        kwargs.setdefault("reset_timeout", 30)
+        return ResiliencePolicy(name, 0.5, kwargs.pop("read_timeout", 0.5), **kwargs)
+
+    # Slow upstream: bounded by connect/read timeouts and retries instead of hanging
+    tts_module.tts_policy = policy("tts", attempts=2)
+    tts.base_url = f"{base}/slow"
+    elapsed, outcome = timed(lambda: tts.text_to_speech("hello"))
+    print(f"slow:  {outcome} after {elapsed:.0f} ms (upstream takes 5000 ms)")
+    if elapsed > 3000 or outcome == "ok":
+        failures.append("slow")
+
+    # Flaky upstream: 503 on every other request, hidden by retries
+    web_search_module.web_search_policy = policy("web_search", attempts=3)
+    search.base_url = f"{base}/flaky"
+    results = [timed(lambda: search.search("q")) for _ in range(args.requests)]
+    ok = sum(outcome == "ok" for _, outcome in results)
+    print(f"flaky: {ok}/{args.requests} succeeded, {web_search_module.web_search_policy.retries} retries")
+    if ok != args.requests:
+        failures.append("flaky")
+
+    # Down upstream: breaker opens and later calls fail fast
+    tts_module.tts_policy = policy("tts", attempts=1)
+    tts.base_url = "http://127.0.0.1:9/down"
+    results = [timed(lambda: tts.text_to_speech("hello")) for _ in range(args.requests)]
+    fast = [elapsed for elapsed, outcome in results if outcome == "circuit open"]
+    print(f"down:  {len(results) - len(fast)} calls reached the network, {len(fast)} failed fast "
+          f"(p50 {statistics.median(fast) if fast else 0:.3f} ms), circuit {tts_module.tts_policy.breaker.state}")
+    if len(fast) != args.requests - 5:
+        failures.append("down")
+
+    # Tail latency: hedging after 200 ms against a 2 s straggler
+    tts.base_url = f"{base}/tail"
+    for hedge_after in (0, 0.2):
+        tts_module.tts_policy = policy("tts", read_timeout=5, hedge_after=hedge_after)
+        latencies = sorted(timed(lambda: tts.text_to_speech("hello"))[0] for _ in range(args.requests))
+        p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+        label = f"hedged at {hedge_after * 1000:.0f} ms" if hedge_after else "no hedging"
+        print(f"tail:  {label:<18} p50 {statistics.median(latencies):.0f} ms, p99 {p99:.0f} ms, "
+              f"{tts_module.tts_policy.hedges} hedges")
+        if hedge_after and p99 > 1000:
+            failures.append("tail")
+
+    server.shutdown()
+    if failures:
+        raise SystemExit(f"failed: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark retrieval quality and latency of BM25-only, vector-only and hybrid search
+
+Builds a synthetic course-catalogue document where every chunk mentions a unique
+course code and section number, then asks questions that name the code
+(exact-term queries) or only describe the course (semantic queries).
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_retrieval --chunks 10000 --queries 200
+"""
+
+import argparse
+import random
+import statistics
+import time
+from services.pdf_service import pdf_service
+from services.retrieval_service import BM25Index, retrieval_service, reciprocal_rank_fusion
+
+SUBJECTS = [
+    ("CS", "computer science", ["algorithms", "data structures", "operating systems", "compilers", "databases"]),
+    ("EE", "electrical engineering", ["circuits", "signal processing", "power systems", "control theory", "microelectronics"]),
+    ("ME", "mechanical engineering", ["thermodynamics", "fluid mechanics", "machine design", "robotics", "materials"]),
+    ("MA", "mathematics", ["linear algebra", "calculus", "probability", "number theory", "topology"]),
+    ("BI", "biology", ["genetics", "ecology", "microbiology", "neuroscience", "cell biology"]),
+]
+
+
+def build_corpus(num_chunks, seed=7):
+    """Generate chunk texts plus exact-term and semantic queries with their relevant chunks"""
+    rng = random.Random(seed)
+    chunks, exact_queries, semantic_queries = [], [], []
+    topic_chunks = {}
+    for i in range(num_chunks):
+        prefix, subject, topics = SUBJECTS[i % len(SUBJECTS)]
+        topic = topics[(i // len(SUBJECTS)) % len(topics)]
+        code = f"{prefix}{1000 + i}"
+        section = f"{i % 17 + 1}.{i % 7 + 1}.{i % 5 + 1}"
+        credits = rng.choice([2, 3, 4])
+        chunks.append(
+            f"Section {section}: {code} is a {credits}-credit course in {subject} covering {topic}. "
+            f"Students enrolled in {code} attend weekly lectures and labs, and assessment "
+            f"combines coursework with a final examination."
+        )
+        exact_queries.append((f"How many credits is {code}?", {i}))
+        # Every chunk on the same subject and topic is a correct semantic answer
+        relevant = topic_chunks.setdefault((subject, topic), set())
+        relevant.add(i)
+        semantic_queries.append((f"Which {subject} course teaches {topic}?", relevant))
+    return chunks, exact_queries, semantic_queries
+
+
+def evaluate(name, search, queries, top_k):
+    """Return hit rate @k and latency stats for a search function"""
+    hits, latencies = 0, []
+    for query, relevant in queries:
+        start = time.perf_counter()
+        ranked = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(i in relevant for i in ranked[:top_k])
+    latencies.sort()
+    return {
+        "method": name,
+        "recall": hits / len(queries),
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks, exact_queries, semantic_queries = build_corpus(args.chunks)
+
+    print(f"Embedding {len(chunks)} chunks...")
+    start = time.perf_counter()
+    embeddings = pdf_service.generate_embeddings(chunks)
+    print(f"  embeddings: {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    BM25Index.build(chunks)
+    print(f"  BM25 index: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    document = {
+        "id": "benchmark",
+        "chunks": [{"text": t, "embedding": e} for t, e in zip(chunks, embeddings)],
+    }
+    retrieval_service.invalidate("benchmark")
+
+    rng = random.Random(11)
+    query_sets = {
+        "exact-term": rng.sample(exact_queries, min(args.queries, len(exact_queries))),
+        "semantic": rng.sample(semantic_queries, min(args.queries, len(semantic_queries))),
+    }
+
+    # Query embeddings are computed up front so latencies measure ranking only
+    all_queries = [q for queries in query_sets.values() for q, _ in queries]
+    query_embeddings = dict(zip(all_queries, pdf_service.generate_embeddings(all_queries)))
+    top_k = args.top_k
+    candidates = retrieval_service.candidates
+
+    methods = {
+        "bm25": lambda q: retrieval_service.bm25_search(document, q, top_k),
+        "vector": lambda q: retrieval_service.vector_search(document, query_embeddings[q], top_k),
+        "hybrid": lambda q: [
+            i for i, _ in reciprocal_rank_fusion(
+                [retrieval_service.bm25_search(document, q, candidates),
+                 retrieval_service.vector_search(document, query_embeddings[q], candidates)],
+                k=retrieval_service.rrf_k,
+                top_k=top_k,
+            )
+        ],
+    }
+
+    print(f"\n{'queries':<12}{'method':<8}{'recall@' + str(top_k):>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for set_name, queries in query_sets.items():
+        for name, search in methods.items():
+            result = evaluate(name, search, queries, top_k)
+            print(f"{set_name:<12}{result['method']:<8}{result['recall']:>10.3f}"
+                  f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Check disconnect cancellation and resume of chat streams
+
+Runs the chat routes on a local uvicorn server with mongomock-motor and a stub
+LLM streaming --tokens tokens every --token-ms ms, then:
+  - resume:  drops the stream after a few events, reconnects with Last-Event-ID
+             and checks the replayed ids continue without gaps and the saved
+             answer is complete
+  - abandon: drops the stream and never returns; reports tokens generated
+             during and after the grace period and the partial answer saved
+
+Usage (from BACKEND/):
+    STREAM_RESUME_GRACE_SECONDS=1 python -m benchmarks.bench_stream_resume
+"""
+
+import argparse
+import asyncio
+import time
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+from config.settings import settings
+from routes import chat_routes
+from services.chat_service import ChatService
+from utils.auth import create_access_token
+from benchmarks.bench_chat_start import StubGroqClient
+
+
+class StubStreamingLLM:
+    def __init__(self, tokens, token_ms):
+        self.tokens = tokens
+        self.delay = token_ms / 1000
+        self.produced = 0
+
+    def generate_response_stream(self, prompt, context="", history=None, user_id=None):
+        for i in range(self.tokens):
+            time.sleep(self.delay)
+            self.produced += 1
+            yield f"t{i} "
+
+
+async def read_ids(response, stop_after=None):
+    ids = []
+    async for line in response.aiter_lines():
+        if line.startswith("id: "):
+            ids.append(int(line[len("id: "):]))
+            if stop_after and len(ids) >= stop_after:
+                break
+    return ids
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    database = AsyncMongoMockClient()["voxAI_bench"]
+    llm = StubStreamingLLM(args.tokens, args.token_ms)
+
+    def chat_service_factory():
+        chat_service = ChatService(database)
+        chat_service.groq_client = StubGroqClient(0)
+        return chat_service
+
+    app = FastAPI()
+    app.include_router(chat_routes.router, prefix="/api/v1")
+    app.dependency_overrides[chat_routes.get_chat_service] = chat_service_factory
+    app.dependency_overrides[chat_routes.get_llm_service] = lambda: llm
+
+    server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench-user'})}"}
+    chat = await ChatService(database).create_chat("bench-user", "smart", "", title="Benchmark")
+    stream_path = f"/api/v1/chat/{chat['_id']}/stream"
+    print(f"stub LLM: {args.tokens} tokens every {args.token_ms} ms, "
+          f"grace {settings.STREAM_RESUME_GRACE_SECONDS} s")
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", headers=headers, timeout=60) as http:
+            async with http.stream("POST", stream_path, json={"content": "resume"}) as response:
+                stream_id = response.headers["X-Stream-Id"]
+                before = await read_ids(response, stop_after=5)
+            await asyncio.sleep(0.2)
+            async with http.stream("GET", f"{stream_path}/{stream_id}",
+                                   headers={"Last-Event-ID": str(before[-1])}) as response:
+                after = await read_ids(response)
+            messages = (await http.get(f"{stream_path.rsplit('/', 1)[0]}/messages")).json()
+            contiguous = before + after == list(range(1, len(before) + len(after) + 1))
+            complete = messages[-1]["content"].strip().endswith(f"t{args.tokens - 1}")
+            print(f"resume:  events {before[0]}-{before[-1]} then {after[0]}-{after[-1]}, "
+                  f"contiguous {contiguous}, saved answer complete {complete}")
+
+            produced = llm.produced
+            async with http.stream("POST", stream_path, json={"content": "abandon"}) as response:
+                await read_ids(response, stop_after=5)
+            started = llm.produced
+            await asyncio.sleep(settings.STREAM_RESUME_GRACE_SECONDS + 0.5)
+            cancelled = llm.produced
+            await asyncio.sleep(args.tokens * args.token_ms / 1000)
+            messages = (await http.get(f"{stream_path.rsplit('/', 1)[0]}/messages")).json()
+            print(f"abandon: {started - produced} tokens before disconnect, {cancelled - started} during grace, "
+                  f"{llm.produced - cancelled} after; saved {len(messages[-1]['content'].split())} of {args.tokens}")
+            if not contiguous or not complete or llm.produced - cancelled > 1:
+                raise SystemExit("stream resume/cancellation check failed")
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
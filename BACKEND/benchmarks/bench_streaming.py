@@ -0,0 +1,140 @@
+"""
+Benchmark concurrent SSE streams in one worker
+
+A stub LLM stream yields --tokens tokens, sleeping --token-ms between them
+like a blocking Groq stream. --streams clients stream at once from a single
+uvicorn worker, through:
+  - legacy:    the blocking generator iterated inside the async generator
+  - threaded:  utils.sse.stream_in_thread, one event per token
+  - coalesced: utils.sse.stream_in_thread with the configured flush interval
+and reports time to first byte, total stream time, and network reads per
+stream (roughly the writes the server made).
+
+A final pass disconnects every client after a few events and counts the
+tokens the stub still produced: at most the token in flight per stream,
+instead of the rest of every answer.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_streaming --streams 50 --tokens 200 --token-ms 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from config.settings import settings
+from utils.sse import HEARTBEAT, event_stream_response, format_event, stream_in_thread
+
+
+class StubStream:
+    """Counts tokens produced so the disconnect pass can check for leaks"""
+
+    def __init__(self, tokens, token_ms):
+        self.tokens = tokens
+        self.delay = token_ms / 1000
+        self.produced = 0
+        self.lock = threading.Lock()
+
+    def generate(self):
+        for i in range(self.tokens):
+            time.sleep(self.delay)
+            with self.lock:
+                self.produced += 1
+            yield f"tok{i}\n" if i % 20 == 19 else f"tok{i} "
+
+
+def build_app(stub):
+    app = FastAPI()
+
+    @app.get("/legacy")
+    async def legacy():
+        async def events():
+            for chunk in stub.generate():
+                yield f"data: {chunk}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    def threaded_events(flush_interval):
+        async def events():
+            async for text in stream_in_thread(stub.generate(), flush_interval=flush_interval):
+                yield HEARTBEAT if text is None else format_event(text)
+            yield format_event("[DONE]", event="done")
+        return event_stream_response(events())
+
+    @app.get("/threaded")
+    async def threaded():
+        return threaded_events(0)
+
+    @app.get("/coalesced")
+    async def coalesced():
+        return threaded_events(settings.SSE_FLUSH_INTERVAL)
+
+    return app
+
+
+async def consume(http, path, stop_after=None):
+    start = time.perf_counter()
+    first = None
+    reads = 0
+    async with http.stream("GET", path) as response:
+        async for _ in response.aiter_raw():
+            reads += 1
+            if first is None:
+                first = time.perf_counter() - start
+            if stop_after and reads >= stop_after:
+                break
+    return first * 1000, (time.perf_counter() - start) * 1000, reads
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    stub = StubStream(args.tokens, args.token_ms)
+    server = uvicorn.Server(uvicorn.Config(build_app(stub), port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    limits = httpx.Limits(max_connections=args.streams)
+    paths = ["/threaded", "/coalesced"] if args.skip_legacy else ["/legacy", "/threaded", "/coalesced"]
+    print(f"{args.streams} streams x {args.tokens} tokens every {args.token_ms} ms "
+          f"(ideal stream time {args.tokens * args.token_ms:.0f} ms)")
+    print(f"{'path':<12}{'ttfb p50':>10}{'ttfb p95':>10}{'total p50':>11}{'total p95':>11}{'reads':>8}")
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=300) as http:
+            for path in paths:
+                results = await asyncio.gather(*(consume(http, path) for _ in range(args.streams)))
+                ttfb = [r[0] for r in results]
+                total = [r[1] for r in results]
+                reads = statistics.mean(r[2] for r in results)
+                print(f"{path[1:]:<12}{statistics.median(ttfb):>10.0f}{percentile(ttfb, 0.95):>10.0f}"
+                      f"{statistics.median(total):>11.0f}{percentile(total, 0.95):>11.0f}{reads:>8.0f}")
+
+            await asyncio.sleep(0.5)
+            await asyncio.gather(*(consume(http, "/coalesced", stop_after=3) for _ in range(args.streams)))
+            produced = stub.produced
+            await asyncio.sleep(args.tokens * args.token_ms / 1000 + 0.5)
+            print(f"tokens produced after all clients disconnected: {stub.produced - produced}")
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
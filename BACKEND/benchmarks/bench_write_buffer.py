@@ -0,0 +1,107 @@
+"""
+Check that MessageWriteBuffer recovers from failed flushes
+
+Voice sessions queue their messages in a MessageWriteBuffer. These cases
+make a flush fail and then flush again:
+  - insert fails:  insert_many raises before anything is stored
+  - bump fails:    the messages are stored but the chat updated_at bump
+                   raises, so the retry meets documents that already exist
+  - outage:        every flush fails; pending messages stay capped at
+                   max_pending, oldest dropped
+After the failure clears, every message must be stored exactly once and
+nothing left pending. Exits 1 on the first case that doesn't hold.
+
+Uses MONGODB_URI (scratch database, dropped afterwards) or, with
+--in-memory, mongomock-motor.
+
+Usage (from BACKEND/):
+    python -m benchmarks.bench_write_buffer --in-memory
+"""
+
+import argparse
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from config.settings import settings
+from services.chat_service import ChatService, MessageWriteBuffer
+
+
+class FailingCollection:
+    """Wraps a Motor collection; the named method raises while failures > 0"""
+
+    def __init__(self, collection, method, failures):
+        self._collection = collection
+        self._method = method
+        self.failures = failures
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name != self._method:
+            return attribute
+
+        async def call(*args, **kwargs):
+            if self.failures > 0:
+                self.failures -= 1
+                if name == "bulk_write":
+                    await attribute(*args, **kwargs)  # Write lands, then the reply is lost
+                raise ConnectionError(f"{name}: connection reset")
+            return await attribute(*args, **kwargs)
+        return call
+
+
+async def run_case(database, name, collection, method, failures, messages, max_pending=None):
+    chat_service = ChatService(database)
+    chat = await chat_service.create_chat("bench-user", "voice", "", title=name)
+    failing = FailingCollection(getattr(chat_service, collection), method, failures)
+    setattr(chat_service, collection, failing)
+
+    buffer = MessageWriteBuffer(chat_service, max_size=10_000, interval=3600, max_pending=max_pending)
+    for i in range(messages):
+        await buffer.add(chat["_id"], "user", f"{name} {i}")
+
+    attempts = 0
+    while buffer._pending and attempts < failures + 2:
+        await buffer.flush()
+        attempts += 1
+
+    stored = await database.messages.count_documents({"chat_id": chat["_id"]})
+    contents = await database.messages.distinct("content", {"chat_id": chat["_id"]})
+    expected = messages - buffer.dropped
+    ok = stored == expected and len(contents) == stored and not buffer._pending
+    print(f"{name:<14}{attempts:>9}{stored:>8}{expected:>10}{buffer.dropped:>9}{len(buffer._pending):>9}  "
+          f"{'ok' if ok else 'FAILED'}")
+    return ok
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="voxAI_bench")
+    args = parser.parse_args()
+
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        client = AsyncIOMotorClient(settings.MONGODB_URI)
+    database = client[args.database]
+
+    print(f"{'case':<14}{'flushes':>9}{'stored':>8}{'expected':>10}{'dropped':>9}{'pending':>9}")
+    try:
+        results = [
+            await run_case(database, "insert fails", "messages_collection", "insert_many", 2, args.messages),
+            await run_case(database, "bump fails", "chats_collection", "bulk_write", 2, args.messages),
+            await run_case(database, "outage", "messages_collection", "insert_many", 5, args.messages,
+                           max_pending=args.messages // 2),
+        ]
+    finally:
+        await client.drop_database(args.database)
+        client.close()
+
+    if not all(results):
+        raise SystemExit("FAIL: buffered messages lost or duplicated after a failed flush")
+    print("OK: failed flushes are retried without duplicates")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
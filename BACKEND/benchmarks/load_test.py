@@ -0,0 +1,430 @@
+"""
+Load test the backend end to end against local stub upstreams
+
+Starts the stub Groq / ElevenLabs / Tavily server (benchmarks.stub_upstreams)
+and the real app from main.py on its own thread, with the settings pointed at
+the stubs. Then --concurrency virtual users each sign up once and loop over
+the --scenarios until --duration runs out:
+  - auth:  POST /auth/login, GET /auth/me
+  - ask:   POST /ask (smart mode, one non-streaming completion)
+  - web:   POST /ask (web mode, a Tavily search)
+  - chat:  POST /chat/start/stream over SSE (time to first token and to
+           [DONE]), then GET /chat/list
+  - voice: a /voice-chat WebSocket session of --voice-turns turns, each a
+           synthetic voiced utterance followed by silence; timed from the
+           end of the utterance to the reply (STT, LLM and TTS)
+
+Reports requests, errors, throughput and p50 / p95 / p99 per endpoint, and
+writes them to --output as JSON. With --compare, prints the change against a
+previous run's JSON and, with --fail-over, exits 1 if any endpoint's p95 got
+slower by more than that many percent.
+
+Whisper runs on this machine's CPU, so by default the STT call is replaced by
+a --stt-ms sleep (still blocking, like the real call); --real-stt keeps it.
+Uses MONGODB_URI (scratch database, dropped afterwards) or, with --in-memory,
+mongomock-motor. --target drives an already running backend instead (the
+stubs and the STT replacement are then up to that deployment).
+
+Usage (from BACKEND/):
+    python -m benchmarks.load_test --in-memory --concurrency 20 --duration 30 --output baseline.json
+    python -m benchmarks.load_test --in-memory --concurrency 20 --duration 30 --compare baseline.json --fail-over 15
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import httpx
+import numpy as np
+import uvicorn
+import websockets
+from pymongo import MongoClient
+from benchmarks.stub_upstreams import StubUpstreams, add_latency_arguments, latency_from_args
+
+SCENARIOS = ("auth", "ask", "web", "chat", "voice")
+API = "/api/v1"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Recorder:
+    """Latency samples and outcomes per endpoint"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def record(self, name, elapsed_ms, error=None):
+        self.samples[name].append(elapsed_ms)
+        if error:
+            self.errors[name][str(error)] += 1
+
+    def report(self, duration):
+        endpoints = {}
+        for name in sorted(self.samples):
+            values = self.samples[name]
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": sum(self.errors[name].values()),
+                "error_kinds": dict(self.errors[name]),
+                "throughput_rps": round(len(values) / duration, 2),
+                "p50_ms": round(percentile(values, 0.50), 1),
+                "p95_ms": round(percentile(values, 0.95), 1),
+                "p99_ms": round(percentile(values, 0.99), 1),
+                "max_ms": round(max(values), 1),
+            }
+        return endpoints
+
+
+def synthetic_utterance(duration_ms, sample_rate, frame_ms):
+    """
+    16-bit PCM frames of a voiced sound (a 140 Hz harmonic series with a
+    syllable-rate envelope) that WebRTC VAD classifies as speech
+    """
+    t = np.arange(int(sample_rate * duration_ms / 1000)) / sample_rate
+    signal = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 20))
+    signal *= 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    pcm = (signal / np.abs(signal).max() * 12000).astype(np.int16).tobytes()
+    frame_bytes = sample_rate * frame_ms // 1000 * 2
+    return [pcm[i:i + frame_bytes] for i in range(0, len(pcm) - frame_bytes + 1, frame_bytes)]
+
+
+class VirtualUser:
+    def __init__(self, index, run_id, base_url, http, recorder, args, audio):
+        self.index = index
+        self.email = f"load-{run_id}-{index}@example.com"
+        self.base_url = base_url
+        self.http = http
+        self.recorder = recorder
+        self.args = args
+        self.audio = audio
+        self.user_id = None
+        self.headers = {}
+
+    async def request(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.record(name, (time.perf_counter() - start) * 1000, type(e).__name__)
+            return None
+        error = f"HTTP {response.status_code}" if response.status_code >= 400 else None
+        self.recorder.record(name, (time.perf_counter() - start) * 1000, error)
+        return response if error is None else None
+
+    async def signup(self):
+        response = await self.request("POST /auth/signup", "POST", f"{API}/auth/signup", json={
+            "email": self.email, "password": "load-test-pass", "confirm_password": "load-test-pass",
+            "name": f"Load User {self.index}", "mobile": "5550100", "date_of_birth": "1990-01-01",
+            "gender": "other", "country": "Nowhere",
+        })
+        if response is None:
+            return False
+        body = response.json()
+        self.user_id = body["user"]["id"]
+        self.headers = {"Authorization": f"Bearer {body['access_token']}"}
+        return True
+
+    async def auth(self):
+        await self.request("POST /auth/login", "POST", f"{API}/auth/login",
+                           json={"email": self.email, "password": "load-test-pass"})
+        await self.request("GET /auth/me", "GET", f"{API}/auth/me", headers=self.headers)
+
+    async def ask(self):
+        await self.request("POST /ask", "POST", f"{API}/ask", json={
+            "query": "Give me three tips for learning to cook", "mode": "smart"}, headers=self.headers)
+
+    async def web(self):
+        await self.request("POST /ask (web)", "POST", f"{API}/ask", json={
+            "query": "Latest news on renewable energy", "mode": "web"}, headers=self.headers)
+
+    async def chat(self):
+        body = {"user_id": self.user_id, "mode": "smart", "first_message": "How do I apply for the exchange program?"}
+        start = time.perf_counter()
+        event = None
+        first_token = None
+        error = None
+        try:
+            async with self.http.stream("POST", f"{API}/chat/start/stream", json=body, headers=self.headers) as response:
+                if response.status_code >= 400:
+                    error = f"HTTP {response.status_code}"
+                else:
+                    async for line in response.aiter_lines():
+                        if line.startswith("event: "):
+                            event = line[len("event: "):]
+                        elif line.startswith("data: "):
+                            if event == "error":
+                                error = "SSE error event"
+                            elif event is None and line != "data: [DONE]" and first_token is None:
+                                first_token = (time.perf_counter() - start) * 1000
+                        elif not line:
+                            event = None
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        if first_token is not None:
+            self.recorder.record("SSE /chat/start/stream first token", first_token)
+        self.recorder.record("SSE /chat/start/stream", (time.perf_counter() - start) * 1000, error)
+        await self.request("GET /chat/list", "GET", f"{API}/chat/list", headers=self.headers)
+
+    async def voice(self):
+        speech, silence = self.audio
+        frame_seconds = self.args.frame_ms / 1000
+        url = self.base_url.replace("http", "ws", 1) + f"{API}/voice-chat"
+        start = time.perf_counter()
+        try:
+            async with websockets.connect(url, max_size=None, open_timeout=30) as websocket:
+                await websocket.send(json.dumps({"user_id": self.user_id, "mode": "voice"}))
+                self.recorder.record("WS /voice-chat connect", (time.perf_counter() - start) * 1000)
+                for _ in range(self.args.voice_turns):
+                    for frame in itertools.chain(speech, silence):
+                        await websocket.send(frame)
+                        if self.args.realtime_audio:
+                            await asyncio.sleep(frame_seconds)
+                    start = time.perf_counter()
+                    reply = json.loads(await asyncio.wait_for(websocket.recv(), self.args.timeout))
+                    self.recorder.record("WS /voice-chat turn", (time.perf_counter() - start) * 1000,
+                                         reply.get("error"))
+        except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+            self.recorder.record("WS /voice-chat turn", (time.perf_counter() - start) * 1000, type(e).__name__)
+
+    async def run(self, scenarios, deadline):
+        # Users start at different points of the cycle, so the mix is even at any moment
+        cycle = itertools.islice(itertools.cycle(scenarios), self.index % len(scenarios), None)
+        for scenario in cycle:
+            if time.monotonic() >= deadline:
+                break
+            await getattr(self, scenario)()
+
+
+class InProcessBackend:
+    """main.app served by uvicorn on its own thread and event loop"""
+
+    def __init__(self, app, port):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets"))
+        self.thread = threading.Thread(target=self.server.run, name="backend", daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise SystemExit(f"Backend failed to start on {self.url}")
+            time.sleep(0.05)
+
+    def wait_ready(self, timeout):
+        """Wait for /ready, so warm-up doesn't land in the measurements"""
+        deadline = time.monotonic() + timeout
+        while True:
+            response = httpx.get(f"{self.url}/ready", timeout=timeout)
+            if response.status_code == 200:
+                return
+            if response.json()["status"] == "failed" or time.monotonic() >= deadline:
+                raise SystemExit(f"Backend not ready: {response.json()}")
+            time.sleep(0.2)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def load_backend(args, stubs):
+    """
+    Import the app with its settings pointed at the stubs; settings and
+    service clients are created at import time, so this runs after the
+    environment is set
+    """
+    os.environ.update(stubs.environment())
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Only warm up what the scenarios use (no embedding model; Whisper only when it runs)
+    os.environ.setdefault("WARMUP_COMPONENTS", "mongo,imports,llm" + (",whisper" if args.real_stt else ""))
+    if not args.keep_admission_limits:
+        # One virtual user makes far more calls than a person; don't measure 429s
+        os.environ["ADMISSION_USER_RATE_PER_MINUTE"] = "1000000"
+        os.environ["ADMISSION_USER_BURST"] = "1000000"
+
+    from config.database import Database
+    from config.settings import settings
+    import main
+
+    settings.DATABASE_NAME = args.database
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+
+        async def init_in_memory(cls):
+            cls.client = AsyncMongoMockClient()
+            cls.db = cls.client[settings.DATABASE_NAME]
+
+        Database.init_db = classmethod(init_in_memory)
+
+    if not args.real_stt:
+        from services.stt_service import stt_service
+
+        def transcribe_audio(audio_data, user_id=None):
+            time.sleep(args.stt_ms / 1000)
+            return "What is the weather like today?"
+
+        stt_service.transcribe_audio = transcribe_audio
+
+    return main.app, settings
+
+
+def print_report(endpoints):
+    print(f"{'endpoint':<38}{'reqs':>7}{'errors':>8}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, row in endpoints.items():
+        print(f"{name:<38}{row['requests']:>7}{row['errors']:>8}{row['throughput_rps']:>8.1f}"
+              f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}")
+        for kind, count in row["error_kinds"].items():
+            print(f"    {count} x {kind}")
+
+
+def compare(endpoints, baseline, fail_over=None):
+    """
+    Print latency and throughput changes against a baseline run
+    Returns:
+        list: Endpoints whose p95 regressed by more than fail_over percent
+    """
+    def change(new, old):
+        return (new - old) / old * 100 if old else math.inf if new else 0.0
+
+    regressions = []
+    print(f"\nvs baseline {baseline['started_at']} ({baseline['config']['concurrency']} users, "
+          f"{baseline['config']['duration']} s)")
+    print(f"{'endpoint':<38}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'errors':>9}")
+    for name in sorted(set(endpoints) | set(baseline["endpoints"])):
+        new, old = endpoints.get(name), baseline["endpoints"].get(name)
+        if new is None or old is None:
+            print(f"{name:<38}  {'only in this run' if old is None else 'only in baseline'}")
+            continue
+        deltas = [change(new[key], old[key]) for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")]
+        print(f"{name:<38}" + "".join(f"{delta:>+8.0f}%" for delta in deltas) + f"{new['errors'] - old['errors']:>+9}")
+        if fail_over is not None and deltas[1] > fail_over:
+            regressions.append(name)
+    return regressions
+
+
+async def drive(args, base_url, audio):
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as http:
+        users = [VirtualUser(i, run_id, base_url, http, recorder, args, audio) for i in range(args.concurrency)]
+        signed_up = await asyncio.gather(*(user.signup() for user in users))
+        users = [user for user, ok in zip(users, signed_up) if ok]
+        if not users:
+            print_report(recorder.report(1))
+            raise SystemExit("No virtual user could sign up")
+
+        start = time.monotonic()
+        await asyncio.gather(*(user.run(args.scenarios, start + args.duration) for user in users))
+        elapsed = time.monotonic() - start
+    # Signups happened before the timed window; only rate the loop
+    return recorder.report(elapsed), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=10, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load after signup")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma separated, from: " + ", ".join(SCENARIOS))
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="Write the results here as JSON")
+    parser.add_argument("--compare", help="Results JSON of a previous run")
+    parser.add_argument("--fail-over", type=float, help="Exit 1 if a p95 is this many percent slower than --compare")
+    parser.add_argument("--target", help="Base URL of a running backend instead of the in-process app")
+    parser.add_argument("--port", type=int, default=8766, help="In-process backend port")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="voxAI_load")
+    parser.add_argument("--keep-admission-limits", action="store_true",
+                        help="Keep the per-user rate limit (by default it is lifted)")
+    parser.add_argument("--voice-turns", type=int, default=2)
+    parser.add_argument("--utterance-ms", type=int, default=1500)
+    parser.add_argument("--realtime-audio", action="store_true", help="Send audio frames at real-time pace")
+    parser.add_argument("--stt-ms", type=float, default=300, help="Stand-in STT latency")
+    parser.add_argument("--real-stt", action="store_true", help="Run Whisper instead of the stand-in")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    stubs = None
+    backend = None
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if args.target:
+        base_url = args.target.rstrip("/")
+        sample_rate, frame_ms, silence_seconds = 16000, 30, 1.5
+    else:
+        stubs = StubUpstreams(latency_from_args(args), port=args.stub_port).start()
+        app, settings = load_backend(args, stubs)
+        backend = InProcessBackend(app, args.port)
+        backend.start()
+        backend.wait_ready(args.timeout)
+        base_url = backend.url
+        sample_rate, frame_ms, silence_seconds = settings.SAMPLE_RATE, settings.FRAME_DURATION, settings.SILENCE_THRESHOLD
+    args.frame_ms = frame_ms
+
+    speech = synthetic_utterance(args.utterance_ms, sample_rate, frame_ms)
+    # VAD keeps reporting speech for a few frames after it stops; pad past that hangover
+    silence = [bytes(len(speech[0]))] * (math.ceil(silence_seconds * 1000 / frame_ms) + 10)
+
+    try:
+        endpoints, elapsed = asyncio.run(drive(args, base_url, (speech, silence)))
+    finally:
+        if backend:
+            backend.stop()
+            if not args.in_memory:
+                # The app's Motor client closed with its loop; drop the scratch database with pymongo
+                with MongoClient(settings.MONGODB_URI) as mongo:
+                    mongo.drop_database(args.database)
+        if stubs:
+            stubs.stop()
+
+    print(f"{len(args.scenarios)} scenarios x {args.concurrency} users for {elapsed:.1f} s against {base_url}")
+    if stubs:
+        print(f"stub upstream calls: {stubs.requests}")
+    print()
+    print_report(endpoints)
+
+    results = {
+        "started_at": started_at,
+        "config": {
+            "concurrency": args.concurrency, "duration": args.duration, "scenarios": args.scenarios,
+            "target": args.target, "in_memory": args.in_memory, "stt_ms": None if args.real_stt else args.stt_ms,
+            "stub_latency": None if args.target else vars(latency_from_args(args)),
+            "python": platform.python_version(), "cpus": os.cpu_count(),
+        },
+        "elapsed_s": round(elapsed, 2),
+        "upstream_calls": stubs.requests if stubs else None,
+        "endpoints": endpoints,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    if baseline:
+        regressions = compare(endpoints, baseline, args.fail_over)
+        if regressions:
+            raise SystemExit(f"p95 regressed by more than {args.fail_over:.0f}%: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Local stand-ins for Groq, ElevenLabs and Tavily with configurable latency
+
+One HTTP server answers:
+  - POST /openai/v1/chat/completions   Groq chat completions; non-streaming
+                                       replies after --llm-ms, streaming ones
+                                       send the first token after --ttft-ms and
+                                       one more every --token-ms
+  - POST /v1/text-to-speech/{voice_id} ElevenLabs TTS, --tts-ms then
+                                       --tts-bytes of fake MP3
+  - POST /v1/text-to-speech/{voice_id}/stream
+                                       the same, first chunk after --tts-ms
+  - POST /search                       Tavily search, after --search-ms
+  - GET  /stub/stats                   requests served per upstream
+
+The load test starts it in-process (see benchmarks.load_test); it can also run
+on its own, printing the environment that points the backend at it.
+
+Usage (from BACKEND/):
+    python -m benchmarks.stub_upstreams --port 9100 --ttft-ms 300 --token-ms 20
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+_WORDS = "Sure! Here is a short answer with a few words to stream back to the client.".split()
+
+
+@dataclass
+class StubLatency:
+    llm_ms: float = 800.0  # Whole non-streaming completion
+    ttft_ms: float = 300.0  # Streaming: time to first token
+    token_ms: float = 20.0  # Streaming: delay between tokens
+    tokens: int = 40  # Tokens per completion
+    tts_ms: float = 400.0
+    tts_bytes: int = 32 * 1024
+    search_ms: float = 600.0
+
+
+def completion_text(tokens):
+    return " ".join(_WORDS[i % len(_WORDS)] for i in range(tokens))
+
+
+def create_stub_app(latency=None):
+    """
+    Create the stub upstream app
+    Args:
+        latency (StubLatency): Delays and sizes; may be changed while serving
+    Returns:
+        FastAPI: App with a `requests` Counter in app.state
+    """
+    latency = latency or StubLatency()
+    app = FastAPI(title="VoxAI stub upstreams")
+    app.state.latency = latency
+    app.state.requests = Counter()
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests["groq"] += 1
+        model = body.get("model", "stub")
+        created = int(time.time())
+        tokens = min(latency.tokens, body.get("max_tokens") or latency.tokens)
+        usage = {"prompt_tokens": sum(len(m.get("content", "").split()) for m in body.get("messages", [])),
+                 "completion_tokens": tokens}
+        usage["total_tokens"] = usage["prompt_tokens"] + tokens
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency.llm_ms / 1000)
+            return {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": completion_text(tokens)},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        def chunk(delta, finish_reason=None):
+            data = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            await asyncio.sleep(latency.ttft_ms / 1000)
+            for i in range(tokens):
+                if i:
+                    await asyncio.sleep(latency.token_ms / 1000)
+                yield chunk({"content": _WORDS[i % len(_WORDS)] + " "})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/text-to-speech/{voice_id}")
+    async def text_to_speech(voice_id: str):
+        app.state.requests["tts"] += 1
+        await asyncio.sleep(latency.tts_ms / 1000)
+        return Response(b"\xff\xfb" + bytes(latency.tts_bytes - 2), media_type="audio/mpeg")
+
+    @app.post("/v1/text-to-speech/{voice_id}/stream")
+    async def text_to_speech_stream(voice_id: str):
+        app.state.requests["tts_stream"] += 1
+
+        async def chunks():
+            await asyncio.sleep(latency.tts_ms / 1000)
+            remaining = latency.tts_bytes
+            while remaining > 0:
+                size = min(4096, remaining)
+                remaining -= size
+                yield bytes(size)
+                await asyncio.sleep(0)
+
+        return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        app.state.requests["tavily"] += 1
+        await asyncio.sleep(latency.search_ms / 1000)
+        query = body.get("query", "")
+        return {
+            "query": query,
+            "answer": f"Stub answer for: {query}" if body.get("include_answer") else None,
+            "results": [{"title": f"Result {i}", "url": f"https://example.com/{i}",
+                         "content": completion_text(20), "score": 1 - i / 10}
+                        for i in range(body.get("max_results", 5))],
+        }
+
+    @app.get("/stub/stats")
+    async def stats():
+        return JSONResponse(dict(app.state.requests))
+
+    return app
+
+
+class StubUpstreams:
+    """
+    Runs the stub app on its own thread and event loop, so upstream latency
+    doesn't compete with the backend under test for its loop.
+        with StubUpstreams(port=9100) as stubs:
+            os.environ.update(stubs.environment())
+    """
+
+    def __init__(self, latency=None, host="127.0.0.1", port=9100):
+        self.app = create_stub_app(latency)
+        self.host = host
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def requests(self):
+        return dict(self.app.state.requests)
+
+    def environment(self):
+        """Settings that point the backend at the stubs (read when config.settings is imported)"""
+        return {
+            "GROQ_BASE_URL": self.url,
+            "GROQ_API_KEY": "stub",
+            "ELEVENLABS_BASE_URL": f"{self.url}/v1",
+            "ELEVENLABS_API_KEY": "stub",
+            "ELEVENLABS_VOICE_ID": "stub-voice",
+            "TAVILY_BASE_URL": self.url,
+            "TAVILY_API_KEY": "stub",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.run, name="stub-upstreams", daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"Stub upstreams failed to start on {self.url}")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def add_latency_arguments(parser):
+    defaults = StubLatency()
+    group = parser.add_argument_group("stub upstream latency")
+    group.add_argument("--llm-ms", type=float, default=defaults.llm_ms, help="Non-streaming completion")
+    group.add_argument("--ttft-ms", type=float, default=defaults.ttft_ms, help="Streaming first token")
+    group.add_argument("--token-ms", type=float, default=defaults.token_ms, help="Streaming inter-token delay")
+    group.add_argument("--tokens", type=int, default=defaults.tokens, help="Tokens per completion")
+    group.add_argument("--tts-ms", type=float, default=defaults.tts_ms)
+    group.add_argument("--tts-bytes", type=int, default=defaults.tts_bytes)
+    group.add_argument("--search-ms", type=float, default=defaults.search_ms)
+
+
+def latency_from_args(args):
+    return StubLatency(llm_ms=args.llm_ms, ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens,
+                       tts_ms=args.tts_ms, tts_bytes=args.tts_bytes, search_ms=args.search_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    stubs = StubUpstreams(latency_from_args(args), host=args.host, port=args.port)
+    for name, value in stubs.environment().items():
+        print(f"export {name}={value}")
+    uvicorn.run(stubs.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from config.settings import settings
+from utils.metrics import MongoCommandMetrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,7 +16,8 @@ class Database:
             cls.client = AsyncIOMotorClient(
                 settings.MONGODB_URI,
                 serverSelectionTimeoutMS=5000,  # 5 second timeout
-                connectTimeoutMS=5000
+                connectTimeoutMS=5000,
+                event_listeners=[MongoCommandMetrics()]  # mongo_command_duration_seconds
             )
             cls.db = cls.client[settings.DATABASE_NAME]
             # Test the connection
@@ -26,6 +28,13 @@ class Database:
             # Don't raise - allow app to start even if DB connection fails initially
             logger.warning("App will start without database connection")
 
+    @classmethod
+    async def ping(cls):
+        """Ping the server; raises if it doesn't answer or there is no client"""
+        if cls.client is None:
+            raise ConnectionError("Database client not initialized")
+        await cls.client.admin.command('ping')
+
     @classmethod
     async def close_db(cls):
         """Close database connection"""
@@ -1,26 +1,150 @@
+import atexit
+import copy
+import json
 import logging
 import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config.settings import settings
+from utils.log_context import request_id_var, session_id_var
+
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Runs in the caller's thread before a record is queued: stamps the request
+    and session ids (contextvars are only visible here), then truncates long
+    messages and samples the ones that were too long.
+    """
+
+    def __init__(self, max_chars, large_sample_every=1):
+        super().__init__()
+        self.max_chars = max_chars
+        self.large_sample_every = large_sample_every
+        self._large_counts = {}
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+
+        # Resolve the message once here (args may not be safe to use later)
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            if record.levelno < logging.WARNING and self.large_sample_every > 1:
+                # Keep every Nth oversized record per call site; warnings and errors always pass
+                site = (record.pathname, record.lineno)
+                count = self._large_counts.get(site, 0)
+                self._large_counts[site] = count + 1
+                if count % self.large_sample_every:
+                    return False
+            message = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} chars truncated]"
+        record.msg = message
+        record.args = None
+        return True
+
+
+class ContextQueueHandler(QueueHandler):
+    def prepare(self, record):
+        # ContextFilter already resolved the message; keep the traceback
+        # separate, so the JSON formatter can put it in its own field
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        session_id = getattr(record, "session_id", None)
+        if session_id:
+            entry["session_id"] = session_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic console format, plus the request id when there is one"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [{request_id}]" if request_id else line
+
+
+def setup_logging(log_dir="logs", stream=None):
+    """
+    Set up logging: the caller only enqueues records; a QueueListener thread
+    formats them and does the file and console I/O. The file is JSON lines,
+    rotated by size.
+    Args:
+        log_dir (str): Directory for voxAI.log
+        stream: Console stream (default stderr)
+    """
+    global _listener
+    if _listener is not None:
+        return logging.getLogger(__name__)
 
-def setup_logging():
-    """Set up logging configuration"""
     # Create logs directory if it doesn't exist
-    log_dir = "logs"
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(os.path.join(log_dir, "voxAI.log")),
-            logging.StreamHandler()
-        ]
+    os.makedirs(log_dir, exist_ok=True)
+
+    file_handler = RotatingFileHandler(
+        os.path.join(log_dir, "voxAI.log"),
+        maxBytes=settings.LOG_MAX_BYTES,
+        backupCount=settings.LOG_BACKUP_COUNT,
+        encoding="utf-8"
     )
-    
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler(stream or sys.stderr)
+    console_handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter(settings.LOG_MAX_MESSAGE_CHARS, settings.LOG_LARGE_MESSAGE_SAMPLE_EVERY))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL)
+
+    _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
     # Set specific log levels for different modules
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
     logging.getLogger("motor").setLevel(logging.WARNING)
     logging.getLogger("urllib3").setLevel(logging.WARNING)
-    
-    return logging.getLogger(__name__)
\ No newline at end of file
+
+    return logging.getLogger(__name__)
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
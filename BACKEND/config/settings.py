@@ -9,11 +9,113 @@ class Settings:
     ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
     TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
     ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID")
+    ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io/v1")
+    TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com")
     
     # Database
     MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
     DATABASE_NAME = "voxAI"
     
+    # Chat history pagination
+    CHAT_PAGE_SIZE = 50
+    CHAT_MAX_PAGE_SIZE = 200
+    MESSAGE_PAGE_SIZE = 100
+    MESSAGE_MAX_PAGE_SIZE = 500
+    
+    # How long /chat/start waits for the generated title after the answer is ready;
+    # past this it returns the provisional title and patches the chat later
+    CHAT_TITLE_WAIT_SECONDS = 2.0
+    
+    # Proxies (IPs/CIDRs) whose X-Forwarded-For / Forwarded headers are believed
+    TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1")
+    
+    # Admission control for upstream calls (utils/admission.py): in-flight caps per
+    # process and a per-user token bucket per upstream; over either we answer 429
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    STT_MAX_CONCURRENCY = int(os.getenv("STT_MAX_CONCURRENCY", "2"))  # Whisper runs on this machine's CPU
+    TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", "8"))
+    WEB_SEARCH_MAX_CONCURRENCY = int(os.getenv("WEB_SEARCH_MAX_CONCURRENCY", "8"))
+    ADMISSION_USER_RATE_PER_MINUTE = float(os.getenv("ADMISSION_USER_RATE_PER_MINUTE", "30"))
+    ADMISSION_USER_BURST = int(os.getenv("ADMISSION_USER_BURST", "10"))
+    ADMISSION_BUSY_RETRY_AFTER = 1.0  # Retry hint (seconds) when an upstream is at capacity
+    
+    # Upstream timeouts (connect, read) in seconds, retries and circuit breakers (utils/resilience.py)
+    LLM_CONNECT_TIMEOUT = 5.0
+    LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+    LLM_MAX_RETRIES = 2  # Done by the Groq client, with jittered backoff
+    CHAT_TITLE_TIMEOUT = 10.0  # Titles fall back to the provisional one, so no retries
+    TTS_CONNECT_TIMEOUT = 3.0
+    TTS_READ_TIMEOUT = float(os.getenv("TTS_READ_TIMEOUT", "20"))
+    # Hedging is opt-in: a hedge is a second billed request, and it fires exactly when the upstream is slow.
+    # > 0 races a duplicate request after this many seconds (it shares the first one's admission slot)
+    TTS_HEDGE_AFTER = float(os.getenv("TTS_HEDGE_AFTER", "0"))
+    WEB_SEARCH_CONNECT_TIMEOUT = 3.0
+    WEB_SEARCH_READ_TIMEOUT = float(os.getenv("WEB_SEARCH_READ_TIMEOUT", "15"))
+    WEB_SEARCH_HEDGE_AFTER = float(os.getenv("WEB_SEARCH_HEDGE_AFTER", "0"))
+    UPSTREAM_RETRY_ATTEMPTS = 3  # Idempotent calls only
+    UPSTREAM_RETRY_BASE_DELAY = 0.25
+    UPSTREAM_RETRY_MAX_DELAY = 2.0
+    CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failures before failing fast
+    CIRCUIT_RESET_SECONDS = 30.0  # Then one trial call is let through
+    HEDGE_THREADS = 32
+    
+    # Server-Sent Events streaming
+    SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "30")) / 1000  # Coalesce tokens for this long
+    SSE_HEARTBEAT_SECONDS = 15.0  # Comment line sent when the stream is idle this long
+    SSE_STREAM_THREADS = int(os.getenv("SSE_STREAM_THREADS", "64"))  # Concurrent upstream streams per worker
+    # Chat streams keep generating this long after the client disconnects, so it can
+    # resume with Last-Event-ID; then generation is cancelled and the partial answer saved
+    STREAM_RESUME_GRACE_SECONDS = float(os.getenv("STREAM_RESUME_GRACE_SECONDS", "5"))
+    STREAM_BUFFER_TTL_SECONDS = 60  # Finished streams stay resumable this long
+    
+    # User documents cached by id for profile reads; other workers may serve a
+    # stale profile for up to the TTL after an update
+    USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))  # 0 disables
+    USER_CACHE_SIZE = 10000
+    
+    # Blobs (profile photos, BM25 indexes): "gridfs" (MongoDB) or "local" (files under BLOB_DIR)
+    BLOB_STORE = os.getenv("BLOB_STORE", "gridfs")
+    BLOB_DIR = os.getenv("BLOB_DIR", "./data/blobs")
+    PROFILE_PHOTO_MAX_BYTES = 5 * 1024 * 1024
+    THUMBNAIL_SIZES = (64, 256)  # Pixels, longest side
+    
+    # Logging: JSON lines in logs/voxAI.log, rotated by size; console "text" or "json"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "1000"))  # Longer messages are truncated...
+    LOG_LARGE_MESSAGE_SAMPLE_EVERY = int(os.getenv("LOG_LARGE_MESSAGE_SAMPLE_EVERY", "1"))  # ...and only every Nth kept
+    
+    # Tracing (voice sessions and turns): "file" (JSON lines at TRACE_FILE), "console" or "none"
+    TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+    TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+    
+    # Startup warm-up, run in the background after startup; /ready answers 200 once all of these are:
+    # mongo (ping, retried, then missing indexes), imports (heavy modules, otherwise imported on first use),
+    # llm (Groq client), embedding (model + one inference), whisper (model + one inference).
+    # By default embedding is skipped when EMBEDDING_BACKEND is "remote" (the shared server holds the model)
+    # and whisper is opt-in, so workers that never transcribe don't load it
+    WARMUP_COMPONENTS = [
+        name.strip() for name in os.getenv(
+            "WARMUP_COMPONENTS",
+            "mongo,imports,llm" + ("" if os.getenv("EMBEDDING_BACKEND", "torch") == "remote" else ",embedding")
+        ).split(",")
+        if name.strip()
+    ]
+    WARMUP_MONGO_RETRY_SECONDS = 5.0
+    # Other failed components are retried after WARMUP_RETRY_SECONDS, doubling up to the max,
+    # so a transient failure (e.g. a model download timing out) doesn't keep the worker unready
+    WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+    WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "300"))
+    
+    # Chat message writes
+    CHAT_WRITE_TRANSACTIONS = os.getenv("CHAT_WRITE_TRANSACTIONS", "false").lower() == "true"  # Needs a replica set
+    CHAT_WRITE_BUFFER_SIZE = 20  # Voice sessions: flush after this many messages...
+    CHAT_WRITE_BUFFER_INTERVAL = 2.0  # ...or this many seconds
+    CHAT_WRITE_BUFFER_MAX_PENDING = int(os.getenv("CHAT_WRITE_BUFFER_MAX_PENDING", "1000"))  # Kept across failed flushes
+    
     # Audio settings
     SAMPLE_RATE = 16000
     FRAME_DURATION = 30  # ms
@@ -26,6 +128,32 @@ class Settings:
     # LLM settings
     GROQ_MODEL = "llama-3.1-8b-instant"
     
+    # Conversation memory sent with each LLM call
+    CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "3000"))
+    CONVERSATION_SUMMARY_TOKENS = 500  # Part of the budget reserved for the rolling summary
+    CONVERSATION_CACHE_SIZE = 1000  # Chats kept in memory per worker
+    
+    # Embedding / PDF chunking settings
+    EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+    EMBEDDING_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_MAX_TOKENS = 256  # Inputs longer than this are truncated by the model
+    EMBEDDING_DIMENSION = 384
+    # "torch", "onnx", or "remote" to use the shared embedding server
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    # Path or file in the model repo; e.g. "onnx/model_qint8_avx512_vnni.onnx" for int8
+    EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+    EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0 = runtime default
+    
+    # Shared embedding server (python -m services.embedding_server)
+    EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", "/tmp/voxai-embeddings.sock")
+    EMBEDDING_SERVER_MAX_BATCH = int(os.getenv("EMBEDDING_SERVER_MAX_BATCH", "256"))
+    EMBEDDING_SERVER_MAX_WAIT_MS = float(os.getenv("EMBEDDING_SERVER_MAX_WAIT_MS", "5"))
+    EMBEDDING_SERVER_MAX_REQUEST_BYTES = 64 * 1024 * 1024
+    EMBEDDING_SHM_BYTES = 1024 * 1024  # Initial per-connection segment, grown on demand
+    CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+    
     # College information (placeholder - should be expanded)
     COLLEGE_INFO = """
     This is placeholder information about the college. In a real implementation, 
@@ -1,11 +1,17 @@
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.exceptions import RequestValidationError
 import uvicorn
 from routes import text_routes, voice_routes, auth_routes, chat_routes
 from config.database import db
 from config.logging_config import setup_logging
+from utils.admission import AdmissionRejected, admission
+from utils.auth import get_current_user
+from utils.metrics import MetricsMiddleware, registry
+from utils.log_context import RequestIdMiddleware
+from services.warmup_service import warmup_service
+import math
 import asyncio
 import logging
 
@@ -49,14 +55,27 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": message.strip()}
     )
 
+# Upstream admission control: answer at once with a retry hint instead of queueing
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc), "upstream": exc.upstream, "reason": exc.reason, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
 # Initialize database
 @app.on_event("startup")
 async def startup_event():
     await db.init_db()
+    # Create missing indexes (once Mongo answers), load models and heavy modules
+    # in the background; /ready reports when done
+    warmup_service.start()
 
 # Close database connection
 @app.on_event("shutdown")
 async def shutdown_event():
+    await warmup_service.stop()
     await db.close_db()
 
 # Add CORS middleware
@@ -66,8 +85,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Stream-Id", "X-Request-ID"],
 )
 
+# Request latency per route template, exported on /metrics
+app.add_middleware(MetricsMiddleware)
+# Request id on every log record (and X-Request-ID on responses)
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(auth_routes.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(chat_routes.router, prefix="/api/v1", tags=["chat"])
@@ -76,7 +101,27 @@ app.include_router(voice_routes.router, prefix="/api/v1")
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving; no dependency checks"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once warm-up has loaded every configured component, 503 until then"""
+    status_report = warmup_service.status()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if status_report["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=status_report
+    )
+
+@app.get("/admission")
+async def admission_stats(current_user: dict = Depends(get_current_user)):
+    """In-flight calls and admission/rejection counters per upstream (authenticated: it shows upstream load)"""
+    return admission.stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request and stage latency histograms, sessions and queue depths"""
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
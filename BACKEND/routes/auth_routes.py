@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Request, Response
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import timedelta, date
-from services.db_service import db_service
+from services.db_service import db_service, USER_AUTH_FIELDS
+from services.blob_service import blob_service, sniff_image_type
+from config.settings import settings
 from utils.auth import (
-    get_password_hash,
-    verify_password,
+    hash_password,
+    check_password,
+    password_needs_rehash,
     create_access_token,
     get_current_user
 )
@@ -66,15 +69,26 @@ async def signup(request: SignupRequest):
             )
         
         # Check if user already exists
-        existing_user = await db_service.get_user_by_email(request.email)
+        existing_user = await db_service.get_user_by_email(request.email, fields=["_id"])
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
         
-        # Hash password
-        password_hash = get_password_hash(request.password)
+        # Store the photo in the blob store; the user only keeps its id
+        profile_photo_id = None
+        if request.profile_photo:
+            try:
+                profile_photo_id = await blob_service.save_photo(request.profile_photo)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+        
+        # Hash password (on the bcrypt pool, off the event loop)
+        password_hash = await hash_password(request.password)
         
         # Create user document with all fields
         user_doc = {
@@ -85,7 +99,7 @@ async def signup(request: SignupRequest):
             "date_of_birth": request.date_of_birth,
             "gender": request.gender,
             "country": request.country,
-            "profile_photo": request.profile_photo
+            "profile_photo_id": profile_photo_id
         }
         
         user = await db_service.create_user_with_hash(user_doc)
@@ -134,20 +148,28 @@ async def login(request: LoginRequest):
     """Login with email and password"""
     try:
         # Get user
-        user = await db_service.get_user_by_email(request.email)
+        user = await db_service.get_user_by_email(request.email, fields=USER_AUTH_FIELDS)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
         
-        # Verify password
-        if not verify_password(request.password, user["password_hash"]):
+        # Verify password (on the bcrypt pool, off the event loop)
+        if not await check_password(request.password, user["password_hash"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
         
+        # Upgrade the hash if BCRYPT_ROUNDS changed since it was made
+        if password_needs_rehash(user["password_hash"]):
+            try:
+                new_hash = await hash_password(request.password)
+                await db_service.update_password_hash(user["id"], new_hash)
+            except Exception as e:
+                logger.error(f"Error rehashing password for {user['email']}: {e}")
+        
         # Create access token
         access_token = create_access_token(
             data={"sub": user["id"], "email": user["email"]}
@@ -189,7 +211,7 @@ async def login(request: LoginRequest):
 async def get_me(current_user: dict = Depends(get_current_user)):
     """Get current user information"""
     try:
-        user = await db_service.get_user_by_email(current_user["email"])
+        user = await db_service.get_user_by_id(current_user["user_id"])
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -220,10 +242,47 @@ class ProfileResponse(BaseModel):
     date_of_birth: str
     gender: str
     country: str
-    profile_photo: Optional[str] = None
+    profile_photo: Optional[str] = None  # URL
+    profile_photo_thumbnail: Optional[str] = None  # URL
     created_at: str
 
 
+def profile_response(request: Request, user: dict) -> ProfileResponse:
+    """Build the profile response, linking the photo rather than inlining it"""
+    photo = thumbnail = user.get("profile_photo")  # Legacy inline photo, not yet migrated
+    if user.get("profile_photo_id"):
+        photo = str(request.url_for("get_photo", photo_id=user["profile_photo_id"]))
+        thumbnail = f"{photo}?size={settings.THUMBNAIL_SIZES[0]}"
+    
+    return ProfileResponse(
+        id=user["id"],
+        email=user["email"],
+        name=user.get("name", ""),
+        mobile=user.get("mobile", ""),
+        date_of_birth=user.get("date_of_birth", ""),
+        gender=user.get("gender", ""),
+        country=user.get("country", ""),
+        profile_photo=photo,
+        profile_photo_thumbnail=thumbnail,
+        created_at=str(user["created_at"])
+    )
+
+
+async def migrate_legacy_photo(user: dict, legacy_photo: str) -> dict:
+    """Move a photo stored inline on the user document into the blob store"""
+    try:
+        photo_id = await blob_service.save_photo(legacy_photo)
+        updated_user = await db_service.update_user_profile(
+            user["email"],
+            {"profile_photo_id": photo_id},
+            unset=["profile_photo"]
+        )
+        return updated_user or dict(user, profile_photo=legacy_photo)
+    except Exception as e:
+        logger.warning(f"Could not migrate profile photo for {user['email']}: {e}")
+        return dict(user, profile_photo=legacy_photo)
+
+
 class UpdateProfileRequest(BaseModel):
     name: Optional[str] = None
     mobile: Optional[str] = None
@@ -233,27 +292,25 @@ class UpdateProfileRequest(BaseModel):
 
 
 @router.get("/profile", response_model=ProfileResponse)
-async def get_profile(current_user: dict = Depends(get_current_user)):
+async def get_profile(http_request: Request, current_user: dict = Depends(get_current_user)):
     """Get current user's complete profile"""
     try:
-        user = await db_service.get_user_by_email(current_user["email"])
+        user = await db_service.get_user_by_id(current_user["user_id"])
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="User not found"
             )
         
-        return ProfileResponse(
-            id=user["id"],
-            email=user["email"],
-            name=user.get("name", ""),
-            mobile=user.get("mobile", ""),
-            date_of_birth=user.get("date_of_birth", ""),
-            gender=user.get("gender", ""),
-            country=user.get("country", ""),
-            profile_photo=user.get("profile_photo"),
-            created_at=str(user["created_at"])
-        )
+        if not user.get("profile_photo_id"):
+            # The cached user leaves out inline photos; read one only when there is no blob yet
+            legacy_photo = await db_service.get_legacy_profile_photo(user["id"])
+            if legacy_photo and legacy_photo.startswith(("http://", "https://")):
+                user["profile_photo"] = legacy_photo
+            elif legacy_photo:
+                user = await migrate_legacy_photo(user, legacy_photo)
+        
+        return profile_response(http_request, user)
         
     except HTTPException:
         raise
@@ -268,6 +325,7 @@ async def get_profile(current_user: dict = Depends(get_current_user)):
 @router.put("/profile", response_model=ProfileResponse)
 async def update_profile(
     request: UpdateProfileRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """Update user profile"""
@@ -305,17 +363,7 @@ async def update_profile(
         
         logger.info(f"Profile updated for user: {current_user['email']}")
         
-        return ProfileResponse(
-            id=updated_user["id"],
-            email=updated_user["email"],
-            name=updated_user.get("name", ""),
-            mobile=updated_user.get("mobile", ""),
-            date_of_birth=updated_user.get("date_of_birth"),
-            gender=updated_user.get("gender", ""),
-            country=updated_user.get("country", ""),
-            profile_photo=updated_user.get("profile_photo"),
-            created_at=str(updated_user["created_at"])
-        )
+        return profile_response(http_request, updated_user)
         
     except HTTPException:
         raise
@@ -334,14 +382,24 @@ class PhotoUploadRequest(BaseModel):
 @router.post("/profile/photo", response_model=ProfileResponse)
 async def upload_profile_photo(
     request: PhotoUploadRequest,
+    http_request: Request,
     current_user: dict = Depends(get_current_user)
 ):
     """Upload or update profile photo"""
     try:
-        # Update profile photo
+        # Store the photo and thumbnails, then point the user at it
+        try:
+            photo_id = await blob_service.save_photo(request.photo)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        
         updated_user = await db_service.update_user_profile(
             current_user["email"],
-            {"profile_photo": request.photo}
+            {"profile_photo_id": photo_id},
+            unset=["profile_photo"]
         )
         
         if not updated_user:
@@ -352,17 +410,7 @@ async def upload_profile_photo(
         
         logger.info(f"Profile photo updated for user: {current_user['email']}")
         
-        return ProfileResponse(
-            id=updated_user["id"],
-            email=updated_user["email"],
-            name=updated_user.get("name", ""),
-            mobile=updated_user.get("mobile", ""),
-            date_of_birth=updated_user.get("date_of_birth"),
-            gender=updated_user.get("gender", ""),
-            country=updated_user.get("country", ""),
-            profile_photo=updated_user.get("profile_photo"),
-            created_at=str(updated_user["created_at"])
-        )
+        return profile_response(http_request, updated_user)
         
     except HTTPException:
         raise
@@ -374,12 +422,49 @@ async def upload_profile_photo(
         )
 
 
+@router.get("/photos/{photo_id}", name="get_photo")
+async def get_photo(photo_id: str, request: Request, size: Optional[int] = None):
+    """
+    Serve a profile photo, or with ?size= one of its thumbnails.
+    Photo ids are content hashes, so responses never change and are
+    cacheable forever; If-None-Match on a stored photo is answered with 304.
+    """
+    if not blob_service.is_photo_id(photo_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    if size is not None and size not in settings.THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"size must be one of {', '.join(map(str, settings.THUMBNAIL_SIZES))}"
+        )
+    
+    etag = f'"{photo_id}-{size or "original"}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if_none_match = request.headers.get("if-none-match", "")
+    not_modified = any(tag.strip().removeprefix("W/") in (etag, "*") for tag in if_none_match.split(","))
+    
+    try:
+        # A revalidation only needs to know the photo is still there, not its bytes
+        if not_modified:
+            found = await blob_service.photo_exists(photo_id)
+        else:
+            data = await blob_service.load_photo(photo_id, size)
+            found = data is not None
+    except Exception as e:
+        logger.error(f"Error loading photo {photo_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    if not found:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found")
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(content=data, media_type=sniff_image_type(data), headers=headers)
+
 
 @router.post("/forgot-password")
 async def forgot_password(email: EmailStr):
     """Request password reset (placeholder for future implementation)"""
     try:
-        user = await db_service.get_user_by_email(email)
+        user = await db_service.get_user_by_email(email, fields=["_id"])
         if not user:
             # Don't reveal if user exists or not
             return {"message": "If the email exists, a password reset link will be sent"}
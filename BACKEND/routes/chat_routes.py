@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from datetime import datetime
+import asyncio
+import json
+import logging
+import time
 
 from models.chat import ChatCreate, ChatResponse, MessageResponse, ChatMessageRequest
 from services.chat_service import ChatService
 from services.llm_service import LLMService
 from services.web_search_service import WebSearchService
 from services.pdf_service import PDFService
+from services.conversation_memory import conversation_memory
+from utils.admission import AdmissionRejected
 from utils.auth import get_current_user
+from services.stream_service import stream_service
+from utils.sse import event_stream_response, stream_in_thread
 from config.database import db
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -30,6 +41,15 @@ def get_pdf_service() -> PDFService:
     """Dependency to get PDF service instance"""
     return PDFService()
 
+def message_payload(message: dict) -> dict:
+    """Shape a saved message for API responses"""
+    return {
+        "id": message["_id"],
+        "role": message["role"],
+        "content": message["content"],
+        "timestamp": message["timestamp"].isoformat()
+    }
+
 @router.post("/start", response_model=dict)
 async def start_chat(
     chat_data: ChatCreate,
@@ -41,19 +61,19 @@ async def start_chat(
 ):
     """
     Start a new chat:
-    1. Generate title from first message
-    2. Create chat in DB
-    3. Save user message
-    4. Generate assistant response
-    5. Save assistant response
-    6. Return chat_id and response
+    1. Create chat in DB with a provisional title
+    2. Generate title and assistant response concurrently
+    3. Save user and assistant messages in one batch
+    4. Return chat_id, title and response; title_pending is true when the
+       title was not ready in time and will be patched onto the chat later
     """
     # Ensure user_id matches current user
     current_user_id = current_user.get("user_id")
     if chat_data.user_id != current_user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User ID mismatch")
     
-    # Create chat with auto-generated title
+    # Create chat right away with a provisional title, and generate the real
+    # title concurrently with the first answer instead of before it
     chat = await chat_service.create_chat(
         user_id=current_user_id,
         mode=chat_data.mode,
@@ -61,77 +81,170 @@ async def start_chat(
     )
     
     chat_id = chat["_id"]
-    
-    # Save user message
-    user_message = await chat_service.save_message(
-        chat_id=chat_id,
-        role="user",
-        content=chat_data.first_message
-    )
+    user_turn = {"role": "user", "content": chat_data.first_message, "timestamp": datetime.utcnow()}
+    title_task = chat_service.start_title_generation(chat_id, chat_data.first_message)
     
     # Generate assistant response based on mode
     try:
         if chat_data.mode == "web":
             # Web search mode
-            search_results = web_service.search(chat_data.first_message)
+            search_results = await run_in_threadpool(web_service.search, chat_data.first_message, user_id=current_user_id)
             assistant_response = search_results.get("answer", "Here are the search results.")
         elif chat_data.mode == "pdf":
             # PDF mode - would need document_id, for now return info message
             assistant_response = "Please upload a PDF document to start asking questions about it."
         else:
             # Smart chat or voice mode
-            assistant_response = llm_service.generate_response(
+            assistant_response = await run_in_threadpool(
+                llm_service.generate_response,
                 prompt=chat_data.first_message,
-                context="You are a helpful AI assistant."
+                context="You are a helpful AI assistant.",
+                user_id=current_user_id
             )
-        
-        # Save assistant message
-        assistant_message = await chat_service.save_message(
-            chat_id=chat_id,
-            role="assistant",
-            content=assistant_response
-        )
-        
-        return {
-            "chat_id": chat_id,
-            "title": chat["title"],
-            "user_message": {
-                "id": user_message["_id"],
-                "role": user_message["role"],
-                "content": user_message["content"],
-                "timestamp": user_message["timestamp"].isoformat()
-            },
-            "assistant_message": {
-                "id": assistant_message["_id"],
-                "role": assistant_message["role"],
-                "content": assistant_message["content"],
-                "timestamp": assistant_message["timestamp"].isoformat()
-            }
-        }
+    except AdmissionRejected:
+        # Answer 429 and leave no empty chat behind
+        await chat_service.delete_chat(chat_id)
+        raise
+    except asyncio.CancelledError:
+        # The request is going away mid-generation: keep the user's message
+        await asyncio.shield(chat_service.save_messages(chat_id, [user_turn], touch_chat=False))
+        raise
     except Exception as e:
         # If response generation fails, save error message
-        error_message = await chat_service.save_message(
-            chat_id=chat_id,
-            role="assistant",
-            content=f"Sorry, I encountered an error: {str(e)}"
-        )
+        assistant_response = f"Sorry, I encountered an error: {str(e)}"
+    
+    # Usually the title is done by now; if not, answer with the provisional one
+    # and let the task patch the chat when it finishes
+    try:
+        title = await asyncio.wait_for(asyncio.shield(title_task), timeout=settings.CHAT_TITLE_WAIT_SECONDS)
+        title_pending = False
+    except asyncio.TimeoutError:
+        title = chat["title"]
+        title_pending = True
+    
+    # Save user and assistant messages together; the chat was just created, so no timestamp bump
+    user_message, assistant_message = await chat_service.save_messages(
+        chat_id,
+        [user_turn, {"role": "assistant", "content": assistant_response}],
+        touch_chat=False
+    )
+    
+    return {
+        "chat_id": chat_id,
+        "title": title,
+        "title_pending": title_pending,
+        "user_message": message_payload(user_message),
+        "assistant_message": message_payload(assistant_message)
+    }
+
+@router.post("/start/stream")
+async def start_chat_stream(
+    chat_data: ChatCreate,
+    current_user: dict = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service),
+    llm_service: LLMService = Depends(get_llm_service),
+    web_service: WebSearchService = Depends(get_web_search_service),
+    pdf_service: PDFService = Depends(get_pdf_service)
+):
+    """
+    Start a new chat and stream the first response:
+    1. Create chat in DB with a provisional title and emit a "chat" event
+       with its id and provisional title
+    2. Stream assistant response chunks as data events while the title is
+       generated concurrently
+    3. Emit a "title" event once the generated title is ready
+    4. Save the complete assistant response; the user message is saved
+       before generation, as the stream can outlive the connection
+    Resumable like stream_message via the X-Stream-Id header.
+    """
+    request_start = time.perf_counter()
+    
+    # Ensure user_id matches current user
+    current_user_id = current_user.get("user_id")
+    if chat_data.user_id != current_user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User ID mismatch")
+    
+    chat = await chat_service.create_chat(
+        user_id=current_user_id,
+        mode=chat_data.mode,
+        first_message=chat_data.first_message
+    )
+    
+    chat_id = chat["_id"]
+    user_turn = {"role": "user", "content": chat_data.first_message, "timestamp": datetime.utcnow()}
+    title_task = chat_service.start_title_generation(chat_id, chat_data.first_message)
+    
+    async def produce(stream):
+        """Generate the response into the stream buffer and persist it"""
+        full_response = ""
+        title_sent = False
+        first_token_logged = False
+        
+        meta = {"chat_id": chat_id, "title": chat["title"], "mode": chat["mode"]}
+        await stream.publish(json.dumps(meta), event="chat")
+        
+        # The stream outlives the connection, so the first message is written before
+        # generating rather than paired with the answer
+        await chat_service.save_messages(chat_id, [user_turn], touch_chat=False)
         
-        return {
-            "chat_id": chat_id,
-            "title": chat["title"],
-            "user_message": {
-                "id": user_message["_id"],
-                "role": user_message["role"],
-                "content": user_message["content"],
-                "timestamp": user_message["timestamp"].isoformat()
-            },
-            "assistant_message": {
-                "id": error_message["_id"],
-                "role": error_message["role"],
-                "content": error_message["content"],
-                "timestamp": error_message["timestamp"].isoformat()
-            }
-        }
+        try:
+            if chat_data.mode == "web":
+                # Web search mode - not streamable, send as single chunk
+                search_results = await run_in_threadpool(web_service.search, chat_data.first_message, user_id=current_user_id)
+                chunks = [search_results.get("answer", "Here are the search results.")]
+            elif chat_data.mode == "pdf":
+                # PDF mode - would need document_id, for now return info message
+                chunks = ["Please upload a PDF document to start asking questions about it."]
+            else:
+                # Smart chat or voice mode - stream LLM response
+                chunks = llm_service.generate_response_stream(
+                    prompt=chat_data.first_message,
+                    context="You are a helpful AI assistant.",
+                    user_id=current_user_id
+                )
+            
+            # The blocking Groq stream is read on a stream thread so the title task keeps running
+            async for text in stream_in_thread(chunks):
+                if text:
+                    if not first_token_logged:
+                        first_token_logged = True
+                        logger.info(
+                            f"Chat {chat_id} start stream: first token after "
+                            f"{(time.perf_counter() - request_start) * 1000:.0f} ms"
+                        )
+                    full_response += text
+                    await stream.publish(text)
+                
+                if not title_sent and title_task.done():
+                    title_sent = True
+                    await stream.publish(json.dumps({"title": title_task.result()}), event="title")
+        
+        except asyncio.CancelledError:
+            # Client gone past the resume grace period: keep what was generated
+            logger.info(f"Chat {chat_id} start stream cancelled after {len(full_response)} chars")
+        except AdmissionRejected as e:
+            # Headers are already sent, so the 429 travels as an event; no empty chat is kept
+            await stream.publish(json.dumps({"detail": str(e), "retry_after": e.retry_after}), event="rate_limited")
+            await chat_service.delete_chat(chat_id)
+            return
+        except Exception as e:
+            # Send error and save error message
+            full_response = f"Sorry, I encountered an error: {str(e)}"
+            await stream.publish(full_response, event="error")
+        
+        # The chat was just created, so no timestamp bump
+        await chat_service.save_messages(chat_id, [{"role": "assistant", "content": full_response}], touch_chat=False)
+        
+        if not title_sent and not stream.cancelled:
+            try:
+                title = await asyncio.wait_for(asyncio.shield(title_task), timeout=settings.CHAT_TITLE_WAIT_SECONDS)
+                await stream.publish(json.dumps({"title": title}), event="title")
+            except asyncio.TimeoutError:
+                # The task still patches the chat; clients pick it up from /chat/list
+                pass
+    
+    stream = stream_service.start(chat_id, current_user_id, produce)
+    return event_stream_response(stream.subscribe(), headers={"X-Stream-Id": stream.stream_id})
 
 @router.post("/{chat_id}/message", response_model=dict)
 async def send_message(
@@ -146,10 +259,9 @@ async def send_message(
     """
     Send a message in existing chat:
     1. Verify chat belongs to user
-    2. Save user message
-    3. Generate assistant response
-    4. Save assistant response
-    5. Return both messages
+    2. Generate assistant response
+    3. Save user and assistant messages in one batch
+    4. Return both messages
     """
     # Verify chat exists and belongs to user
     chat = await chat_service.get_chat(chat_id)
@@ -160,12 +272,7 @@ async def send_message(
     if chat["user_id"] != current_user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     
-    # Save user message
-    user_message = await chat_service.save_message(
-        chat_id=chat_id,
-        role="user",
-        content=message_data.content
-    )
+    user_turn = {"role": "user", "content": message_data.content, "timestamp": datetime.utcnow()}
     
     # Generate assistant response based on mode
     mode = message_data.mode or chat["mode"]
@@ -173,79 +280,85 @@ async def send_message(
     try:
         if mode == "web":
             # Web search mode
-            search_results = web_service.search(message_data.content)
+            search_results = await run_in_threadpool(web_service.search, message_data.content, user_id=current_user_id)
             assistant_response = search_results.get("answer", "Here are the search results.")
         elif mode == "pdf":
             # PDF mode - would need document_id from chat metadata
             assistant_response = "PDF chat functionality requires a document to be uploaded."
         else:
-            # Smart chat or voice mode
-            assistant_response = llm_service.generate_response(
+            # Smart chat or voice mode; only the LLM gets the earlier turns
+            history = await conversation_memory.get_history(chat_service, chat_id)
+            assistant_response = await run_in_threadpool(
+                llm_service.generate_response,
                 prompt=message_data.content,
-                context="You are a helpful AI assistant."
+                context="You are a helpful AI assistant.",
+                history=history,
+                user_id=current_user_id
             )
-        
-        # Save assistant message
-        assistant_message = await chat_service.save_message(
-            chat_id=chat_id,
-            role="assistant",
-            content=assistant_response
-        )
-        
-        return {
-            "user_message": {
-                "id": user_message["_id"],
-                "role": user_message["role"],
-                "content": user_message["content"],
-                "timestamp": user_message["timestamp"].isoformat()
-            },
-            "assistant_message": {
-                "id": assistant_message["_id"],
-                "role": assistant_message["role"],
-                "content": assistant_message["content"],
-                "timestamp": assistant_message["timestamp"].isoformat()
-            }
-        }
+    except AdmissionRejected:
+        raise
+    except asyncio.CancelledError:
+        # The request is going away mid-generation: keep the user's message
+        await asyncio.shield(chat_service.save_messages(chat_id, [user_turn]))
+        raise
     except Exception as e:
         # If response generation fails, save error message
-        error_message = await chat_service.save_message(
-            chat_id=chat_id,
-            role="assistant",
-            content=f"Sorry, I encountered an error: {str(e)}"
-        )
-        
-        return {
-            "user_message": {
-                "id": user_message["_id"],
-                "role": user_message["role"],
-                "content": user_message["content"],
-                "timestamp": user_message["timestamp"].isoformat()
-            },
-            "assistant_message": {
-                "id": error_message["_id"],
-                "role": error_message["role"],
-                "content": error_message["content"],
-                "timestamp": error_message["timestamp"].isoformat()
-            }
-        }
+        assistant_response = f"Sorry, I encountered an error: {str(e)}"
+    
+    # Save user and assistant messages in one batch
+    user_message, assistant_message = await chat_service.save_messages(
+        chat_id,
+        [user_turn, {"role": "assistant", "content": assistant_response}]
+    )
+    
+    return {
+        "user_message": message_payload(user_message),
+        "assistant_message": message_payload(assistant_message)
+    }
 
 @router.get("/list", response_model=List[ChatResponse])
 async def get_chats(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.CHAT_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     chat_service: ChatService = Depends(get_chat_service)
 ):
-    """Get all chats for current user"""
+    """
+    Get chats for current user, most recent first.
+    Pagination is opt-in: without limit or cursor every chat is returned;
+    with either, a page (CHAT_PAGE_SIZE by default) and the cursor for the
+    next page in the X-Next-Cursor header.
+    """
     current_user_id = current_user.get("user_id")
-    chats = await chat_service.get_user_chats(current_user_id)
+    if limit is None and cursor:
+        limit = settings.CHAT_PAGE_SIZE
+    try:
+        chats, next_cursor = await chat_service.get_user_chats(current_user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return chats
 
 @router.get("/{chat_id}/messages", response_model=List[MessageResponse])
 async def get_chat_messages(
     chat_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=settings.MESSAGE_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     chat_service: ChatService = Depends(get_chat_service)
 ):
-    """Get all messages for a specific chat"""
+    """
+    Get messages for a specific chat, oldest first.
+    Pagination is opt-in: without limit or cursor every message is returned;
+    with either, a page (MESSAGE_PAGE_SIZE by default) and the cursor for the
+    next page in the X-Next-Cursor header.
+    """
+    if limit is None and cursor:
+        limit = settings.MESSAGE_PAGE_SIZE
     # Verify chat belongs to user
     chat = await chat_service.get_chat(chat_id)
     if not chat:
@@ -255,7 +368,13 @@ async def get_chat_messages(
     if chat["user_id"] != current_user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     
-    messages = await chat_service.get_chat_messages(chat_id)
+    try:
+        messages, next_cursor = await chat_service.get_chat_messages(chat_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return messages
 
 @router.delete("/{chat_id}")
@@ -275,6 +394,7 @@ async def delete_chat(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     
     success = await chat_service.delete_chat(chat_id)
+    conversation_memory.forget(chat_id)
     
     if success:
         return {"message": "Chat deleted successfully"}
@@ -294,10 +414,13 @@ async def stream_message(
     """
     Stream a message response in existing chat:
     1. Verify chat belongs to user
-    2. Save user message
-    3. Stream assistant response chunks
-    4. Save complete assistant response
-    5. Return streaming response
+    2. Stream assistant response chunks as SSE events (coalesced, with heartbeats).
+       The X-Stream-Id header and first "stream" event identify the stream for
+       resume_stream; if the client stays away past STREAM_RESUME_GRACE_SECONDS,
+       generation is cancelled and the partial response saved
+    3. Save the complete assistant response; the user message is saved
+       before generation, as the stream can outlive the connection
+    4. Return streaming response
     """
     # Verify chat exists and belongs to user
     chat = await chat_service.get_chat(chat_id)
@@ -308,71 +431,92 @@ async def stream_message(
     if chat["user_id"] != current_user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     
-    # Save user message
-    user_message = await chat_service.save_message(
-        chat_id=chat_id,
-        role="user",
-        content=message_data.content
-    )
+    user_turn = {"role": "user", "content": message_data.content, "timestamp": datetime.utcnow()}
     
     # Get chat mode
     mode = message_data.mode or chat["mode"]
     
-    async def generate_stream():
-        """Async generator function for streaming response"""
+    async def produce(stream):
+        """Generate the response into the stream buffer and persist it"""
         full_response = ""
         
+        # The stream outlives the connection, so the user message is written before
+        # generating: it survives a failed turn and concurrent turns see it in their
+        # history. The assistant save bumps the chat timestamp
+        user_message, = await chat_service.save_messages(chat_id, [user_turn], touch_chat=False)
+        
         try:
             if mode == "web":
                 # Web search mode - not streamable, send as single chunk
-                search_results = web_service.search(message_data.content)
-                response = search_results.get("answer", "Here are the search results.")
-                full_response = response
-                yield f"data: {response}\n\n"
-                yield "data: [DONE]\n\n"
+                search_results = await run_in_threadpool(web_service.search, message_data.content, user_id=current_user_id)
+                chunks = [search_results.get("answer", "Here are the search results.")]
                 
             elif mode == "pdf":
                 # PDF mode - not streamable
-                response = "PDF chat functionality requires a document to be uploaded."
-                full_response = response
-                yield f"data: {response}\n\n"
-                yield "data: [DONE]\n\n"
+                chunks = ["PDF chat functionality requires a document to be uploaded."]
                 
             else:
-                # Smart chat or voice mode - stream LLM response
-                for chunk in llm_service.generate_response_stream(
+                # Smart chat or voice mode - stream LLM response; only the LLM gets the earlier turns
+                history = await conversation_memory.get_history(chat_service, chat_id, exclude_id=user_message["_id"])
+                chunks = llm_service.generate_response_stream(
                     prompt=message_data.content,
-                    context="You are a helpful AI assistant."
-                ):
-                    full_response += chunk
-                    yield f"data: {chunk}\n\n"
-                
-                yield "data: [DONE]\n\n"
+                    context="You are a helpful AI assistant.",
+                    history=history,
+                    user_id=current_user_id
+                )
             
-            # Save complete assistant message after streaming
-            await chat_service.save_message(
-                chat_id=chat_id,
-                role="assistant",
-                content=full_response
-            )
+            # Read the blocking Groq stream off the event loop, coalescing tokens
+            async for text in stream_in_thread(chunks):
+                if text:
+                    full_response += text
+                    await stream.publish(text)
             
+        except asyncio.CancelledError:
+            # Client gone past the resume grace period: keep what was generated
+            logger.info(f"Chat {chat_id} stream cancelled after {len(full_response)} chars")
+        except AdmissionRejected as e:
+            # Headers are already sent, so the 429 travels as an event; the turn is undone so a retry doesn't repeat it
+            await stream.publish(json.dumps({"detail": str(e), "retry_after": e.retry_after}), event="rate_limited")
+            await chat_service.delete_message(chat_id, user_message["_id"])
+            conversation_memory.forget(chat_id)
+            return
         except Exception as e:
             # Send error and save error message
-            error_msg = f"Sorry, I encountered an error: {str(e)}"
-            yield f"data: {error_msg}\n\n"
-            yield "data: [DONE]\n\n"
-            
-            await chat_service.save_message(
-                chat_id=chat_id,
-                role="assistant",
-                content=error_msg
-            )
+            full_response = f"Sorry, I encountered an error: {str(e)}"
+            await stream.publish(full_response, event="error")
+        
+        # Save the complete (or partial) assistant message before the stream is marked done
+        await chat_service.save_messages(chat_id, [{"role": "assistant", "content": full_response}])
     
-    return StreamingResponse(
-        generate_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-        }
-    )
+    stream = stream_service.start(chat_id, current_user_id, produce)
+    return event_stream_response(stream.subscribe(), headers={"X-Stream-Id": stream.stream_id})
+
+@router.get("/{chat_id}/stream/{stream_id}")
+async def resume_stream(
+    chat_id: str,
+    stream_id: str,
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Resume a dropped stream: replays buffered events after Last-Event-ID
+    (header, or last_event_id query parameter) and follows the rest live.
+    Streams live in the worker that started them and are kept for
+    STREAM_BUFFER_TTL_SECONDS after finishing; once gone, the saved
+    message is available from /{chat_id}/messages.
+    """
+    stream = stream_service.get(stream_id)
+    if not stream or stream.chat_id != chat_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Stream not found")
+    
+    if stream.user_id != current_user.get("user_id"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    
+    if last_event_id is None:
+        try:
+            last_event_id = int(last_event_id_header or 0)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+    
+    return event_stream_response(stream.subscribe(last_event_id), headers={"X-Stream-Id": stream.stream_id})
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
+from models.document import DocumentCreate
 from services.query_router import query_router
 from services.db_service import db_service
 from services.pdf_service import pdf_service
+from services.retrieval_service import retrieval_service
 from services.web_search_service import web_search_service
+from utils.admission import AdmissionRejected
+from utils.auth import get_current_user
+from utils.client_ip import client_ip
 import uuid
 import os
 import logging
@@ -15,7 +21,6 @@ router = APIRouter()
 
 class AskRequest(BaseModel):
     query: str
-    user_id: str
     mode: str = "smart"
 
 class AskResponse(BaseModel):
@@ -41,15 +46,24 @@ class ChatHistoryRequest(BaseModel):
     limit: int = 10
 
 @router.post("/ask", response_model=AskResponse)
-async def ask_question(request: AskRequest):
+async def ask_question(
+    request: AskRequest,
+    http_request: Request,
+    current_user: dict = Depends(get_current_user)
+):
     """Handle text-based questions"""
     try:
-        # Route the query
-        response_text = query_router.handle_query(request.query, request.mode)
+        # Route the query; admission is charged to the authenticated user, not a body field
+        user_id = current_user["user_id"]
+        response_text = query_router.handle_query(
+            request.query, request.mode, user_id=user_id, client_ip=client_ip(http_request)
+        )
         
-        logger.info(f"Question answered for user {request.user_id}")
+        logger.info(f"Question answered for user {user_id}")
         return AskResponse(response=response_text)
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error in ask_question: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -62,6 +76,8 @@ async def web_search(request: SearchRequest):
         logger.info(f"Web search completed for query: {request.query}")
         return SearchResponse(results=results)
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error in web_search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -80,15 +96,14 @@ async def upload_pdf(user_id: str, file: UploadFile = File(...)):
             content = await file.read()
             buffer.write(content)
         
-        # Process PDF
-        processed_data = pdf_service.process_pdf(file_path)
+        # Process PDF (extraction, embeddings and indexing are CPU-bound; keep them off the event loop)
+        processed_data = await run_in_threadpool(pdf_service.process_pdf, file_path)
         
         # Save to database
-        doc_record = await db_service.create_document({
-            "user_id": user_id,
-            "file_name": file.filename
-        })
+        doc_record = await db_service.create_document(DocumentCreate(user_id=user_id, file_name=file.filename))
         
+        # The BM25 index goes to the blob store, not onto the document (16 MB limit)
+        await retrieval_service.save_index(doc_record["_id"], processed_data["bm25_index"])
         await db_service.update_document_chunks(doc_record["_id"], processed_data["chunks"])
         
         # Clean up temp file
@@ -106,29 +121,18 @@ async def upload_pdf(user_id: str, file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/ip", response_model=IPResponse)
-async def get_public_ip():
-    """Get user's public IP address"""
-    try:
-        ip_address = query_router.get_public_ip()
-        logger.info(f"Public IP retrieved: {ip_address}")
-        return IPResponse(ip=ip_address)
-        
-    except Exception as e:
-        logger.error(f"Error in get_public_ip: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_public_ip(request: Request):
+    """Get user's public IP address, as seen on this request"""
+    ip_address = client_ip(request)
+    if not ip_address:
+        raise HTTPException(status_code=500, detail="Could not determine client IP")
+    return IPResponse(ip=ip_address)
 
 
 @router.get("/ip", response_model=IPResponse)
-async def get_public_ip_get():
+async def get_public_ip_get(request: Request):
     """Get user's public IP address (GET method)"""
-    try:
-        ip_address = query_router.get_public_ip()
-        logger.info(f"Public IP retrieved: {ip_address}")
-        return IPResponse(ip=ip_address)
-        
-    except Exception as e:
-        logger.error(f"Error in get_public_ip: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await get_public_ip(request)
 
 @router.post("/history")
 async def get_chat_history(request: ChatHistoryRequest):
@@ -144,7 +148,7 @@ async def get_chat_history(request: ChatHistoryRequest):
 
 
 @router.post("/pdf/load")
-async def load_pdf(document_id: str, query: str):
+async def load_pdf(document_id: str, query: str, request: Request):
     """Query an already uploaded PDF document"""
     try:
         # Get document
@@ -157,14 +161,22 @@ async def load_pdf(document_id: str, query: str):
         if not chunks:
             raise HTTPException(status_code=400, detail="Document has no processed chunks")
         
-        # Perform semantic search on chunks
-        # Simple implementation - in production use proper embedding similarity
-        relevant_chunks = chunks[:3]  # Get first 3 chunks as context
+        # Hybrid retrieval: BM25 catches exact terms (course codes, section numbers),
+        # embeddings catch paraphrases; rankings are fused with RRF. Embedding and
+        # ranking are CPU-bound, so they run on the threadpool
+        query_embedding = (await run_in_threadpool(pdf_service.generate_embeddings, [query]))[0]
+        await retrieval_service.load(document)
+        relevant_chunks = await run_in_threadpool(
+            retrieval_service.hybrid_search, document, query, query_embedding, top_k=3
+        )
         
         context = "\n\n".join([chunk.get("text", "") for chunk in relevant_chunks])
         
         # Generate response using LLM with context
-        response_text = query_router.handle_query(query, mode="pdf", pdf_context={"extracted_text": context})
+        response_text = await run_in_threadpool(
+            query_router.handle_query, query, mode="pdf", pdf_context={"extracted_text": context},
+            client_ip=client_ip(request)
+        )
         
         logger.info(f"PDF query processed for document: {document_id}")
         return {
@@ -173,7 +185,7 @@ async def load_pdf(document_id: str, query: str):
             "chunks_used": len(relevant_chunks)
         }
         
-    except HTTPException:
+    except (HTTPException, AdmissionRejected):
         raise
     except Exception as e:
         logger.error(f"Error in load_pdf: {e}")
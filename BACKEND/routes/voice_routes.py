@@ -3,12 +3,21 @@ from fastapi.responses import StreamingResponse
 import base64
 import json
 import logging
+import time
 from utils.audio_utils import VADProcessor
 from utils.audio_converter import pcm_to_wav
+from utils.admission import AdmissionRejected
+from utils.client_ip import client_ip
+from utils.metrics import VOICE_SESSIONS
+from utils.tracing import tracer
+from utils.log_context import session_id_var
 from services.stt_service import stt_service
 from services.tts_service import tts_service
 from services.query_router import query_router
 from services.db_service import db_service
+from services.chat_service import ChatService, MessageWriteBuffer
+from config.database import db
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +27,15 @@ router = APIRouter()
 async def voice_chat(websocket: WebSocket):
     """WebSocket endpoint for continuous voice chat"""
     await websocket.accept()
+    VOICE_SESSIONS.inc()
+    # One trace per session: a root span, and a span per turn with a child per pipeline step
+    session_span = tracer.start_span("voice.session")
+    turns = 0
+    vad_seconds = 0.0
+    
+    # Voice turns queue their messages; the buffer writes them in bulk off the reply path
+    chat_service = ChatService(db.get_db())
+    message_buffer = MessageWriteBuffer(chat_service)
     
     try:
         # Initialize VAD processor
@@ -29,13 +47,18 @@ async def voice_chat(websocket: WebSocket):
         user_id = user_data.get("user_id")
         mode = user_data.get("mode", "voice")
         chat_id = None
+        session_span.set_attributes({"user_id": user_id, "mode": mode})
         
         # Create chat session
-        chat_data = await db_service.create_chat({
-            "user_id": user_id,
-            "mode": mode
-        })
+        chat_data = await chat_service.create_chat(
+            user_id=user_id,
+            mode=mode,
+            first_message="",
+            title="Voice Chat"
+        )
         chat_id = chat_data["_id"]
+        session_id_var.set(chat_id)  # Tags this session's log records
+        message_buffer.start()
         
         logger.info(f"Voice chat started for user {user_id} with mode {mode}")
         
@@ -44,64 +67,83 @@ async def voice_chat(websocket: WebSocket):
             audio_data = await websocket.receive_bytes()
             
             # Process audio frame with VAD
+            vad_start = time.perf_counter()
             speech_segment = vad_processor.process_frame(audio_data)
+            vad_seconds += time.perf_counter() - vad_start
             
             if speech_segment:
-                # Speech detected, process it
+                # Speech detected, process it; the turn span starts at the endpoint
+                turns += 1
+                turn_span = tracer.start_span("voice.turn", {
+                    "turn": turns,
+                    "audio_duration_ms": len(speech_segment) / 2 / settings.SAMPLE_RATE * 1000,
+                    "vad.processing_ms": vad_seconds * 1000,
+                    "vad.endpoint_silence_ms": settings.SILENCE_THRESHOLD * 1000,
+                }, parent=session_span)
+                vad_seconds = 0.0
                 try:
-                    # Convert PCM to WAV for STT
-                    wav_data = pcm_to_wav(speech_segment)
-                    
-                    # Step 1: Speech-to-Text
-                    user_query = stt_service.transcribe_audio(wav_data)
-                    logger.info(f"Transcribed text: {user_query}")
-                    
-                    # Save user message
-                    user_message = Message(
-                        role="user",
-                        text=user_query
-                    )
-                    await db_service.add_message_to_chat(chat_id, user_message)
-                    
-                    # Save voice transcript
-                    await db_service.create_voice_transcript(
-                        user_id=user_id,
-                        chat_id=chat_id,
-                        transcript=user_query
-                    )
-                    
-                    # Step 2: Route query and generate response
-                    response_text = query_router.handle_query(user_query, mode)
-                    logger.info(f"Generated response: {response_text}")
-                    
-                    # Save AI message
-                    ai_message = Message(
-                        role="assistant",
-                        text=response_text
-                    )
-                    await db_service.add_message_to_chat(chat_id, ai_message)
-                    
-                    # Save AI voice transcript
-                    await db_service.create_voice_transcript(
-                        user_id=user_id,
-                        chat_id=chat_id,
-                        transcript=response_text
-                    )
-                    
-                    # Step 3: Text-to-Speech
-                    audio_bytes = tts_service.text_to_speech(response_text)
-                    
-                    # Step 4: Send response back to client
-                    response_data = {
-                        "text": response_text,
-                        "audio_base64": base64.b64encode(audio_bytes).decode('utf-8')
-                    }
-                    
-                    await websocket.send_text(json.dumps(response_data))
+                    with turn_span:
+                        # Convert PCM to WAV for STT
+                        with tracer.span("pcm_to_wav", {"pcm_bytes": len(speech_segment)}):
+                            wav_data = pcm_to_wav(speech_segment)
+                        
+                        # Step 1: Speech-to-Text
+                        with tracer.span("stt", {"audio_bytes": len(wav_data)}) as span:
+                            user_query = stt_service.transcribe_audio(wav_data, user_id=user_id)
+                            span.set_attribute("transcript_chars", len(user_query))
+                        logger.debug(f"Transcribed text: {user_query}")
+                        
+                        # Queue user message
+                        with tracer.span("db.queue_message"):
+                            await message_buffer.add(chat_id, "user", user_query)
+                        
+                        # Step 2: Route query and generate response
+                        with tracer.span("query", {"mode": mode}) as span:
+                            response_text = query_router.handle_query(
+                                user_query, mode, user_id=user_id, client_ip=client_ip(websocket)
+                            )
+                            span.set_attribute("response_chars", len(response_text))
+                        logger.info(f"Voice turn {turns}: {len(user_query)} chars in, {len(response_text)} chars out")
+                        logger.debug(f"Generated response: {response_text}")
+                        
+                        # Queue AI message
+                        with tracer.span("db.queue_message"):
+                            await message_buffer.add(chat_id, "assistant", response_text)
+                        
+                        # Save user and AI voice transcripts in one write
+                        with tracer.span("db.voice_transcripts"):
+                            await db_service.create_voice_transcripts(
+                                user_id=user_id,
+                                chat_id=chat_id,
+                                transcripts=[user_query, response_text]
+                            )
+                        
+                        # Step 3: Text-to-Speech
+                        with tracer.span("tts", {"text_chars": len(response_text)}) as span:
+                            audio_bytes = tts_service.text_to_speech(response_text, user_id=user_id)
+                            span.set_attribute("audio_bytes", len(audio_bytes))
+                        
+                        # Step 4: Send response back to client
+                        with tracer.span("ws.send") as span:
+                            response_data = {
+                                "text": response_text,
+                                "audio_base64": base64.b64encode(audio_bytes).decode('utf-8')
+                            }
+                            payload = json.dumps(response_data)
+                            span.set_attribute("payload_bytes", len(payload))
+                            await websocket.send_text(payload)
                     
                     # Reset VAD processor for next turn
                     vad_processor.reset()
                     
+                except AdmissionRejected as e:
+                    await websocket.send_text(json.dumps({
+                        "error": "rate_limited",
+                        "text": "I'm getting too many requests right now. Please try again in a moment.",
+                        "retry_after": e.retry_after
+                    }))
+                    vad_processor.reset()
+                    
                 except Exception as e:
                     logger.error(f"Error processing speech segment: {e}")
                     error_response = {
@@ -113,5 +155,9 @@ async def voice_chat(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
+        session_span.set_attribute("turns", turns)
+        session_span.end()
+        VOICE_SESSIONS.dec()
+        await message_buffer.close()
         await websocket.close()
         logger.info("Voice chat ended")
\ No newline at end of file
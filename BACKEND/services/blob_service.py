@@ -0,0 +1,223 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import re
+from config.database import db
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_PHOTO_ID = re.compile(r"^[0-9a-f]{64}$")
+_DATA_URL = re.compile(r"^data:[^;,]*(;base64)?,", re.IGNORECASE)
+
+
+def sniff_image_type(data):
+    """
+    Content type of image bytes from their signature
+    Args:
+        data (bytes): Image bytes
+    Returns:
+        str: e.g. "image/png", or None if not a supported image
+    """
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def decode_image(encoded):
+    """
+    Decode a base64 image or data URL, as sent by the frontend
+    Args:
+        encoded (str): "data:image/png;base64,..." or bare base64
+    Returns:
+        bytes: Image bytes
+    Raises:
+        ValueError: Not valid base64, not an image or too large
+    """
+    encoded = _DATA_URL.sub("", encoded.strip(), count=1)
+    try:
+        data = base64.b64decode(encoded, validate=False)
+    except (binascii.Error, ValueError):
+        raise ValueError("Photo is not valid base64")
+    if len(data) > settings.PROFILE_PHOTO_MAX_BYTES:
+        raise ValueError(f"Photo is larger than {settings.PROFILE_PHOTO_MAX_BYTES // (1024 * 1024)} MB")
+    if sniff_image_type(data) is None:
+        raise ValueError("Photo must be a PNG, JPEG, GIF or WebP image")
+    return data
+
+
+def make_thumbnail(data, size):
+    """
+    Resize an image to fit in a size x size box (needs Pillow)
+    Args:
+        data (bytes): Image bytes
+        size (int): Longest side in pixels
+    Returns:
+        bytes: PNG if the image has transparency, otherwise JPEG
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, "PNG", optimize=True)
+        else:
+            image.convert("RGB").save(output, "JPEG", quality=85)
+        return output.getvalue()
+
+
+class LocalBlobStore:
+    """Blobs as files under a directory; for single-host deployments and development"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _write(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Readers never see a partial file
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    async def put(self, key, data):
+        await asyncio.to_thread(self._write, key, data)
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._read, key)
+
+
+class GridFSBlobStore:
+    """Blobs in MongoDB GridFS, stored by filename = key"""
+
+    def __init__(self, bucket_name="blobs"):
+        self.bucket_name = bucket_name
+
+    def _bucket(self):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+        return AsyncIOMotorGridFSBucket(db.get_db(), bucket_name=self.bucket_name)
+
+    async def exists(self, key):
+        files = db.get_db()[f"{self.bucket_name}.files"]
+        return await files.find_one({"filename": key}, {"_id": 1}) is not None
+
+    async def put(self, key, data):
+        await self._bucket().upload_from_stream(key, data)
+
+    async def get(self, key):
+        from gridfs.errors import NoFile
+        try:
+            stream = await self._bucket().open_download_stream_by_name(key)
+        except NoFile:
+            return None
+        return await stream.read()
+
+
+class BlobService:
+    """
+    Profile photos, stored once by content hash with pre-rendered thumbnails.
+    The user document only keeps the photo id.
+    """
+
+    def __init__(self, store, thumbnail_sizes):
+        self.store = store
+        self.thumbnail_sizes = thumbnail_sizes
+
+    @staticmethod
+    def is_photo_id(photo_id):
+        return bool(photo_id and _PHOTO_ID.match(photo_id))
+
+    @staticmethod
+    def _key(photo_id, size=None):
+        return f"{photo_id}_{size}" if size else photo_id
+
+    async def save_photo(self, encoded):
+        """
+        Store a base64 photo and its thumbnails
+        Args:
+            encoded (str): Data URL or bare base64 image
+        Returns:
+            str: Photo id (SHA-256 of the image bytes) to keep on the user
+        Raises:
+            ValueError: Not a valid image
+        """
+        data = decode_image(encoded)
+        photo_id = hashlib.sha256(data).hexdigest()
+        if await self.store.exists(photo_id):
+            return photo_id  # Same image already stored
+
+        # Thumbnails first, so a stored original always has its thumbnails
+        for size in self.thumbnail_sizes:
+            try:
+                thumbnail = await asyncio.to_thread(make_thumbnail, data, size)
+            except ImportError:
+                logger.warning("Pillow is not installed; photos are served without thumbnails")
+                break
+            except Exception as e:
+                logger.warning(f"Could not make {size}px thumbnail for photo {photo_id}: {e}")
+                continue
+            await self.store.put(self._key(photo_id, size), thumbnail)
+        await self.store.put(photo_id, data)
+        logger.info(f"Photo stored: {photo_id} ({len(data)} bytes)")
+        return photo_id
+
+    async def photo_exists(self, photo_id):
+        """
+        Check that a photo is stored, without reading it
+        Args:
+            photo_id (str): Photo id
+        Returns:
+            bool: True if the original is stored (thumbnails fall back to it)
+        """
+        return await self.store.exists(photo_id)
+
+    async def load_photo(self, photo_id, size=None):
+        """
+        Read a photo or one of its thumbnails
+        Args:
+            photo_id (str): Photo id
+            size (int): Thumbnail size, or None for the original
+        Returns:
+            bytes: Image bytes, falling back to the original if the
+                   thumbnail was never made; None if not found
+        """
+        data = None
+        if size:
+            data = await self.store.get(self._key(photo_id, size))
+        if data is None:
+            data = await self.store.get(photo_id)
+        return data
+
+
+def _create_store():
+    if settings.BLOB_STORE == "local":
+        return LocalBlobStore(settings.BLOB_DIR)
+    return GridFSBlobStore()
+
+# Global instance
+blob_service = BlobService(_create_store(), settings.THUMBNAIL_SIZES)
@@ -1,21 +1,96 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
-from typing import List, Optional
-from groq import Groq
+from typing import List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from config.settings import settings
+from services.index_manager import IndexSpec, QuerySpec
+from utils.admission import admission
+from utils.resilience import llm_title_policy
+import asyncio
+import base64
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+# Fields returned by the history APIs; anything else stored on a document stays in Mongo
+CHAT_PROJECTION = {"user_id": 1, "title": 1, "mode": 1, "created_at": 1, "updated_at": 1}
+MESSAGE_PROJECTION = {"chat_id": 1, "role": 1, "content": 1, "timestamp": 1}
+
+# Indexes and hot query shapes used by ChatService (see services/index_manager.py)
+INDEXES = [
+    IndexSpec("chats", [("user_id", 1), ("updated_at", -1), ("_id", -1)]),
+    IndexSpec("messages", [("chat_id", 1), ("timestamp", 1), ("_id", 1)]),
+]
+QUERIES = [
+    QuerySpec("ChatService.get_user_chats", "chats", {"user_id": "?"}, [("updated_at", -1), ("_id", -1)]),
+    QuerySpec("ChatService.get_chat_messages", "messages", {"chat_id": "?"}, [("timestamp", 1), ("_id", 1)]),
+    QuerySpec("ChatService.delete_chat", "messages", {"chat_id": "?"}),
+]
+
+
+# Keeps title tasks that outlive their request referenced until they finish
+_background_tasks = set()
+
+
+def provisional_title(first_message: str) -> str:
+    """Title used until the generated one is ready: the first few words of the message"""
+    words = first_message.split()[:4]
+    return " ".join(words) + "..." if len(words) == 4 else " ".join(words)
+
+
+def encode_cursor(timestamp: datetime, object_id) -> str:
+    """Encode a (timestamp, _id) keyset position as an opaque cursor"""
+    raw = f"{timestamp.isoformat()}|{object_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, object_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+_title_client = None
+
+def get_title_client():
+    """Groq client for chat titles, shared by every ChatService and created on first use"""
+    global _title_client
+    if _title_client is None:
+        from groq import Groq
+
+        _title_client = Groq(
+            api_key=os.getenv("GROQ_API_KEY", ""),
+            base_url=settings.GROQ_BASE_URL,
+            timeout=settings.CHAT_TITLE_TIMEOUT,
+            max_retries=0
+        )
+    return _title_client
+
 class ChatService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.chats_collection = db.chats
         self.messages_collection = db.messages
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY", ""))
+        self.groq_client = None  # Defaults to the shared title client
     
     async def generate_chat_title(self, first_message: str) -> str:
         """Generate a short chat title using LLM based on first user message"""
+        def create_completion(**kwargs):
+            # Counts against the LLM in-flight cap, not against the user
+            with admission.limit("llm"):
+                client = self.groq_client or get_title_client()
+                return llm_title_policy.call(lambda timeout: client.chat.completions.create(**kwargs))
+        
         try:
-            response = self.groq_client.chat.completions.create(
+            # The Groq client is blocking; run it off the event loop
+            response = await asyncio.to_thread(
+                create_completion,
                 model="llama-3.1-8b-instant",
                 messages=[
                     {
@@ -37,13 +112,42 @@ class ChatService:
         except Exception as e:
             print(f"Error generating title: {e}")
             # Fallback: use first few words of message
-            words = first_message.split()[:4]
-            return " ".join(words) + "..." if len(words) == 4 else " ".join(words)
+            return provisional_title(first_message)
     
-    async def create_chat(self, user_id: str, mode: str, first_message: str) -> dict:
-        """Create a new chat with auto-generated title"""
-        # Generate title from first message
-        title = await self.generate_chat_title(first_message)
+    def start_title_generation(self, chat_id: str, first_message: str) -> "asyncio.Task":
+        """
+        Generate the chat title in the background and patch it onto the chat.
+        The returned task resolves to the title; it keeps running if the
+        caller stops waiting for it.
+        """
+        async def generate_and_apply():
+            title = await self.generate_chat_title(first_message)
+            try:
+                await self.update_chat_title(chat_id, title)
+            except Exception as e:
+                logger.error(f"Error saving generated title for chat {chat_id}: {e}")
+            return title
+        
+        task = asyncio.create_task(generate_and_apply())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return task
+    
+    async def update_chat_title(self, chat_id: str, title: str) -> bool:
+        """Replace a chat's title"""
+        result = await self.chats_collection.update_one(
+            {"_id": ObjectId(chat_id)},
+            {"$set": {"title": title}}
+        )
+        return result.matched_count > 0
+    
+    async def create_chat(self, user_id: str, mode: str, first_message: str, title: Optional[str] = None) -> dict:
+        """
+        Create a new chat immediately. Without an explicit title it gets a
+        provisional one from the first message; see start_title_generation.
+        """
+        if title is None:
+            title = provisional_title(first_message)
         
         now = datetime.utcnow()
         chat = {
@@ -61,45 +165,133 @@ class ChatService:
     
     async def save_message(self, chat_id: str, role: str, content: str) -> dict:
         """Save a message to the messages collection"""
-        message = {
-            "chat_id": chat_id,
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow()
-        }
-        
-        result = await self.messages_collection.insert_one(message)
-        message["_id"] = str(result.inserted_id)
+        messages = await self.save_messages(chat_id, [{"role": role, "content": content}])
+        return messages[0]
+    
+    async def save_messages(self, chat_id: str, messages: List[dict], touch_chat: bool = True) -> List[dict]:
+        """
+        Save several messages of one chat, e.g. a user/assistant turn, with a
+        single insert_many and a single chat timestamp bump: two round trips
+        regardless of message count (in one transaction if CHAT_WRITE_TRANSACTIONS).
+        Messages are dicts with role, content and optionally timestamp.
+        """
+        now = datetime.utcnow()
+        docs = [
+            {
+                "chat_id": chat_id,
+                "role": message["role"],
+                "content": message["content"],
+                "timestamp": message.get("timestamp") or now
+            }
+            for message in messages
+        ]
         
-        # Update chat's updated_at timestamp
-        await self.chats_collection.update_one(
-            {"_id": ObjectId(chat_id)},
-            {"$set": {"updated_at": datetime.utcnow()}}
-        )
+        if settings.CHAT_WRITE_TRANSACTIONS:
+            async with await self.db.client.start_session() as session:
+                async with session.start_transaction():
+                    await self.write_message_batch(docs, touch_chats=touch_chat, session=session)
+        else:
+            await self.write_message_batch(docs, touch_chats=touch_chat)
         
-        return message
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+        return docs
     
-    async def get_user_chats(self, user_id: str) -> List[dict]:
-        """Get all chats for a user, ordered by most recent"""
-        cursor = self.chats_collection.find({"user_id": user_id}).sort("updated_at", -1)
-        chats = []
+    async def write_message_batch(self, docs: List[dict], touch_chats: bool = True, session=None):
+        """
+        Insert message documents (from any number of chats) in one bulk insert
+        and move each chat's updated_at forward in one bulk update.
+        Retrying a batch after a partial failure is safe: insert_many gives the
+        documents their _id on the first attempt, already stored ones come back
+        as duplicate-key errors and are skipped, and the $max bump is idempotent.
+        """
+        try:
+            await self.messages_collection.insert_many(docs, ordered=False, session=session)
+        except BulkWriteError as e:
+            # Only duplicates of documents stored by an earlier attempt are expected
+            errors = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors") or any(error.get("code") != 11000 for error in errors):
+                raise
+        if not touch_chats:
+            return
         
-        async for chat in cursor:
+        latest = {}
+        for doc in docs:
+            if doc["timestamp"] > latest.get(doc["chat_id"], datetime.min):
+                latest[doc["chat_id"]] = doc["timestamp"]
+        # $max keeps updated_at monotonic when buffered writes land out of order
+        await self.chats_collection.bulk_write(
+            [UpdateOne({"_id": ObjectId(chat_id)}, {"$max": {"updated_at": ts}}) for chat_id, ts in latest.items()],
+            ordered=False,
+            session=session
+        )
+    
+    async def get_user_chats(
+        self, user_id: str, limit: Optional[int] = 50, cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get a page of chats for a user, most recently updated first.
+        Keyset pagination on (updated_at, _id), served by the
+        (user_id, updated_at, _id) index, so every page costs the same.
+        limit=None returns all of the remaining chats.
+        Returns the page and the cursor of the next page (None on the last page).
+        """
+        query = {"user_id": user_id}
+        if cursor:
+            updated_at, last_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"updated_at": {"$lt": updated_at}},
+                {"updated_at": updated_at, "_id": {"$lt": last_id}}
+            ]
+
+        # Fetch one extra document to learn whether another page exists
+        db_cursor = self.chats_collection.find(query, CHAT_PROJECTION) \
+            .sort([("updated_at", -1), ("_id", -1)])
+        if limit is not None:
+            db_cursor = db_cursor.limit(limit + 1)
+        chats = await db_cursor.to_list(length=None if limit is None else limit + 1)
+
+        next_cursor = None
+        if limit is not None and len(chats) > limit:
+            chats = chats[:limit]
+            next_cursor = encode_cursor(chats[-1]["updated_at"], chats[-1]["_id"])
+
+        for chat in chats:
             chat["_id"] = str(chat["_id"])
-            chats.append(chat)
-        
-        return chats
+        return chats, next_cursor
     
-    async def get_chat_messages(self, chat_id: str) -> List[dict]:
-        """Get all messages for a specific chat"""
-        cursor = self.messages_collection.find({"chat_id": chat_id}).sort("timestamp", 1)
-        messages = []
-        
-        async for message in cursor:
+    async def get_chat_messages(
+        self, chat_id: str, limit: Optional[int] = 100, cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        Get a page of messages for a specific chat, oldest first.
+        Keyset pagination on (timestamp, _id), served by the
+        (chat_id, timestamp, _id) index.
+        limit=None returns all of the remaining messages.
+        Returns the page and the cursor of the next page (None on the last page).
+        """
+        query = {"chat_id": chat_id}
+        if cursor:
+            timestamp, last_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"timestamp": {"$gt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$gt": last_id}}
+            ]
+
+        db_cursor = self.messages_collection.find(query, MESSAGE_PROJECTION) \
+            .sort([("timestamp", 1), ("_id", 1)])
+        if limit is not None:
+            db_cursor = db_cursor.limit(limit + 1)
+        messages = await db_cursor.to_list(length=None if limit is None else limit + 1)
+
+        next_cursor = None
+        if limit is not None and len(messages) > limit:
+            messages = messages[:limit]
+            next_cursor = encode_cursor(messages[-1]["timestamp"], messages[-1]["_id"])
+
+        for message in messages:
             message["_id"] = str(message["_id"])
-            messages.append(message)
-        
-        return messages
+        return messages, next_cursor
     
     async def get_chat(self, chat_id: str) -> Optional[dict]:
         """Get a specific chat by ID"""
@@ -117,3 +309,94 @@ class ChatService:
         result = await self.chats_collection.delete_one({"_id": ObjectId(chat_id)})
         
         return result.deleted_count > 0
+    
+    async def delete_message(self, chat_id: str, message_id: str) -> bool:
+        """Delete a single message of a chat"""
+        result = await self.messages_collection.delete_one({"_id": ObjectId(message_id), "chat_id": chat_id})
+        return result.deleted_count > 0
+
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer for chat messages, used by voice sessions where a
+    turn's writes need not block the reply. Messages are queued in memory and
+    flushed with one bulk insert and one bulk chat update when max_size
+    messages are pending or every interval seconds; close() flushes the rest.
+    A failed flush keeps its messages for the next one, up to max_pending
+    messages in all; past that the oldest are dropped.
+    """
+    
+    def __init__(
+        self,
+        chat_service: ChatService,
+        max_size: Optional[int] = None,
+        interval: Optional[float] = None,
+        max_pending: Optional[int] = None
+    ):
+        self.chat_service = chat_service
+        self.max_size = max_size or settings.CHAT_WRITE_BUFFER_SIZE
+        self.interval = interval if interval is not None else settings.CHAT_WRITE_BUFFER_INTERVAL
+        self.max_pending = max_pending or settings.CHAT_WRITE_BUFFER_MAX_PENDING
+        self.dropped = 0
+        self._pending = []
+        self._lock = asyncio.Lock()
+        self._task = None
+    
+    def start(self):
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+    
+    async def add(self, chat_id: str, role: str, content: str) -> dict:
+        """Queue a message; flushes immediately once max_size messages are pending"""
+        message = {
+            "chat_id": chat_id,
+            "role": role,
+            "content": content,
+            "timestamp": datetime.utcnow()
+        }
+        self._pending.append(message)
+        self._trim()
+        if len(self._pending) >= self.max_size:
+            await self.flush()
+        return message
+    
+    async def flush(self) -> int:
+        """Write all pending messages; on failure they stay queued for the next flush"""
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            try:
+                await self.chat_service.write_message_batch(batch)
+            except Exception as e:
+                logger.error(f"Error flushing {len(batch)} buffered messages: {e}")
+                # Retried as is: the messages keep their _id, so ones already written are skipped
+                self._pending[:0] = batch
+                self._trim()
+                return 0
+            return len(batch)
+    
+    def _trim(self):
+        # Bound memory while Mongo is unreachable
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            self.dropped += excess
+            logger.error(f"Message write buffer full: dropped the {excess} oldest unsaved messages")
+    
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+    
+    async def close(self):
+        """Stop the periodic task and flush what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,158 @@
+import re
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from config.settings import settings
+from services.chat_service import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def count_tokens(text):
+    """
+    Estimate LLM tokens for text (about 4 characters per token for English)
+    Args:
+        text (str): Text to measure
+    Returns:
+        int: Estimated token count
+    """
+    return len(text) // 4 + 1
+
+
+def summarize_turns(summary, turns, max_tokens):
+    """
+    Fold evicted turns into the rolling summary without an LLM call: keep the
+    first sentence of each turn, dropping the oldest lines once over budget
+    Args:
+        summary (str): Current summary
+        turns (list): (role, content, tokens, message_id) tuples leaving the window
+        max_tokens (int): Summary token budget
+    Returns:
+        str: Updated summary
+    """
+    lines = summary.splitlines() if summary else []
+    for role, content, *_ in turns:
+        first_sentence = _SENTENCE_END.split(content.strip(), 1)[0][:300]
+        lines.append(f"{role}: {first_sentence}")
+
+    total = sum(count_tokens(line) for line in lines)
+    start = 0
+    while total > max_tokens and start < len(lines):
+        total -= count_tokens(lines[start])
+        start += 1
+    return "\n".join(lines[start:])
+
+
+class ChatMemory:
+    """Cached window of recent turns plus a rolling summary for one chat"""
+
+    def __init__(self):
+        self.turns = deque()  # (role, content, tokens, message_id), oldest first
+        self.window_tokens = 0
+        self.summary = ""
+        self.cursor = None  # Position of the last message seen
+        self.lock = asyncio.Lock()  # Held while fetching and folding, so turns aren't appended twice
+
+
+class ConversationMemory:
+    """
+    Assembles prior turns of a chat for LLM calls within a token budget.
+    Recent turns are sent verbatim; older ones are folded into a rolling
+    summary. State is cached per chat, so each turn only fetches messages
+    saved since the previous one.
+    """
+
+    def __init__(self, token_budget=None, summary_tokens=None, cache_size=None, summarizer=summarize_turns):
+        self.token_budget = token_budget or settings.CONVERSATION_TOKEN_BUDGET
+        self.summary_tokens = summary_tokens or settings.CONVERSATION_SUMMARY_TOKENS
+        self.cache_size = cache_size or settings.CONVERSATION_CACHE_SIZE
+        self.summarizer = summarizer
+        self._chats = OrderedDict()
+
+    def _get_state(self, chat_id):
+        state = self._chats.get(chat_id)
+        if state is None:
+            state = self._chats[chat_id] = ChatMemory()
+            if len(self._chats) > self.cache_size:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return state
+
+    async def _fetch_new_messages(self, chat_service, chat_id, state):
+        """Fetch messages saved after the cached position, page by page"""
+        new_messages = []
+        cursor = state.cursor
+        while True:
+            page, next_cursor = await chat_service.get_chat_messages(
+                chat_id, limit=settings.MESSAGE_MAX_PAGE_SIZE, cursor=cursor
+            )
+            new_messages.extend(page)
+            if page:
+                cursor = encode_cursor(page[-1]["timestamp"], page[-1]["_id"])
+            if not next_cursor:
+                break
+        state.cursor = cursor
+        return new_messages
+
+    async def get_history(self, chat_service, chat_id, exclude_id=None):
+        """
+        Get prior turns of a chat as LLM messages
+        Args:
+            chat_service (ChatService): Source of stored messages
+            chat_id (str): Chat ID
+            exclude_id (str): Message left out of this history, e.g. the prompt
+                              itself when it was saved before generation
+        Returns:
+            list: {"role", "content"} messages, oldest first, led by a summary of
+                  earlier turns when the chat no longer fits the budget
+        """
+        start = time.perf_counter()
+        state = self._get_state(chat_id)
+        async with state.lock:
+            new_messages = await self._fetch_new_messages(chat_service, chat_id, state)
+
+            for message in new_messages:
+                tokens = count_tokens(message["content"])
+                state.turns.append((message["role"], message["content"], tokens, message["_id"]))
+                state.window_tokens += tokens
+
+            # Evict the oldest turns into the summary until the window fits
+            window_budget = self.token_budget - self.summary_tokens
+            evicted = []
+            while state.turns and state.window_tokens > window_budget:
+                turn = state.turns.popleft()
+                state.window_tokens -= turn[2]
+                evicted.append(turn)
+            if evicted:
+                state.summary = self.summarizer(state.summary, evicted, self.summary_tokens)
+
+            history = []
+            summary_tokens = 0
+            if state.summary:
+                history.append({
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation:\n{state.summary}"
+                })
+                summary_tokens = count_tokens(history[0]["content"])
+            history.extend(
+                {"role": role, "content": content}
+                for role, content, _, message_id in state.turns if message_id != exclude_id
+            )
+
+        logger.info(
+            f"Conversation history for chat {chat_id}: {len(state.turns)} turns, "
+            f"{state.window_tokens} window + {summary_tokens} summary tokens, "
+            f"{len(new_messages)} fetched in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return history
+
+    def forget(self, chat_id):
+        """Drop cached state for a chat, e.g. when it is deleted"""
+        self._chats.pop(chat_id, None)
+
+# Global instance
+conversation_memory = ConversationMemory()
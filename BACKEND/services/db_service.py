@@ -2,13 +2,64 @@ from config.database import db
 from models.user import UserCreate, UserInDB
 from models.document import DocumentCreate, DocumentInDB
 from datetime import datetime
+from collections import OrderedDict
 import hashlib
 import logging
+import time
 from bson import ObjectId
+from pymongo import ReturnDocument
+from services.index_manager import IndexSpec, QuerySpec
+from config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Indexes and hot query shapes used by DBService (see services/index_manager.py)
+INDEXES = [
+    IndexSpec("users", "email", unique=True),
+    IndexSpec("documents", [("user_id", 1), ("created_at", -1)]),
+    IndexSpec("voice_transcripts", [("user_id", 1), ("created_at", -1)]),
+]
+# Fields auth paths read; never the (legacy inline) profile photo
+USER_AUTH_FIELDS = ["email", "password_hash", "created_at"]
+# Fields left out of profile reads
+PROFILE_EXCLUDED_FIELDS = {"password_hash": 0, "profile_photo": 0}
+
+QUERIES = [
+    QuerySpec("DBService.get_user_by_email", "users", {"email": "?"}),
+    QuerySpec("DBService.get_user_documents", "documents", {"user_id": "?"}),
+    QuerySpec("DBService.get_voice_transcripts", "voice_transcripts", {"user_id": "?"}, [("created_at", -1)]),
+]
+
+async def find_one_and_update(collection, filter: dict, update: dict, projection=None, upsert: bool = False):
+    """
+    Apply an update and return the updated document in one round trip
+    Args:
+        collection: Motor collection
+        filter (dict): Selects the document
+        update (dict): Update operators ($set, $unset, ...)
+        projection: Fields to return (list or dict), default all
+        upsert (bool): Insert if nothing matches
+    Returns:
+        dict: Document after the update, with "_id" as string "id"; None if nothing matched
+    """
+    doc = await collection.find_one_and_update(
+        filter,
+        update,
+        projection=projection,
+        upsert=upsert,
+        return_document=ReturnDocument.AFTER
+    )
+    if doc and "_id" in doc:
+        doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
 class DBService:
+    def __init__(self, user_cache_ttl=None, user_cache_size=None):
+        self.user_cache_ttl = settings.USER_CACHE_TTL_SECONDS if user_cache_ttl is None else user_cache_ttl
+        self.user_cache_size = user_cache_size or settings.USER_CACHE_SIZE
+        self._user_cache = OrderedDict()  # user id -> (expires at, user)
+        
     @property
     def db(self):
         """Get database instance dynamically"""
@@ -48,10 +99,19 @@ class DBService:
             logger.error(f"Error creating user: {e}")
             raise
             
-    async def get_user_by_email(self, email: str):
-        """Get user by email"""
+    async def get_user_by_email(self, email: str, fields: list = None):
+        """
+        Get user by email
+        Args:
+            email (str): User email
+            fields (list): Only return these fields (plus id); by default
+                           everything except a legacy inline profile photo
+        Returns:
+            dict: User or None
+        """
+        projection = fields if fields is not None else {"profile_photo": 0}
         try:
-            user = await self.db.users.find_one({"email": email})
+            user = await self.db.users.find_one({"email": email}, projection)
             if user:
                 user["id"] = str(user["_id"])
                 del user["_id"]
@@ -60,26 +120,103 @@ class DBService:
             logger.error(f"Error getting user by email: {e}")
             raise
     
-    async def update_user_profile(self, email: str, update_data: dict):
-        """Update user profile fields"""
+    async def get_user_by_id(self, user_id: str):
+        """
+        Get user by id, served from a short-TTL cache. Neither the password
+        hash nor a legacy inline profile photo is read or cached.
+        Args:
+            user_id (str): User id (the token's sub claim)
+        Returns:
+            dict: User (a copy; safe to modify) or None
+        """
+        cached = self._user_cache.get(user_id)
+        if cached is not None:
+            expires_at, user = cached
+            if expires_at > time.monotonic():
+                self._user_cache.move_to_end(user_id)
+                return dict(user)
+            del self._user_cache[user_id]
+        
+        try:
+            user = await self.db.users.find_one({"_id": ObjectId(user_id)}, PROFILE_EXCLUDED_FIELDS)
+        except Exception as e:
+            logger.error(f"Error getting user by id: {e}")
+            raise
+        if not user:
+            return None
+        user["id"] = str(user["_id"])
+        del user["_id"]
+        
+        if self.user_cache_ttl > 0:
+            self._user_cache[user_id] = (time.monotonic() + self.user_cache_ttl, user)
+            if len(self._user_cache) > self.user_cache_size:
+                self._user_cache.popitem(last=False)
+        return dict(user)
+    
+    async def get_legacy_profile_photo(self, user_id: str):
+        """
+        Read only the legacy inline profile photo (base64 or URL) of a user
+        Args:
+            user_id (str): User id
+        Returns:
+            str: The photo, or None if the user has none
+        """
+        try:
+            user = await self.db.users.find_one({"_id": ObjectId(user_id)}, {"profile_photo": 1})
+        except Exception as e:
+            logger.error(f"Error getting legacy profile photo: {e}")
+            raise
+        return user.get("profile_photo") if user else None
+    
+    def invalidate_user(self, user_id: str):
+        """Drop a user from the profile cache after changing their document"""
+        self._user_cache.pop(user_id, None)
+    
+    async def update_user_profile(self, email: str, update_data: dict, unset: list = None):
+        """
+        Update user profile fields and return the updated profile in one round trip
+        Args:
+            email (str): User email
+            update_data (dict): Fields to set
+            unset (list): Fields to remove
+        Returns:
+            dict: Updated user (without password hash), or None if there is no such user
+        """
+        update = {"$set": update_data}
+        if unset:
+            update["$unset"] = {field: "" for field in unset}
         try:
-            result = await self.db.users.update_one(
+            updated_user = await find_one_and_update(
+                self.db.users,
                 {"email": email},
-                {"$set": update_data}
+                update,
+                projection=PROFILE_EXCLUDED_FIELDS
             )
             
-            if result.modified_count == 0:
+            if updated_user is None:
                 logger.warning(f"No user updated for email: {email}")
                 return None
             
-            # Return updated user
-            updated_user = await self.get_user_by_email(email)
+            self.invalidate_user(updated_user["id"])
             logger.info(f"User profile updated: {email}")
             return updated_user
         except Exception as e:
             logger.error(f"Error updating user profile: {e}")
             raise
             
+    async def update_password_hash(self, user_id: str, password_hash: str):
+        """Replace a user's password hash, e.g. after a work factor change"""
+        try:
+            await self.db.users.update_one(
+                {"_id": ObjectId(user_id)},
+                {"$set": {"password_hash": password_hash}}
+            )
+            self.invalidate_user(user_id)
+            logger.info(f"Password hash updated for user: {user_id}")
+        except Exception as e:
+            logger.error(f"Error updating password hash: {e}")
+            raise
+            
     async def verify_user_password(self, email: str, password: str):
         """Verify user password"""
         try:
@@ -126,7 +263,8 @@ class DBService:
     async def get_document_by_id(self, document_id: str):
         """Get document by ID"""
         try:
-            doc = await self.db.documents.find_one({"_id": ObjectId(document_id)})
+            # BM25 postings stored by earlier versions are rebuilt from the chunks instead
+            doc = await self.db.documents.find_one({"_id": ObjectId(document_id)}, {"bm25_index": 0})
             if doc:
                 doc["id"] = str(doc["_id"])
                 del doc["_id"]
@@ -170,6 +308,30 @@ class DBService:
             logger.error(f"Error creating voice transcript: {e}")
             raise
     
+    async def create_voice_transcripts(self, user_id: str, chat_id: str, transcripts: list):
+        """Create several voice transcript records with one bulk insert"""
+        try:
+            now = datetime.utcnow()
+            transcript_docs = [
+                {
+                    "user_id": user_id,
+                    "chat_id": chat_id,
+                    "transcript": transcript,
+                    "audio_url": None,
+                    "created_at": now
+                }
+                for transcript in transcripts
+            ]
+            
+            await self.db.voice_transcripts.insert_many(transcript_docs)
+            for transcript_doc in transcript_docs:
+                transcript_doc["id"] = str(transcript_doc.pop("_id"))
+            logger.info(f"Voice transcripts created: {len(transcript_docs)}")
+            return transcript_docs
+        except Exception as e:
+            logger.error(f"Error creating voice transcripts: {e}")
+            raise
+    
     async def get_voice_transcripts(self, user_id: str, limit: int = 50):
         """Get voice transcripts for a user"""
         try:
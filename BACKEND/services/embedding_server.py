@@ -0,0 +1,173 @@
+"""
+Local embedding server shared by all API workers
+
+Owns a single copy of the embedding model and serves every Uvicorn worker over
+a Unix socket. Requests arriving within a short window are coalesced into one
+model batch. Vectors are not sent over the socket: each client connection owns
+a shared-memory segment and the server writes float32 rows straight into it,
+so the client reads them without deserializing.
+
+Protocol (newline-delimited JSON over the socket):
+    -> {"op": "attach", "shm": "<segment name>"}   <- {"ok": true, "dim": 384}
+    -> {"op": "embed", "texts": [...]}             <- {"ok": true, "rows": n, "dim": 384}
+
+Usage (from BACKEND/):
+    python -m services.embedding_server
+and set EMBEDDING_BACKEND=remote for the API workers.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+from config.settings import settings
+from config.logging_config import setup_logging
+from services.embedding_service import create_embedding_backend
+
+logger = logging.getLogger(__name__)
+
+
+def attach_shared_memory(name):
+    """Attach to a segment owned by another process without adopting its cleanup"""
+    shm = shared_memory.SharedMemory(name=name)
+    # Before Python 3.13 attaching registers the segment with this process's
+    # resource tracker, which would unlink the client's segment when we exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class EmbeddingServer:
+    def __init__(self, backend, socket_path=None, max_batch=None, max_wait_ms=None):
+        self.backend = backend
+        self.socket_path = socket_path or settings.EMBEDDING_SOCKET
+        self.max_batch = max_batch or settings.EMBEDDING_SERVER_MAX_BATCH
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.EMBEDDING_SERVER_MAX_WAIT_MS) / 1000
+        self.dimension = settings.EMBEDDING_DIMENSION
+        # The model runs on one thread; it parallelizes internally via intra-op threads
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self.queue = None
+
+    async def serve(self):
+        """Listen on the Unix socket until cancelled"""
+        self.queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(
+            self.handle_client,
+            path=self.socket_path,
+            limit=settings.EMBEDDING_SERVER_MAX_REQUEST_BYTES
+        )
+        batcher = asyncio.create_task(self.run_batches())
+        logger.info(f"Embedding server listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def handle_client(self, reader, writer):
+        """Serve one API worker connection"""
+        shm = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if request["op"] == "attach":
+                        if shm is not None:
+                            shm.close()
+                        shm = attach_shared_memory(request["shm"])
+                        response = {"ok": True, "dim": self.dimension}
+                    elif request["op"] == "embed":
+                        response = await self.embed_into(request["texts"], shm)
+                    else:
+                        response = {"ok": False, "error": f"Unknown op: {request['op']}"}
+                except Exception as e:
+                    logger.error(f"Error handling embedding request: {e}")
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            if shm is not None:
+                shm.close()
+            writer.close()
+
+    async def embed_into(self, texts, shm):
+        """Embed texts via the shared batch and write the rows into the client's segment"""
+        if shm is None:
+            raise RuntimeError("No shared memory segment attached")
+        if len(texts) * self.dimension * 4 > shm.size:
+            raise RuntimeError("Shared memory segment too small for request")
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        vectors = await future
+
+        out = np.ndarray(vectors.shape, dtype=np.float32, buffer=shm.buf)
+        out[:] = vectors
+        del out  # Release the exported buffer so the segment can be closed
+        return {"ok": True, "rows": len(texts), "dim": self.dimension}
+
+    async def run_batches(self):
+        """Coalesce queued requests from all clients into model batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            total = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while total < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                total += len(item[0])
+
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = await loop.run_in_executor(self.executor, self.backend.encode, texts)
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(texts)} texts: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VoxAI local embedding server")
+    parser.add_argument("--socket", default=settings.EMBEDDING_SOCKET)
+    parser.add_argument("--backend", default=None, help="Embedding backend to serve (default: torch)")
+    args = parser.parse_args()
+
+    setup_logging()
+    # "remote" in the API workers' settings refers to this server, so never serve it
+    backend_name = args.backend or (settings.EMBEDDING_BACKEND if settings.EMBEDDING_BACKEND != "remote" else "torch")
+    backend = create_embedding_backend(backend_name)
+    server = EmbeddingServer(backend, socket_path=args.socket)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        logger.info("Embedding server stopped")
+
+
+if __name__ == "__main__":
+    main()
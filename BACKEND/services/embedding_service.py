@@ -0,0 +1,277 @@
+import os
+import json
+import socket
+import atexit
+import logging
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Lazy import to avoid early PyTorch loading
+_sentence_transformer_model = None
+_tokenizer = None
+_embedding_backend = None
+# Warm-up and the first request can ask for a model at the same time; only one loads it.
+# Reentrant because the torch backend loads the sentence transformer while holding it
+_load_lock = threading.RLock()
+
+def get_sentence_transformer():
+    global _sentence_transformer_model
+    if _sentence_transformer_model is None:
+        with _load_lock:
+            if _sentence_transformer_model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    _sentence_transformer_model = SentenceTransformer(settings.EMBEDDING_MODEL)
+                except Exception as e:
+                    logger.error(f"Failed to load sentence transformer: {e}")
+                    raise
+    return _sentence_transformer_model
+
+def get_tokenizer():
+    """
+    Get the embedding model's tokenizer (loaded without the model weights)
+    Returns:
+        Tokenizer, or False when unavailable and chunk sizes are approximated
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _load_lock:
+            if _tokenizer is None:
+                try:
+                    from transformers import AutoTokenizer
+                    _tokenizer = AutoTokenizer.from_pretrained(settings.EMBEDDING_TOKENIZER)
+                except Exception as e:
+                    logger.warning(f"Failed to load tokenizer, approximating token counts: {e}")
+                    _tokenizer = False
+    return _tokenizer
+
+
+class EmbeddingBackend:
+    """Interface for sentence embedding backends"""
+
+    name = "base"
+
+    def __init__(self, batch_size=None, threads=None):
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.threads = settings.EMBEDDING_THREADS if threads is None else threads
+
+    def encode(self, texts):
+        """
+        Embed texts
+        Args:
+            texts (list): Texts to embed
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), dimension), L2-normalized
+        """
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """PyTorch sentence-transformers backend"""
+
+    name = "torch"
+
+    def __init__(self, batch_size=None, threads=None):
+        super().__init__(batch_size, threads)
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        self.model = get_sentence_transformer()
+
+    def encode(self, texts):
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+
+class ONNXBackend(EmbeddingBackend):
+    """
+    ONNX Runtime backend; with a quantized model file this runs int8 inference.
+    Reproduces the sentence-transformers pipeline: mean pooling over the
+    attention mask followed by L2 normalization.
+    """
+
+    name = "onnx"
+
+    def __init__(self, batch_size=None, threads=None, model_file=None):
+        super().__init__(batch_size, threads)
+        import onnxruntime as ort
+
+        model_path = self._resolve_model(model_file or settings.EMBEDDING_ONNX_FILE)
+        options = ort.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = get_tokenizer()
+        if not self.tokenizer:
+            raise RuntimeError("ONNX embedding backend requires the model tokenizer")
+        logger.info(f"ONNX embedding model loaded: {model_path}")
+
+    def _resolve_model(self, model_file):
+        """Use a local model file if present, otherwise fetch it from the model repo"""
+        if os.path.exists(model_file):
+            return model_file
+        from huggingface_hub import hf_hub_download
+        return hf_hub_download(settings.EMBEDDING_TOKENIZER, model_file)
+
+    def encode(self, texts):
+        if not texts:
+            return np.zeros((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+
+        # Sorting by length keeps padding per batch small
+        order = np.argsort([len(t) for t in texts])
+        output = [None] * len(texts)
+
+        for start in range(0, len(texts), self.batch_size):
+            batch_ids = order[start:start + self.batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in batch_ids],
+                padding=True,
+                truncation=True,
+                max_length=settings.EMBEDDING_MAX_TOKENS,
+                return_tensors="np"
+            )
+            feeds = {
+                name: encoded[name].astype(np.int64)
+                for name in ("input_ids", "attention_mask", "token_type_ids")
+                if name in self.input_names and name in encoded
+            }
+            if "token_type_ids" in self.input_names and "token_type_ids" not in feeds:
+                feeds["token_type_ids"] = np.zeros_like(feeds["input_ids"])
+
+            token_embeddings = self.session.run(None, feeds)[0]
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.linalg.norm(pooled, axis=1, keepdims=True) + 1e-12
+
+            for i, vector in zip(batch_ids, pooled):
+                output[i] = vector
+
+        return np.stack(output).astype(np.float32, copy=False)
+
+
+class RemoteEmbeddingBackend(EmbeddingBackend):
+    """
+    Client for the shared embedding server (services/embedding_server.py).
+    Each thread keeps its own connection and shared-memory segment; returned
+    arrays are views into that segment and stay valid until the same thread's
+    next encode call.
+    """
+
+    name = "remote"
+
+    def __init__(self, batch_size=None, threads=None, socket_path=None):
+        super().__init__(batch_size, threads)
+        self.socket_path = socket_path or settings.EMBEDDING_SOCKET
+        self._local = threading.local()
+        self._segments = []
+        atexit.register(self.close)
+
+    def _request(self, conn, payload):
+        conn["file"].write(json.dumps(payload).encode() + b"\n")
+        conn["file"].flush()
+        line = conn["file"].readline()
+        if not line:
+            raise ConnectionError("Embedding server closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(f"Embedding server error: {response.get('error')}")
+        return response
+
+    def _connection(self, nbytes):
+        """Get this thread's connection with a segment of at least nbytes"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            conn = {"sock": sock, "file": sock.makefile("rwb"), "shm": None, "dim": None}
+            self._local.conn = conn
+
+        if conn["shm"] is None or conn["shm"].size < nbytes:
+            size = max(settings.EMBEDDING_SHM_BYTES, 1 << max(nbytes - 1, 1).bit_length())
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self._segments.append(shm)
+            conn["dim"] = self._request(conn, {"op": "attach", "shm": shm.name})["dim"]
+            if conn["shm"] is not None:
+                self._release(conn["shm"])
+            conn["shm"] = shm
+        return conn
+
+    def _release(self, shm):
+        if shm in self._segments:
+            self._segments.remove(shm)
+        try:
+            shm.close()
+        except BufferError:
+            pass  # A caller still holds a view; the segment is unlinked regardless
+        shm.unlink()
+
+    def encode(self, texts):
+        if not texts:
+            return np.zeros((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+        try:
+            conn = self._connection(len(texts) * settings.EMBEDDING_DIMENSION * 4)
+            response = self._request(conn, {"op": "embed", "texts": list(texts)})
+        except (OSError, ConnectionError):
+            # Reconnect on the next call, e.g. after the server restarts
+            self._drop_connection()
+            raise
+        return np.ndarray((response["rows"], response["dim"]), dtype=np.float32, buffer=conn["shm"].buf)
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            conn["sock"].close()
+            if conn["shm"] is not None:
+                self._release(conn["shm"])
+
+    def close(self):
+        """Unlink every segment this process created"""
+        for shm in list(self._segments):
+            self._release(shm)
+
+
+EMBEDDING_BACKENDS = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    ONNXBackend.name: ONNXBackend,
+    RemoteEmbeddingBackend.name: RemoteEmbeddingBackend,
+}
+
+def create_embedding_backend(name=None, **kwargs):
+    """
+    Create an embedding backend
+    Args:
+        name (str): Backend name ("torch", "onnx" or "remote"); defaults to settings.EMBEDDING_BACKEND
+    Returns:
+        EmbeddingBackend: Backend instance
+    """
+    name = name or settings.EMBEDDING_BACKEND
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {name}")
+    return EMBEDDING_BACKENDS[name](**kwargs)
+
+def get_embedding_backend():
+    """Get the configured embedding backend, loading it on first use"""
+    global _embedding_backend
+    if _embedding_backend is None:
+        with _load_lock:
+            if _embedding_backend is None:
+                try:
+                    _embedding_backend = create_embedding_backend()
+                    logger.info(f"Embedding backend initialized: {_embedding_backend.name}")
+                except Exception as e:
+                    logger.error(f"Failed to load embedding backend: {e}")
+                    raise
+    return _embedding_backend
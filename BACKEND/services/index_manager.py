@@ -0,0 +1,179 @@
+"""
+Schema/index manager
+
+Each service declares the indexes its queries need (INDEXES) and the shapes of
+its hot queries (QUERIES) next to its code. The startup warm-up (once Mongo
+answers) runs ensure_indexes to create any missing index; the diagnostics command explains every declared query and
+reports the ones MongoDB would answer with a collection scan.
+
+Usage (from BACKEND/):
+    python -m services.index_manager            # create missing indexes
+    python -m services.index_manager --explain  # also report collection scans
+"""
+
+import argparse
+import asyncio
+import logging
+from pymongo import IndexModel
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec:
+    """An index a service relies on"""
+
+    def __init__(self, collection, keys, **options):
+        self.collection = collection
+        self.keys = keys if isinstance(keys, list) else [(keys, 1)]
+        self.options = options
+
+    def key_pattern(self):
+        return tuple((field, direction) for field, direction in self.keys)
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}:{direction}" for field, direction in self.keys)
+        return f"{self.collection}({fields})"
+
+
+class QuerySpec:
+    """The shape of a hot query, explained by the diagnostics command"""
+
+    def __init__(self, name, collection, filter, sort=None):
+        self.name = name
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+
+
+def collect_specs():
+    """Gather INDEXES and QUERIES declared by the services"""
+    from services import chat_service, db_service
+
+    indexes, queries = [], []
+    for module in (chat_service, db_service):
+        indexes.extend(module.INDEXES)
+        queries.extend(module.QUERIES)
+    return indexes, queries
+
+
+async def ensure_indexes(database, specs=None):
+    """
+    Create declared indexes that do not exist yet; existing ones are left alone
+    Args:
+        database: Motor database
+        specs (list): IndexSpecs; defaults to every service's INDEXES
+    Returns:
+        list: IndexSpecs that were created
+    Raises:
+        RuntimeError: Some indexes could not be created (the others still are)
+    """
+    if specs is None:
+        specs, _ = collect_specs()
+
+    by_collection = {}
+    for spec in specs:
+        by_collection.setdefault(spec.collection, []).append(spec)
+
+    created = []
+    failed = []
+    for collection_name, collection_specs in by_collection.items():
+        collection = database[collection_name]
+        existing = {
+            tuple(
+                (field, direction if isinstance(direction, str) else int(direction))
+                for field, direction in index["key"].items()
+            )
+            async for index in collection.list_indexes()
+        }
+        missing = [spec for spec in collection_specs if spec.key_pattern() not in existing]
+        if not missing:
+            continue
+        try:
+            await collection.create_indexes([IndexModel(spec.keys, **spec.options) for spec in missing])
+            created.extend(missing)
+            logger.info(f"Created indexes: {', '.join(repr(spec) for spec in missing)}")
+        except Exception as e:
+            logger.error(f"Error creating indexes on {collection_name}: {e}")
+            failed.append(collection_name)
+    if failed:
+        raise RuntimeError(f"Could not create indexes on {', '.join(failed)}")
+    return created
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def explain_queries(database, queries=None):
+    """
+    Explain declared hot queries
+    Args:
+        database: Motor database
+        queries (list): QuerySpecs; defaults to every service's QUERIES
+    Returns:
+        list: (QuerySpec, stages) tuples for queries whose winning plan has a COLLSCAN
+    """
+    if queries is None:
+        _, queries = collect_specs()
+
+    scans = []
+    for query in queries:
+        cursor = database[query.collection].find(query.filter)
+        if query.sort:
+            cursor = cursor.sort(query.sort)
+        plan = await cursor.explain()
+        stages = list(_plan_stages(plan.get("queryPlanner", {}).get("winningPlan", {})))
+        if "COLLSCAN" in stages:
+            scans.append((query, stages))
+            logger.warning(f"Query {query.name} uses a collection scan: {' <- '.join(stages)}")
+    return scans
+
+
+async def run_diagnostics(explain=False):
+    from config.database import db
+
+    await db.init_db()
+    database = db.get_db()
+    if database is None:
+        print("Database connection failed")
+        return 2
+    try:
+        try:
+            created = await ensure_indexes(database)
+        except RuntimeError as e:
+            print(e)
+            return 2
+        print(f"Created {len(created)} missing index(es)")
+        for spec in created:
+            print(f"  + {spec!r}")
+
+        if explain:
+            _, queries = collect_specs()
+            scans = await explain_queries(database, queries)
+            print(f"\nExplained {len(queries)} hot queries, {len(scans)} use a collection scan")
+            for query, stages in scans:
+                print(f"  ! {query.name}: {' <- '.join(stages)}")
+            return 1 if scans else 0
+        return 0
+    finally:
+        await db.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create missing MongoDB indexes and diagnose hot queries")
+    parser.add_argument("--explain", action="store_true", help="Report hot queries that use a collection scan")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run_diagnostics(explain=args.explain)))
+
+
+if __name__ == "__main__":
+    main()
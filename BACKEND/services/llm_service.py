@@ -1,20 +1,45 @@
-from groq import Groq
 import logging
+import time
 from config.settings import settings
+from utils.admission import admission
+from utils.resilience import llm_policy
+from utils.metrics import observe_stage, stage
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 class LLMService:
     def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        self._client = None  # Created on first use: importing groq (and httpx) is slow
         self.model = settings.GROQ_MODEL
+
+    @property
+    def client(self):
+        if self._client is None:
+            # A race here only creates a spare client
+            from groq import Groq
+            import httpx
+
+            self._client = Groq(
+                api_key=settings.GROQ_API_KEY,
+                base_url=settings.GROQ_BASE_URL,
+                timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+                max_retries=settings.LLM_MAX_RETRIES
+            )
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
         
-    def generate_response(self, prompt, context=""):
+    def generate_response(self, prompt, context="", history=None, user_id=None):
         """
         Generate response using Groq LLM (non-streaming)
         Args:
             prompt (str): User's prompt
             context (str): Additional context for the LLM
+            history (list): Prior {"role", "content"} messages of the conversation
+            user_id (str): User charged for admission control
         Returns:
             str: Generated response
         """
@@ -38,20 +63,27 @@ Reply exactly how a normal message should appear in a chat UI.
                     "role": "system",
                     "content": system_prompt
                 },
+                *(history or []),
                 {
                     "role": "user",
                     "content": prompt
                 }
             ]
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=4096,  # Increased from 1024 to 4096
-                top_p=1,
-                stream=False
-            )
+            with admission.limit("llm", user_id), stage("llm_total"), tracer.span("llm", {"model": self.model}) as span:
+                response = llm_policy.call(lambda timeout: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=4096,  # Increased from 1024 to 4096
+                    top_p=1,
+                    stream=False
+                ))
+                if response.usage:
+                    span.set_attributes({
+                        "llm.prompt_tokens": response.usage.prompt_tokens,
+                        "llm.completion_tokens": response.usage.completion_tokens,
+                    })
             
             result = response.choices[0].message.content
             logger.info("LLM response generated successfully")
@@ -61,12 +93,14 @@ Reply exactly how a normal message should appear in a chat UI.
             logger.error(f"Error in LLM generation: {e}")
             raise
     
-    def generate_response_stream(self, prompt, context=""):
+    def generate_response_stream(self, prompt, context="", history=None, user_id=None):
         """
         Generate streaming response using Groq LLM
         Args:
             prompt (str): User's prompt
             context (str): Additional context for the LLM
+            history (list): Prior {"role", "content"} messages of the conversation
+            user_id (str): User charged for admission control; the slot is held until the stream ends
         Yields:
             str: Chunks of generated response
         """
@@ -90,24 +124,36 @@ Reply exactly how a normal message should appear in a chat UI.
                     "role": "system",
                     "content": system_prompt
                 },
+                *(history or []),
                 {
                     "role": "user",
                     "content": prompt
                 }
             ]
             
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=4096,  # Full length responses
-                top_p=1,
-                stream=True  # Enable streaming
-            )
-            
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            with admission.limit("llm", user_id):
+                start = time.perf_counter()
+                first_token = True
+                stream = llm_policy.call(lambda timeout: self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=4096,  # Full length responses
+                    top_p=1,
+                    stream=True  # Enable streaming
+                ))
+                
+                try:
+                    for chunk in stream:
+                        if chunk.choices[0].delta.content:
+                            if first_token:
+                                first_token = False
+                                observe_stage("llm_first_token", time.perf_counter() - start)
+                            yield chunk.choices[0].delta.content
+                    observe_stage("llm_total", time.perf_counter() - start)
+                finally:
+                    # Closing early (consumer gone) drops the connection so Groq stops generating
+                    stream.close()
             
             logger.info("LLM streaming response completed successfully")
             
@@ -1,28 +1,44 @@
-import fitz  # PyMuPDF
-import numpy as np
+import re
 import uuid
 import logging
+from bisect import bisect_right
 from config.settings import settings
+from services.retrieval_service import retrieval_service
+from utils.metrics import stage
 
 logger = logging.getLogger(__name__)
 
-# Lazy import to avoid early PyTorch loading
-_sentence_transformer_model = None
+# Page breaks are marked with a form feed, paragraphs with a blank line
+PAGE_BREAK = "\f"
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_FALLBACK_TOKEN = re.compile(r"\w+|[^\w\s]")
 
-def get_sentence_transformer():
-    global _sentence_transformer_model
-    if _sentence_transformer_model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            _sentence_transformer_model = SentenceTransformer('all-MiniLM-L6-v2')
-        except Exception as e:
-            logger.error(f"Failed to load sentence transformer: {e}")
-            raise
-    return _sentence_transformer_model
+def token_offsets(texts):
+    """
+    Tokenize texts into (start, end) character offsets of each model token
+    Args:
+        texts (list): Texts to tokenize
+    Returns:
+        list: One list of (start, end) offsets per text
+    """
+    from services.embedding_service import get_tokenizer
+
+    tokenizer = get_tokenizer()
+    if tokenizer:
+        encoded = tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+            verbose=False
+        )
+        return encoded["offset_mapping"]
+    return [[m.span() for m in _FALLBACK_TOKEN.finditer(text)] for text in texts]
 
 class PDFService:
     def __init__(self):
-        self.model = None  # Lazy load when needed
+        self.backend = None  # Lazy load when needed
         
     def extract_text(self, file_path):
         """
@@ -30,53 +46,77 @@ class PDFService:
         Args:
             file_path (str): Path to PDF file
         Returns:
-            str: Extracted text
+            str: Extracted text; text blocks are separated by blank lines, pages by form feeds
         """
+        import fitz  # PyMuPDF
+
         try:
-            doc = fitz.open(file_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()
+            with stage("pdf_extraction"):
+                doc = fitz.open(file_path)
+                pages = []
+                for page in doc:
+                    blocks = page.get_text("blocks")
+                    # Block type 0 is text, 1 is image
+                    pages.append("\n\n".join(b[4].strip() for b in blocks if b[6] == 0))
+                doc.close()
+            text = PAGE_BREAK.join(pages)
             logger.info(f"Text extracted from PDF: {file_path}")
             return text
         except Exception as e:
             logger.error(f"Error extracting text from PDF: {e}")
             raise
             
-    def chunk_text(self, text, chunk_size=400, overlap=50):
+    def chunk_text(self, text, chunk_size=None, overlap=None):
         """
-        Split text into chunks
+        Split text into chunks of at most chunk_size model tokens in a single pass.
+        Chunks never span pages, prefer to end on a paragraph boundary and repeat
+        the last overlap tokens of the previous chunk.
         Args:
             text (str): Text to chunk
-            chunk_size (int): Size of each chunk
-            overlap (int): Overlap between chunks
+            chunk_size (int): Maximum tokens per chunk
+            overlap (int): Tokens shared between consecutive chunks
         Returns:
             list: List of text chunks
         """
         try:
-            sentences = text.split('. ')
+            # Leave room for [CLS]/[SEP] so the model never truncates a chunk
+            max_tokens = min(chunk_size or settings.CHUNK_TOKENS, settings.EMBEDDING_MAX_TOKENS - 2)
+            overlap = settings.CHUNK_OVERLAP_TOKENS if overlap is None else overlap
+            if not 0 <= overlap < max_tokens:
+                raise ValueError(f"overlap must be between 0 and {max_tokens - 1} tokens")
+            min_tokens = max(overlap + 1, max_tokens // 2)
+
+            pages = [page for page in text.split(PAGE_BREAK) if page.strip()]
             chunks = []
-            current_chunk = []
-            current_length = 0
-            
-            for sentence in sentences:
-                sentence_length = len(sentence)
-                if current_length + sentence_length > chunk_size and current_chunk:
-                    # Save current chunk
-                    chunks.append('. '.join(current_chunk) + '.')
-                    # Start new chunk with overlap
-                    overlap_sentences = max(0, len(current_chunk) - overlap//50)
-                    current_chunk = current_chunk[overlap_sentences:] if overlap_sentences < len(current_chunk) else []
-                    current_length = sum(len(s) for s in current_chunk)
-                
-                current_chunk.append(sentence)
-                current_length += sentence_length
-                
-            # Add the last chunk
-            if current_chunk:
-                chunks.append('. '.join(current_chunk) + '.')
-                
+
+            for page, offsets in zip(pages, token_offsets(pages)):
+                n = len(offsets)
+                if n == 0:
+                    continue
+
+                # Token indices that start a new paragraph, found by merging the
+                # sorted paragraph-break positions with the sorted token offsets
+                boundaries = []
+                t = 0
+                for match in _PARAGRAPH_BREAK.finditer(page):
+                    while t < n and offsets[t][0] < match.end():
+                        t += 1
+                    if 0 < t < n and (not boundaries or boundaries[-1] != t):
+                        boundaries.append(t)
+
+                start = 0
+                while True:
+                    end = min(start + max_tokens, n)
+                    if end < n:
+                        # Snap back to the last paragraph boundary if it keeps the chunk reasonably full
+                        j = bisect_right(boundaries, end) - 1
+                        if j >= 0 and boundaries[j] >= start + min_tokens:
+                            end = boundaries[j]
+                    chunks.append(page[offsets[start][0]:offsets[end - 1][1]])
+                    if end >= n:
+                        break
+                    start = end - overlap
+
             logger.info(f"Text chunked into {len(chunks)} chunks")
             return chunks
         except Exception as e:
@@ -92,9 +132,12 @@ class PDFService:
             list: List of embeddings
         """
         try:
-            if self.model is None:
-                self.model = get_sentence_transformer()
-            embeddings = self.model.encode(chunks)
+            if self.backend is None:
+                from services.embedding_service import get_embedding_backend
+
+                self.backend = get_embedding_backend()
+            with stage("embedding"):
+                embeddings = self.backend.encode(chunks)
             logger.info(f"Generated embeddings for {len(chunks)} chunks")
             return embeddings.tolist()
         except Exception as e:
@@ -103,11 +146,11 @@ class PDFService:
             
     def process_pdf(self, file_path):
         """
-        Process PDF file: extract text, chunk, and generate embeddings
+        Process PDF file: extract text, chunk, generate embeddings and build the BM25 index
         Args:
             file_path (str): Path to PDF file
         Returns:
-            dict: Processed document with chunks and embeddings
+            dict: Processed document with chunks, embeddings and BM25 index
         """
         try:
             # Extract text
@@ -119,6 +162,9 @@ class PDFService:
             # Generate embeddings
             embeddings = self.generate_embeddings(chunks)
             
+            # Build lexical index for hybrid retrieval
+            bm25_index = retrieval_service.build_index(chunks)
+            
             # Create document structure
             document_chunks = []
             for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
@@ -131,7 +177,8 @@ class PDFService:
             logger.info(f"PDF processing completed: {len(document_chunks)} chunks")
             return {
                 "extracted_text": text,
-                "chunks": document_chunks
+                "chunks": document_chunks,
+                "bm25_index": bm25_index
             }
         except Exception as e:
             logger.error(f"Error processing PDF: {e}")
@@ -1,9 +1,9 @@
 import re
-import requests
 import logging
 from services.llm_service import llm_service
 from services.web_search_service import web_search_service
 from config.settings import settings
+from utils.admission import AdmissionRejected
 
 logger = logging.getLogger(__name__)
 
@@ -11,20 +11,6 @@ class QueryRouter:
     def __init__(self):
         self.college_info = settings.COLLEGE_INFO
         
-    def get_public_ip(self):
-        """Get user's public IP address"""
-        try:
-            response = requests.get("https://api.ipify.org?format=json")
-            if response.status_code == 200:
-                ip_data = response.json()
-                logger.info(f"Public IP retrieved: {ip_data['ip']}")
-                return ip_data['ip']
-            else:
-                raise Exception(f"Failed to get IP: {response.status_code}")
-        except Exception as e:
-            logger.error(f"Error getting public IP: {e}")
-            raise
-            
     def classify_query(self, query, mode="smart"):
         """
         Classify the query to determine the appropriate response handler
@@ -65,34 +51,41 @@ class QueryRouter:
             logger.error(f"Error classifying query: {e}")
             return "general"
             
-    def handle_query(self, query, mode="smart", pdf_context=None):
+    def handle_query(self, query, mode="smart", pdf_context=None, user_id=None, client_ip=None):
         """
         Handle query based on classification
         Args:
             query (str): User's query
             mode (str): Chat mode
             pdf_context (dict): PDF context for RAG queries
+            user_id (str): User charged for admission control
+            client_ip (str): Requester's IP from utils.client_ip, for "my ip" queries
         Returns:
             str: Generated response
+        Raises:
+            AdmissionRejected: Upstream busy or user over rate
         """
         try:
             handler_type = self.classify_query(query, mode)
             
             if handler_type == "ip":
-                ip_address = self.get_public_ip()
-                response = f"Your public IP address is: {ip_address}"
+                if client_ip:
+                    response = f"Your public IP address is: {client_ip}"
+                else:
+                    response = "I couldn't determine your IP address from this connection."
                 
             elif handler_type == "pdf" and pdf_context:
                 # For PDF queries, we would normally do RAG here
                 # This is a simplified version
                 response = llm_service.generate_response(
                     query, 
-                    f"Answer based on this document context: {pdf_context.get('extracted_text', '')[:1000]}..."
+                    f"Answer based on this document context: {pdf_context.get('extracted_text', '')[:1000]}...",
+                    user_id=user_id
                 )
                 
             elif handler_type == "web":
                 # Perform web search
-                search_results = web_search_service.search(query)
+                search_results = web_search_service.search(query, user_id=user_id)
                 answer = search_results.get('answer', '')
                 if answer:
                     response = answer
@@ -101,21 +94,25 @@ class QueryRouter:
                     context = "Web search results:\n"
                     for result in search_results.get('results', [])[:3]:
                         context += f"- {result.get('title', '')}: {result.get('content', '')}\n"
-                    response = llm_service.generate_response(query, context)
+                    response = llm_service.generate_response(query, context, user_id=user_id)
                     
             elif handler_type == "college":
                 # Answer college-related questions
                 response = llm_service.generate_response(
                     query, 
-                    f"College information: {self.college_info}"
+                    f"College information: {self.college_info}",
+                    user_id=user_id
                 )
                 
             else:  # general
-                response = llm_service.generate_response(query)
+                response = llm_service.generate_response(query, user_id=user_id)
                 
             logger.info(f"Query handled with handler type: {handler_type}")
             return response
             
+        except AdmissionRejected:
+            # Let the caller answer 429 instead of a canned apology
+            raise
         except Exception as e:
             logger.error(f"Error handling query: {e}")
             # Fallback response
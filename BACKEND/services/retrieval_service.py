@@ -0,0 +1,297 @@
+import asyncio
+import io
+import json
+import re
+import threading
+import time
+import logging
+from collections import Counter, OrderedDict
+from itertools import chain
+from services.blob_service import blob_service
+
+logger = logging.getLogger(__name__)
+
+# Keeps course codes ("CS101", "cs-101") and section numbers ("3.2.1") together
+_TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/]\w+)*")
+_SPLIT_PATTERN = re.compile(r"[.\-/]")
+
+
+def tokenize(text):
+    """
+    Tokenize text for lexical (BM25) matching
+    Args:
+        text (str): Text to tokenize
+    Returns:
+        list: Lowercased terms; compound terms are also emitted split into their parts
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        if _SPLIT_PATTERN.search(token):
+            terms.extend(part for part in _SPLIT_PATTERN.split(token) if part)
+    return terms
+
+
+class BM25Index:
+    """
+    Inverted-index BM25 (Okapi) scorer over a document's chunks. Postings are
+    flat arrays: term t's postings are chunk_ids[offsets[t]:offsets[t + 1]]
+    (and the same slice of tfs), so the index serializes to a handful of
+    arrays and loads without rebuilding a list per term.
+    """
+
+    def __init__(self, terms, offsets, chunk_ids, tfs, doc_lengths, k1=1.5, b=0.75):
+        import numpy as np
+
+        self.term_ids = {term: t for t, term in enumerate(terms)}
+        self.offsets = offsets
+        self.chunk_ids = chunk_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.num_docs = len(doc_lengths)
+        self.avg_doc_length = float(doc_lengths.mean()) if self.num_docs else 0.0
+        document_frequency = np.diff(offsets)
+        self._idf = np.log(1 + (self.num_docs - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    @classmethod
+    def build(cls, chunks, k1=1.5, b=0.75):
+        """
+        Build an index from chunk texts
+        Args:
+            chunks (list): List of chunk texts
+        Returns:
+            BM25Index: Built index
+        """
+        import numpy as np
+
+        postings = {}
+        doc_lengths = []
+        for i, chunk in enumerate(chunks):
+            terms = tokenize(chunk)
+            doc_lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append((i, tf))
+
+        terms = list(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        pairs = np.fromiter(
+            chain.from_iterable(chain.from_iterable(postings[term] for term in terms)),
+            dtype=np.int32, count=2 * int(offsets[-1])
+        ).reshape(-1, 2)
+        return cls(terms, offsets, pairs[:, 0].copy(), pairs[:, 1].copy(),
+                   np.asarray(doc_lengths, dtype=np.float32), k1=k1, b=b)
+
+    def search(self, query, top_k=10):
+        """
+        Score chunks against a query
+        Args:
+            query (str): Query text
+            top_k (int): Number of results to return
+        Returns:
+            list: (chunk_index, score) tuples, best first
+        """
+        import numpy as np
+
+        if not self.num_docs:
+            return []
+
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        k1 = self.k1
+        norm = k1 * (1 - self.b)
+        length_factor = k1 * self.b / (self.avg_doc_length or 1.0)
+
+        # Only chunks containing a query term are ever touched
+        for term in set(tokenize(query)):
+            t = self.term_ids.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            ids = self.chunk_ids[start:end]  # Unique within a term
+            tfs = self.tfs[start:end]
+            scores[ids] += self._idf[t] * tfs * (k1 + 1) / (tfs + norm + length_factor * self.doc_lengths[ids])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def to_bytes(self):
+        """Serialize the index for the blob store"""
+        import numpy as np
+
+        buffer = io.BytesIO()
+        # Terms are stored as one JSON string, so loading never needs pickle
+        terms = json.dumps(list(self.term_ids)).encode()
+        np.savez(
+            buffer,
+            terms=np.frombuffer(terms, dtype=np.uint8),
+            offsets=self.offsets,
+            chunk_ids=self.chunk_ids,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b])
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Load an index serialized with to_bytes"""
+        import numpy as np
+
+        with np.load(io.BytesIO(data)) as arrays:
+            k1, b = arrays["params"].tolist()
+            return cls(json.loads(arrays["terms"].tobytes()), arrays["offsets"], arrays["chunk_ids"],
+                       arrays["tfs"], arrays["doc_lengths"], k1=k1, b=b)
+
+
+def reciprocal_rank_fusion(rankings, k=60, top_k=10):
+    """
+    Fuse several rankings with reciprocal rank fusion
+    Args:
+        rankings (list): Lists of chunk indices, each best first
+        k (int): RRF damping constant
+        top_k (int): Number of results to return
+    Returns:
+        list: (chunk_index, fused_score) tuples, best first
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, i in enumerate(ranking):
+            fused[i] = fused.get(i, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+class RetrievalService:
+    """
+    Hybrid (BM25 + vector) ranking of a document's chunks. BM25 indexes are
+    built once at ingestion and kept in the blob store, not on the document:
+    their postings grow with the text and would push large documents past
+    Mongo's 16 MB limit. Loaded indexes and embedding matrices are cached.
+    """
+
+    def __init__(self, store=None, candidates=50, rrf_k=60, cache_size=32):
+        self.store = store  # Blob store (put/get by key) for serialized indexes
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # document id -> (BM25Index, embedding matrix)
+        self._cache_lock = threading.Lock()  # Documents are loaded and searched on worker threads
+
+    @staticmethod
+    def _index_key(document_id):
+        return f"bm25_{document_id}"
+
+    def build_index(self, chunks):
+        """
+        Build the lexical index for a document at ingestion time
+        Args:
+            chunks (list): List of chunk texts
+        Returns:
+            BM25Index: Built index, to be stored with save_index
+        """
+        start = time.perf_counter()
+        index = BM25Index.build(chunks)
+        logger.info(f"BM25 index built for {len(chunks)} chunks in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return index
+
+    async def save_index(self, document_id, index):
+        """Serialize a document's BM25 index (on a thread) and store it"""
+        data = await asyncio.to_thread(index.to_bytes)
+        await self.store.put(self._index_key(document_id), data)
+        logger.info(f"BM25 index stored for document {document_id}: {len(data) / 1024:.0f} KB")
+
+    async def load(self, document):
+        """
+        Cache a document's BM25 index and embedding matrix ahead of a search:
+        the stored index is read from the blob store, and deserializing it
+        and stacking the embeddings run on a thread, off the event loop
+        Args:
+            document (dict): Document with id and chunks
+        """
+        doc_id = document.get("id")
+        if not doc_id:
+            return
+        with self._cache_lock:
+            if doc_id in self._cache:
+                return
+        stored_index = await self.store.get(self._index_key(doc_id)) if self.store else None
+        await asyncio.to_thread(self._load, document, stored_index)
+
+    def _load(self, document, stored_index=None):
+        """Load (and cache) the BM25 index and embedding matrix for a document"""
+        import numpy as np
+
+        doc_id = document.get("id")
+        if doc_id:
+            with self._cache_lock:
+                cached = self._cache.get(doc_id)
+                if cached is not None:
+                    self._cache.move_to_end(doc_id)
+                    return cached
+
+        chunks = document.get("chunks", [])
+        if stored_index is not None:
+            index = BM25Index.from_bytes(stored_index)
+        else:
+            # Documents ingested before indexes were stored have none
+            index = self.build_index([chunk.get("text", "") for chunk in chunks])
+
+        matrix = np.asarray([chunk["embedding"] for chunk in chunks], dtype=np.float32)
+        if matrix.size:
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+
+        if doc_id:
+            with self._cache_lock:
+                self._cache[doc_id] = (index, matrix)
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return index, matrix
+
+    def bm25_search(self, document, query, top_k=3):
+        """Rank chunks by BM25 only"""
+        index, _ = self._load(document)
+        return [i for i, _ in index.search(query, top_k)]
+
+    def vector_search(self, document, query_embedding, top_k=3):
+        """Rank chunks by cosine similarity only"""
+        import numpy as np
+
+        _, matrix = self._load(document)
+        if not matrix.size:
+            return []
+        query = np.array(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        similarities = matrix @ query
+        top_k = min(top_k, len(similarities))
+        best = np.argpartition(-similarities, top_k - 1)[:top_k]
+        return best[np.argsort(-similarities[best])].tolist()
+
+    def hybrid_search(self, document, query, query_embedding, top_k=3):
+        """
+        Rank chunks by fusing BM25 and cosine similarity rankings (blocking:
+        await load(document) first, then run it on a thread)
+        Args:
+            document (dict): Document with chunks
+            query (str): Query text
+            query_embedding (list): Embedding of the query
+            top_k (int): Number of chunks to return
+        Returns:
+            list: Best matching chunks
+        """
+        lexical = self.bm25_search(document, query, self.candidates)
+        semantic = self.vector_search(document, query_embedding, self.candidates)
+        fused = reciprocal_rank_fusion([lexical, semantic], k=self.rrf_k, top_k=top_k)
+        chunks = document.get("chunks", [])
+        return [chunks[i] for i, _ in fused]
+
+    def invalidate(self, document_id):
+        """Drop a cached document index"""
+        with self._cache_lock:
+            self._cache.pop(document_id, None)
+
+# Global instance
+retrieval_service = RetrievalService(store=blob_service.store)
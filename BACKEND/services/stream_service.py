@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import uuid
+from config.settings import settings
+from utils.sse import HEARTBEAT, format_event
+from utils.metrics import QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class ChatStream:
+    """
+    One assistant response being generated. Framed events are kept in a
+    buffer so a client that reconnects with Last-Event-ID gets what it
+    missed, then follows the live stream.
+    """
+
+    def __init__(self, stream_id, chat_id, user_id):
+        self.stream_id = stream_id
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.events = []  # Framed events; event id n is events[n - 1]
+        self.done = False
+        self.cancelled = False
+        self.subscribers = 0
+        self.task = None
+        self._changed = asyncio.Condition()
+        self._cancel_handle = None
+
+    async def publish(self, data, event=None):
+        """Append an event to the buffer and wake subscribers"""
+        async with self._changed:
+            self.events.append(format_event(data, event=event, event_id=len(self.events) + 1))
+            self._changed.notify_all()
+
+    async def finish(self):
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def subscribe(self, last_event_id=0, heartbeat=None):
+        """
+        Follow the stream from after last_event_id
+        Args:
+            last_event_id (int): Last event the client received (0 for all)
+            heartbeat (float): Seconds of silence before a heartbeat comment
+        Yields:
+            str: Framed events, then the "done" event once generation has finished
+        """
+        heartbeat = heartbeat or settings.SSE_HEARTBEAT_SECONDS
+        position = max(0, min(last_event_id, len(self.events)))
+        self._attach()
+        try:
+            while True:
+                async with self._changed:
+                    try:
+                        await asyncio.wait_for(
+                            self._changed.wait_for(lambda: len(self.events) > position or self.done),
+                            heartbeat
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                    pending = self.events[position:]
+                    finished = self.done
+                if not pending and not finished:
+                    yield HEARTBEAT
+                    continue
+                for framed in pending:
+                    yield framed
+                position += len(pending)
+                if finished:
+                    yield format_event("[DONE]", event="done")
+                    return
+        finally:
+            self._detach()
+
+    def _attach(self):
+        self.subscribers += 1
+        if self._cancel_handle:
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+
+    def _detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0:
+            self._detach_timer()
+
+    def _detach_timer(self):
+        if not self.done:
+            # Keep generating briefly in case the client reconnects, then stop
+            # paying for tokens nobody will read
+            self._cancel_handle = asyncio.get_running_loop().call_later(
+                settings.STREAM_RESUME_GRACE_SECONDS, self._cancel_if_detached
+            )
+
+    def _cancel_if_detached(self):
+        if self.subscribers == 0 and not self.done:
+            logger.info(f"Stream {self.stream_id} of chat {self.chat_id}: client gone, cancelling generation")
+            self.cancelled = True
+            self.task.cancel()
+
+
+class StreamService:
+    """Per-worker registry of chat streams, kept for a short while after they finish"""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else settings.STREAM_BUFFER_TTL_SECONDS
+        self._streams = {}
+
+    def start(self, chat_id, user_id, produce):
+        """
+        Start generating a response in the background
+        Args:
+            chat_id (str): Chat ID
+            user_id (str): Owner of the chat
+            produce: Async function taking the ChatStream; publishes events and
+                     persists the response. If the client stays away past the
+                     grace period it is cancelled and should persist what it has.
+        Returns:
+            ChatStream: The stream, whose first event carries its stream_id
+        """
+        stream = ChatStream(uuid.uuid4().hex, chat_id, user_id)
+        stream.events.append(format_event(json.dumps({"stream_id": stream.stream_id}), event="stream", event_id=1))
+        self._streams[stream.stream_id] = stream
+
+        async def run():
+            try:
+                await produce(stream)
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"Error in stream {stream.stream_id} of chat {chat_id}: {e}")
+            finally:
+                await stream.finish()
+                asyncio.get_running_loop().call_later(self.ttl, self._streams.pop, stream.stream_id, None)
+
+        stream.task = asyncio.create_task(run())
+        # Until the response attaches, the stream counts as detached
+        stream._detach_timer()
+        return stream
+
+    def get(self, stream_id):
+        """Get a live or recently finished stream, or None"""
+        return self._streams.get(stream_id)
+
+# Global instance
+stream_service = StreamService()
+QUEUE_DEPTH.labels("chat_streams_generating").set_function(
+    lambda: sum(not stream.done for stream in list(stream_service._streams.values()))
+)
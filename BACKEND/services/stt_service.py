@@ -1,40 +1,48 @@
 import logging
+import threading
 from config.settings import settings
+from utils.admission import admission
+from utils.metrics import stage
 
 logger = logging.getLogger(__name__)
 
 # Lazy import to avoid early PyTorch loading
 _whisper_model = None
+# Warm-up and the first voice turn can both ask for the model; only one loads it
+_whisper_lock = threading.Lock()
 
 def get_whisper_model():
     global _whisper_model
     if _whisper_model is None:
-        try:
-            from faster_whisper import WhisperModel
-            # Using medium model for better accuracy
-            _whisper_model = WhisperModel("medium", device="cpu", compute_type="int8")
-            logger.info("Whisper model initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing Whisper model: {e}")
-            # Fallback to tiny model
-            try:
-                from faster_whisper import WhisperModel
-                _whisper_model = WhisperModel("tiny", device="cpu", compute_type="int8")
-                logger.info("Fallback to tiny Whisper model initialized successfully")
-            except Exception as e2:
-                logger.error(f"Error initializing fallback Whisper model: {e2}")
-                raise
+        with _whisper_lock:
+            if _whisper_model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                    # Using medium model for better accuracy
+                    _whisper_model = WhisperModel("medium", device="cpu", compute_type="int8")
+                    logger.info("Whisper model initialized successfully")
+                except Exception as e:
+                    logger.error(f"Error initializing Whisper model: {e}")
+                    # Fallback to tiny model
+                    try:
+                        from faster_whisper import WhisperModel
+                        _whisper_model = WhisperModel("tiny", device="cpu", compute_type="int8")
+                        logger.info("Fallback to tiny Whisper model initialized successfully")
+                    except Exception as e2:
+                        logger.error(f"Error initializing fallback Whisper model: {e2}")
+                        raise
     return _whisper_model
 
 class STTService:
     def __init__(self):
         self.model = None  # Lazy load when needed
                 
-    def transcribe_audio(self, audio_data):
+    def transcribe_audio(self, audio_data, user_id=None):
         """
         Transcribe audio data to text
         Args:
             audio_data: bytes of audio data (16kHz PCM)
+            user_id (str): User charged for admission control
         Returns:
             str: Transcribed text
         """
@@ -46,16 +54,26 @@ class STTService:
             import numpy as np
             audio_array = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
             
-            # Transcribe
-            segments, info = self.model.transcribe(audio_array, beam_size=5)
-            transcription = " ".join([segment.text for segment in segments])
+            # Transcribe (segments are decoded lazily, so join inside the slot)
+            with admission.limit("stt", user_id), stage("stt"):
+                segments, info = self.model.transcribe(audio_array, beam_size=5)
+                transcription = " ".join([segment.text for segment in segments])
             
-            logger.info(f"Transcription completed: {transcription}")
+            logger.info(f"Transcription completed: {len(transcription)} chars")
             return transcription.strip()
             
         except Exception as e:
             logger.error(f"Error in transcription: {e}")
             raise
 
+    def warm_up(self):
+        """Load the model and run one inference on a second of silence"""
+        import numpy as np
+
+        if self.model is None:
+            self.model = get_whisper_model()
+        segments, info = self.model.transcribe(np.zeros(settings.SAMPLE_RATE, dtype=np.float32), beam_size=1)
+        list(segments)  # Decoding is lazy
+
 # Global instance
 stt_service = STTService()
\ No newline at end of file
@@ -1,7 +1,11 @@
 import requests
 import base64
 import logging
+import time
 from config.settings import settings
+from utils.admission import admission
+from utils.resilience import UpstreamError, tts_policy
+from utils.metrics import observe_stage, stage
 
 logger = logging.getLogger(__name__)
 
@@ -9,13 +13,14 @@ class TTSService:
     def __init__(self):
         self.api_key = settings.ELEVENLABS_API_KEY
         self.voice_id = settings.ELEVENLABS_VOICE_ID
-        self.base_url = "https://api.elevenlabs.io/v1"
+        self.base_url = settings.ELEVENLABS_BASE_URL
         
-    def text_to_speech(self, text):
+    def text_to_speech(self, text, user_id=None):
         """
         Convert text to speech using ElevenLabs API
         Args:
             text (str): Text to convert to speech
+            user_id (str): User charged for admission control
         Returns:
             bytes: Audio data
         """
@@ -37,24 +42,30 @@ class TTSService:
                 }
             }
             
-            response = requests.post(url, json=data, headers=headers)
-            
-            if response.status_code == 200:
-                logger.info("TTS conversion completed successfully")
+            def post(timeout):
+                response = requests.post(url, json=data, headers=headers, timeout=timeout)
+                if response.status_code != 200:
+                    logger.error(f"TTS API error: {response.status_code} - {response.text}")
+                    raise UpstreamError(f"TTS API error: {response.status_code}", response.status_code)
                 return response.content
-            else:
-                logger.error(f"TTS API error: {response.status_code} - {response.text}")
-                raise Exception(f"TTS API error: {response.status_code}")
+            
+            # Voice replies wait on this call, so a slow request is hedged
+            with admission.limit("tts", user_id), stage("tts"):
+                audio = tts_policy.call(post, hedge=True)
+            
+            logger.info("TTS conversion completed successfully")
+            return audio
                 
         except Exception as e:
             logger.error(f"Error in TTS conversion: {e}")
             raise
             
-    def text_to_speech_stream(self, text):
+    def text_to_speech_stream(self, text, user_id=None):
         """
         Convert text to speech stream using ElevenLabs API
         Args:
             text (str): Text to convert to speech
+            user_id (str): User charged for admission control; the slot is held until the stream ends
         Returns:
             Generator: Audio chunks
         """
@@ -76,15 +87,29 @@ class TTSService:
                 }
             }
             
-            response = requests.post(url, json=data, headers=headers, stream=True)
+            def open_stream(timeout):
+                response = requests.post(url, json=data, headers=headers, stream=True, timeout=timeout)
+                if response.status_code != 200:
+                    logger.error(f"TTS Stream API error: {response.status_code} - {response.text}")
+                    response.close()
+                    raise UpstreamError(f"TTS Stream API error: {response.status_code}", response.status_code)
+                return response
             
-            if response.status_code == 200:
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk:
-                        yield chunk
-            else:
-                logger.error(f"TTS Stream API error: {response.status_code} - {response.text}")
-                raise Exception(f"TTS Stream API error: {response.status_code}")
+            # Retries only cover opening the stream; the read timeout applies between chunks
+            with admission.limit("tts", user_id):
+                start = time.perf_counter()
+                first_chunk = True
+                response = tts_policy.call(open_stream)
+                try:
+                    for chunk in response.iter_content(chunk_size=1024):
+                        if chunk:
+                            if first_chunk:
+                                first_chunk = False
+                                observe_stage("tts_first_chunk", time.perf_counter() - start)
+                            yield chunk
+                    observe_stage("tts", time.perf_counter() - start)
+                finally:
+                    response.close()
                 
         except Exception as e:
             logger.error(f"Error in TTS streaming: {e}")
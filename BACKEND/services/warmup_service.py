@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from config.database import db
+from config.settings import settings
+from services.index_manager import ensure_indexes
+from utils.import_profile import preload_heavy_modules
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_up_embeddings():
+    from services.embedding_service import get_embedding_backend, get_tokenizer
+
+    get_tokenizer()  # PDF chunking
+    get_embedding_backend().encode(["warm up"])
+
+
+def _warm_up_whisper():
+    from services.stt_service import stt_service
+
+    stt_service.warm_up()
+
+
+def _create_llm_client():
+    from services.llm_service import llm_service
+
+    llm_service.client  # No request: a completion would be billed
+
+
+class WarmupService:
+    """
+    Loads what the first requests would otherwise wait for (models, heavy
+    modules, the Mongo connection) in parallel right after startup, and
+    tracks per-component readiness for the /ready probe. A component that
+    fails is retried with exponential backoff until it loads
+    """
+
+    def __init__(self, components=None, mongo_retry_seconds=None, retry_seconds=None, retry_max_seconds=None):
+        self.steps = {
+            "mongo": self._prepare_mongo,
+            "imports": preload_heavy_modules,
+            "llm": _create_llm_client,
+            "embedding": _warm_up_embeddings,
+            "whisper": _warm_up_whisper,
+        }
+        components = settings.WARMUP_COMPONENTS if components is None else components
+        unknown = [name for name in components if name not in self.steps]
+        if unknown:
+            logger.warning(f"Unknown warm-up components ignored: {', '.join(unknown)}")
+        self.components = {
+            name: {"status": "pending", "seconds": None, "error": None, "attempts": 0}
+            for name in components if name in self.steps
+        }
+        self.mongo_retry_seconds = mongo_retry_seconds or settings.WARMUP_MONGO_RETRY_SECONDS
+        self.retry_seconds = retry_seconds or settings.WARMUP_RETRY_SECONDS
+        self.retry_max_seconds = retry_max_seconds or settings.WARMUP_RETRY_MAX_SECONDS
+        self._task = None
+
+    async def _ping_mongo(self):
+        # init_db logs and carries on when Mongo is down; keep trying until it answers
+        while True:
+            try:
+                await db.ping()
+                return
+            except Exception as e:
+                self.components["mongo"]["error"] = str(e)
+                logger.warning(f"Mongo not reachable yet, retrying in {self.mongo_retry_seconds:g}s: {e}")
+                await asyncio.sleep(self.mongo_retry_seconds)
+
+    async def _load_component(self, name):
+        state = self.components[name]
+        state["status"] = "loading"
+        state["attempts"] += 1
+        start = time.perf_counter()
+        try:
+            step = self.steps[name]
+            if asyncio.iscoroutinefunction(step):
+                await step()
+            else:
+                # Model loads and inference are blocking; each gets a thread so they overlap
+                await asyncio.to_thread(step)
+            state.update(status="ready", error=None)
+            logger.info(f"Warm-up: {name} ready in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            state.update(status="failed", error=f"{type(e).__name__}: {e}")
+        state["seconds"] = round(time.perf_counter() - start, 3)
+        return state["status"] == "ready"
+
+    async def _prepare_mongo(self):
+        await self._ping_mongo()
+        # Indexes need a live server; if creating one fails the component fails and is retried
+        await ensure_indexes(db.get_db())
+
+    async def _run_component(self, name):
+        # A failed component stays "failed" (so /ready answers 503) until a retry loads it
+        delay = self.retry_seconds
+        while not await self._load_component(name):
+            logger.error(f"Warm-up: {name} failed, retrying in {delay:g}s: {self.components[name]['error']}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.retry_max_seconds)
+
+    async def run(self):
+        """Warm up every configured component concurrently, until all are ready"""
+        start = time.perf_counter()
+        await asyncio.gather(*(self._run_component(name) for name in self.components))
+        logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s: "
+                    f"{'ready' if self.is_ready() else 'not ready'}")
+
+    def start(self):
+        """Start the warm-up in the background (call from the startup event)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def is_ready(self):
+        return all(state["status"] == "ready" for state in self.components.values())
+
+    def status(self):
+        """
+        Readiness for the /ready probe
+        Returns:
+            dict: Overall status ("ready", "starting" or "failed") and each component's state and load time
+        """
+        states = [state["status"] for state in self.components.values()]
+        if all(status == "ready" for status in states):
+            overall = "ready"
+        elif "failed" in states:
+            overall = "failed"
+        else:
+            overall = "starting"
+        return {"status": overall, "components": {name: dict(state) for name, state in self.components.items()}}
+
+# Global instance
+warmup_service = WarmupService()
@@ -1,19 +1,24 @@
 import requests
 import logging
 from config.settings import settings
+from utils.admission import admission
+from utils.resilience import UpstreamError, web_search_policy
+from utils.metrics import stage
+from utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 class WebSearchService:
     def __init__(self):
         self.api_key = settings.TAVILY_API_KEY
-        self.base_url = "https://api.tavily.com"
+        self.base_url = settings.TAVILY_BASE_URL
         
-    def search(self, query):
+    def search(self, query, user_id=None):
         """
         Perform web search using Tavily API
         Args:
             query (str): Search query
+            user_id (str): User charged for admission control
         Returns:
             dict: Search results
         """
@@ -30,15 +35,18 @@ class WebSearchService:
                 "max_results": 5
             }
             
-            response = requests.post(url, json=payload)
+            def post(timeout):
+                response = requests.post(url, json=payload, timeout=timeout)
+                if response.status_code != 200:
+                    logger.error(f"Web search API error: {response.status_code} - {response.text}")
+                    raise UpstreamError(f"Web search API error: {response.status_code}", response.status_code)
+                return response.json()
             
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Web search completed for query: {query}")
-                return result
-            else:
-                logger.error(f"Web search API error: {response.status_code} - {response.text}")
-                raise Exception(f"Web search API error: {response.status_code}")
+            with admission.limit("web_search", user_id), stage("web_search"), tracer.span("web_search"):
+                result = web_search_policy.call(post, hedge=True)
+            
+            logger.info(f"Web search completed for query: {query}")
+            return result
                 
         except Exception as e:
             logger.error(f"Error in web search: {e}")
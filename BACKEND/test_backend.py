@@ -43,8 +43,8 @@ async def test_components():
         
         # Test Query Router
         print("\n6. Testing Query Router...")
-        ip_response = query_router.get_public_ip()
-        print(f"IP Address: {ip_response}")
+        ip_response = query_router.handle_query("what is my ip", client_ip="203.0.113.7")
+        print(f"IP Query: {ip_response}")
         
         print("\nAll tests completed successfully!")
         
@@ -0,0 +1,149 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from config.settings import settings
+from utils.metrics import UPSTREAM_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing when an upstream call is not admitted; mapped to HTTP 429"""
+
+    def __init__(self, upstream, reason, retry_after):
+        self.upstream = upstream
+        self.reason = reason  # "rate_limited" or "busy"
+        self.retry_after = retry_after
+        super().__init__(f"{upstream} {reason.replace('_', ' ')}, retry after {retry_after:.1f}s")
+
+
+class TokenBucket:
+    """Refills rate tokens per second up to capacity; not thread safe on its own"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take one token if available
+        Returns:
+            float: 0 if taken, otherwise seconds until a token is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class UpstreamLimiter:
+    """
+    Admission control for one upstream: a per-user token bucket and a
+    process-wide cap on in-flight calls. Both reject at once rather than wait.
+    """
+
+    def __init__(self, name, max_concurrency, user_rate_per_minute, user_burst, max_users=10000):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.user_rate = user_rate_per_minute / 60
+        self.user_burst = user_burst
+        self.max_users = max_users
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = {"rate_limited": 0, "busy": 0}
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        UPSTREAM_IN_FLIGHT.labels(name).set_function(lambda: self.in_flight)
+
+    def _reject(self, reason, retry_after):
+        # Counted rather than logged at warning level: a spamming client would flood the log
+        self.rejected[reason] += 1
+        logger.debug(f"Admission rejected for {self.name}: {reason}, retry after {retry_after:.1f}s")
+        raise AdmissionRejected(self.name, reason, retry_after)
+
+    def acquire(self, user_id=None):
+        """Admit one call or raise AdmissionRejected; pair with release()"""
+        with self._lock:
+            bucket = None
+            if user_id is not None:
+                bucket = self._buckets.get(user_id)
+                if bucket is None:
+                    bucket = self._buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+                    if len(self._buckets) > self.max_users:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(user_id)
+                wait = bucket.take()
+                if wait:
+                    self._reject("rate_limited", wait)
+
+            if self.in_flight >= self.max_concurrency:
+                if bucket:
+                    bucket.tokens += 1  # Not the user's fault; don't charge them
+                self._reject("busy", settings.ADMISSION_BUSY_RETRY_AFTER)
+
+            self.in_flight += 1
+            self.admitted += 1
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+class AdmissionController:
+    """Limiters for the upstreams shared by all requests in this process"""
+
+    def __init__(self, limiters):
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+
+    @contextmanager
+    def limit(self, upstream, user_id=None):
+        """
+        Hold an admission slot for the duration of an upstream call
+        Args:
+            upstream (str): "llm", "stt", "tts" or "web_search"
+            user_id (str): Charged against this user's rate; None for internal calls
+        Raises:
+            AdmissionRejected: Upstream busy or user over rate
+        """
+        limiter = self.limiters[upstream]
+        limiter.acquire(user_id)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def stats(self):
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
+
+def _limiter(name, max_concurrency):
+    return UpstreamLimiter(
+        name,
+        max_concurrency,
+        settings.ADMISSION_USER_RATE_PER_MINUTE,
+        settings.ADMISSION_USER_BURST,
+    )
+
+# Global instance
+admission = AdmissionController([
+    _limiter("llm", settings.LLM_MAX_CONCURRENCY),
+    _limiter("stt", settings.STT_MAX_CONCURRENCY),
+    _limiter("tts", settings.TTS_MAX_CONCURRENCY),
+    _limiter("web_search", settings.WEB_SEARCH_MAX_CONCURRENCY),
+])
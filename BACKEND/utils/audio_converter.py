@@ -2,9 +2,7 @@
 Audio format conversion utilities
 """
 
-import numpy as np
 import io
-from pydub import AudioSegment
 from config.settings import settings
 
 def pcm_to_wav(pcm_data, sample_rate=settings.SAMPLE_RATE):
@@ -16,6 +14,9 @@ def pcm_to_wav(pcm_data, sample_rate=settings.SAMPLE_RATE):
     Returns:
         bytes: WAV formatted audio data
     """
+    import numpy as np
+    from pydub import AudioSegment
+
     try:
         # Convert bytes to numpy array
         audio_np = np.frombuffer(pcm_data, dtype=np.int16)
@@ -47,6 +48,8 @@ def resample_audio(audio_data, original_rate, target_rate=settings.SAMPLE_RATE):
     Returns:
         bytes: Resampled audio data
     """
+    from pydub import AudioSegment
+
     try:
         audio_segment = AudioSegment(
             audio_data,
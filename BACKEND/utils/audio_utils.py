@@ -1,10 +1,10 @@
-import numpy as np
-import webrtcvad
 import collections
 from config.settings import settings
 
 class VADProcessor:
     def __init__(self):
+        import webrtcvad  # Imported with the first voice session
+
         self.vad = webrtcvad.Vad(settings.VAD_MODE)
         self.frame_duration = settings.FRAME_DURATION
         self.sample_rate = settings.SAMPLE_RATE
@@ -1,7 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
+import asyncio
+import contextvars
+import time
 import bcrypt
+from utils.metrics import QUEUE_DEPTH, executor_queue_depth
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import os
@@ -13,34 +19,66 @@ load_dotenv()
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))  # Verified tokens kept; 0 disables
+
+# Password hashing: bcrypt work factor (existing hashes are upgraded on login)
+# and the threads that run it; bcrypt releases the GIL, so hashes run in
+# parallel off the event loop and the pool size caps the CPU a login burst takes
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+QUEUE_DEPTH.labels("password_hash_threads").set_function(executor_queue_depth(_password_executor))
 
 # HTTP Bearer token scheme
 security = HTTPBearer()
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
+def _password_bytes(password: str) -> bytes:
     # Ensure password is within bcrypt's 72-byte limit
-    password_bytes = plain_password.encode('utf-8')
+    password_bytes = password.encode('utf-8')
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
-    
-    return bcrypt.checkpw(password_bytes, hashed_password.encode('utf-8'))
+    return password_bytes
 
 
-def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    # Ensure password is within bcrypt's 72-byte limit
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash (blocking; use check_password in async code)"""
+    return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode('utf-8'))
+
+
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
+    """Hash a password (blocking; use hash_password in async code)"""
     # Generate salt and hash the password
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    hashed = bcrypt.hashpw(_password_bytes(password), salt)
     return hashed.decode('utf-8')
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a hash was made with a different work factor than BCRYPT_ROUNDS"""
+    try:
+        # Format: $2b$<rounds>$<salt+hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def _run_on_password_pool(func, *args):
+    # Copy the caller's context, as asyncio.to_thread does, so log lines keep the request id
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, contextvars.copy_context().run, func, *args)
+
+
+async def hash_password(password: str) -> str:
+    """Hash a password on the bcrypt pool"""
+    return await _run_on_password_pool(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt pool"""
+    return await _run_on_password_pool(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -63,6 +101,63 @@ def decode_access_token(token: str):
         return None
 
 
+class TokenCache:
+    """
+    LRU of verified token -> claims. Entries are dropped once the token's
+    exp passes, so a cached token is never accepted after it would fail
+    verification. Only valid tokens are stored.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # token -> (exp timestamp, claims)
+
+    def get(self, token: str):
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        exp, claims = entry
+        if exp <= time.time():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return claims
+
+    def put(self, token: str, claims: dict):
+        exp = claims.get("exp")
+        if self.max_size <= 0 or exp is None:
+            return
+        self._entries[token] = (exp, claims)
+        self._entries.move_to_end(token)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+# Global instance
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+def verify_access_token(token: str):
+    """Claims of a valid token, from token_cache when it was verified before"""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_access_token(token)
+        if payload is not None:
+            token_cache.put(token, payload)
+    return payload
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependency to get current user from JWT token"""
     credentials_exception = HTTPException(
@@ -72,7 +167,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     )
     
     token = credentials.credentials
-    payload = decode_access_token(token)
+    payload = verify_access_token(token)
     
     if payload is None:
         raise credentials_exception
@@ -0,0 +1,115 @@
+import ipaddress
+import logging
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def parse_networks(value):
+    """
+    Parse a comma-separated list of IPs/CIDRs
+    Args:
+        value (str): e.g. "127.0.0.1, 10.0.0.0/8"
+    Returns:
+        list: ipaddress networks
+    """
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if item:
+            networks.append(ipaddress.ip_network(item, strict=False))
+    return networks
+
+
+TRUSTED_PROXIES = parse_networks(settings.TRUSTED_PROXIES)
+
+
+def normalize_address(value):
+    """
+    Strip quotes, IPv6 brackets and ports from a forwarded address
+    Args:
+        value (str): e.g. '"[2001:db8::1]:4711"', '203.0.113.7:8080', 'unknown'
+    Returns:
+        str: Bare IP address, or None if it is not an IP (obfuscated / unknown)
+    """
+    value = value.strip().strip('"')
+    if value.startswith("["):
+        value = value[1:value.find("]")] if "]" in value else value[1:]
+    elif value.count(":") == 1:
+        value = value.split(":", 1)[0]
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+
+def parse_forwarded(header):
+    """
+    Addresses from the for= parameters of an RFC 7239 Forwarded header,
+    nearest the client first
+    """
+    addresses = []
+    for element in header.split(","):
+        for pair in element.split(";"):
+            name, _, value = pair.partition("=")
+            if name.strip().lower() == "for":
+                addresses.append(normalize_address(value))
+    return addresses
+
+
+def parse_x_forwarded_for(header):
+    """Addresses from an X-Forwarded-For header, nearest the client first"""
+    return [normalize_address(item) for item in header.split(",") if item.strip()]
+
+
+def is_trusted(address, trusted_proxies):
+    if address is None:
+        return False
+    ip = ipaddress.ip_address(address)
+    return any(ip in network for network in trusted_proxies)
+
+
+def resolve_client_ip(remote_addr, headers, trusted_proxies=None):
+    """
+    Work out the client's IP from the peer address and forwarding headers.
+    Headers are only believed when the peer is a trusted proxy; the chain is
+    then walked from the nearest hop back, and the first address that is not
+    a trusted proxy is the client. No network I/O.
+    Args:
+        remote_addr (str): Address of the TCP peer
+        headers: Mapping with case-insensitive get (Starlette Headers or dict with lowercase keys)
+        trusted_proxies (list): Networks allowed to set forwarding headers (default settings.TRUSTED_PROXIES)
+    Returns:
+        str: Client IP, or None if it cannot be determined
+    """
+    if trusted_proxies is None:
+        trusted_proxies = TRUSTED_PROXIES
+    remote = normalize_address(remote_addr) if remote_addr else None
+    if not is_trusted(remote, trusted_proxies):
+        return remote
+
+    forwarded = headers.get("forwarded")
+    if forwarded:
+        chain = parse_forwarded(forwarded)
+    else:
+        chain = parse_x_forwarded_for(headers.get("x-forwarded-for", ""))
+    if not chain:
+        return remote
+
+    for address in reversed(chain):
+        if not is_trusted(address, trusted_proxies):
+            # None here means the hop hid its address: don't skip past it
+            return address
+    return chain[0]
+
+
+def client_ip(connection):
+    """
+    Client IP of a request or websocket
+    Args:
+        connection: Starlette Request or WebSocket
+    Returns:
+        str: Client IP, or None if it cannot be determined
+    """
+    remote_addr = connection.client.host if connection.client else None
+    return resolve_client_ip(remote_addr, connection.headers)
@@ -0,0 +1,133 @@
+import argparse
+import importlib
+import logging
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+# Imported on first use rather than with main.py; preload_heavy_modules warms them after startup
+HEAVY_MODULES = (
+    "groq",  # LLM clients, with httpx
+    "fitz",  # PyMuPDF, PDF uploads
+    "numpy",
+    "webrtcvad",  # Voice sessions
+    "pydub",
+    "services.embedding_service",
+)
+
+
+def preload_heavy_modules(modules=HEAVY_MODULES):
+    """
+    Import the heavy modules, so the first request that needs one doesn't pay
+    for it; meant to run on a background thread after startup
+    Args:
+        modules (tuple): Module names
+    Returns:
+        dict: Seconds spent importing each module, None if it failed
+    """
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            timings[name] = time.perf_counter() - start
+        except Exception as e:
+            # Not installed (e.g. no voice support on this worker): left for first use to report
+            logger.warning(f"Could not preload {name}: {e}")
+            timings[name] = None
+    loaded = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items() if seconds is not None)
+    logger.info(f"Preloaded heavy modules: {loaded}")
+    return timings
+
+
+class ImportNode:
+    __slots__ = ("name", "self_us", "cumulative_us", "children")
+
+    def __init__(self, name, self_us, cumulative_us):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children = []
+
+
+def parse_importtime(output):
+    """
+    Build the import tree from `python -X importtime` output, where each
+    module is printed after its imports, indented two spaces per level
+    Args:
+        output (str): The interpreter's stderr
+    Returns:
+        list: Top-level ImportNodes, in import order
+    """
+    pending = {}  # Level -> nodes waiting for their parent
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        node = ImportNode(name.strip(), int(self_us), int(cumulative_us))
+        node.children = pending.pop(level + 1, [])
+        pending.setdefault(level, []).append(node)
+    return pending.get(0, [])
+
+
+def profile_imports(module="main"):
+    """
+    Import a module in a fresh interpreter and return its import tree
+    Args:
+        module (str): Module to import
+    Returns:
+        ImportNode: The module's node (imports made before it are not included)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    roots = parse_importtime(result.stderr)
+    for node in roots:
+        if node.name == module:
+            return node
+    raise RuntimeError(f"{module} not found in the import time output")
+
+
+def print_tree(node, min_ms=5.0, max_depth=None, depth=0):
+    if node.cumulative_us < min_ms * 1000 and depth:
+        return
+    print(f"{node.cumulative_us / 1000:>9.1f}{node.self_us / 1000:>9.1f}  {'  ' * depth}{node.name}")
+    if max_depth is not None and depth >= max_depth:
+        return
+    for child in sorted(node.children, key=lambda c: c.cumulative_us, reverse=True):
+        print_tree(child, min_ms, max_depth, depth + 1)
+
+
+def _imported(node, name):
+    return node.name == name or any(_imported(child, name) for child in node.children)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the import-time tree of a cold import (default: main)")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--min-ms", type=float, default=5.0, help="Hide imports cheaper than this")
+    parser.add_argument("--depth", type=int, help="Maximum tree depth")
+    parser.add_argument("--budget-ms", type=float, help="Exit 1 if the import takes longer")
+    args = parser.parse_args()
+
+    node = profile_imports(args.module)
+    print(f"{'cumul ms':>9}{'self ms':>9}  module")
+    print_tree(node, args.min_ms, args.depth)
+
+    heavy = [name for name in HEAVY_MODULES if _imported(node, name)]
+    if heavy:
+        print(f"\nheavy modules imported eagerly: {', '.join(heavy)}")
+    total_ms = node.cumulative_us / 1000
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nimport {args.module} took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
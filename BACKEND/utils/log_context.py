@@ -0,0 +1,49 @@
+import contextvars
+import uuid
+
+# Ids stamped on every log record emitted while handling a request or voice session
+request_id_var = contextvars.ContextVar("request_id", default=None)
+session_id_var = contextvars.ContextVar("session_id", default=None)
+
+_MAX_REQUEST_ID = 64
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdMiddleware:
+    """
+    Pure ASGI middleware giving each HTTP request and WebSocket a request id:
+    the client's X-Request-ID if it sent a sane one, otherwise a new one.
+    It is echoed in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                value = value.decode("latin-1")
+                if 0 < len(value) <= _MAX_REQUEST_ID and value.isprintable():
+                    request_id = value
+                break
+        request_id = request_id or new_request_id()
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
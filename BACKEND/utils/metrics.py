@@ -0,0 +1,302 @@
+import time
+import threading
+import logging
+from bisect import bisect_left
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a Mongo lookup (ms) up to a long LLM answer (tens of seconds)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Updates are plain attribute writes with no lock: under the GIL they can only
+# race when two threads hit the same series at the same instant, and a very
+# rare lost increment is an acceptable price for keeping hot paths cheap.
+
+
+class _Timer:
+    """Context manager observing the elapsed time into a histogram series"""
+    __slots__ = ("series", "start")
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(time.perf_counter() - self.start)
+
+
+class _CounterSeries:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def get(self):
+        return self.value
+
+
+class _GaugeSeries:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set_function(self, function):
+        """Read the value from function() at scrape time instead"""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception as e:
+                logger.debug(f"Gauge callback failed: {e}")
+                return float("nan")
+        return self.value
+
+
+class _HistogramSeries:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Metric:
+    """A named metric with one series per label value tuple"""
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()  # Only taken to create a new series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Series for these label values; look it up once and keep it on hot paths
+        Args:
+            values: One value per label name, in order
+        """
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _label_text(self, values, extra=None):
+        pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for values, series in list(self._series.items()):
+            lines.extend(self._render_series(values, series))
+        return lines
+
+    def _render_series(self, values, series):
+        return [f"{self.name}{self._label_text(values)} {_number(series.get())}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def _render_series(self, values, series):
+        lines = []
+        counts = list(series.counts)  # Snapshot so buckets and count agree
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="' + _number(bound) + '"'
+            lines.append(f"{self.name}_bucket{self._label_text(values, le)} {cumulative}")
+        labels = self._label_text(values)
+        lines.append(f"{self.name}_sum{labels} {_number(series.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+registry = Registry()
+
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template (streams: until the last byte)",
+    ["method", "route", "status"]
+))
+STAGE_DURATION = registry.register(Histogram(
+    "stage_duration_seconds", "Time spent in each processing stage", ["stage"]
+))
+MONGO_COMMAND_DURATION = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trip time", ["command"]
+))
+MONGO_COMMAND_FAILURES = registry.register(Counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ["command"]
+))
+VOICE_SESSIONS = registry.register(Gauge(
+    "voice_sessions_active", "Open voice chat WebSockets"
+)).labels()
+QUEUE_DEPTH = registry.register(Gauge(
+    "queue_depth", "Work waiting in internal queues and thread pools", ["queue"]
+))
+UPSTREAM_IN_FLIGHT = registry.register(Gauge(
+    "upstream_in_flight", "Admitted calls in flight per upstream", ["upstream"]
+))
+CIRCUIT_OPEN = registry.register(Gauge(
+    "circuit_open", "1 while the upstream's circuit breaker is open or half-open", ["upstream"]
+))
+
+# Stage series are created up front so hot paths never take the creation lock
+STAGES = (
+    "stt", "llm_first_token", "llm_total", "tts", "tts_first_chunk",
+    "web_search", "embedding", "pdf_extraction",
+)
+_stage_series = {name: STAGE_DURATION.labels(name) for name in STAGES}
+for _command in ("find", "insert", "update", "delete", "findAndModify", "aggregate", "getMore", "count"):
+    MONGO_COMMAND_DURATION.labels(_command)
+
+
+def stage(name):
+    """
+    Time a block as a processing stage
+        with stage("tts"):
+            ...
+    """
+    return _Timer(_stage_series[name])
+
+
+def observe_stage(name, seconds):
+    """Record a stage duration measured by the caller (e.g. time to first token)"""
+    _stage_series[name].observe(seconds)
+
+
+def executor_queue_depth(executor):
+    """Tasks submitted to a ThreadPoolExecutor that no worker has picked up yet"""
+    return lambda: executor._work_queue.qsize()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every command sent by the Motor client; pass in event_listeners"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_DURATION.labels(event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(event.command_name).inc()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording http_request_duration_seconds. Labels use
+    the matched route template (e.g. /api/v1/chat/{chat_id}), so ids in paths
+    don't create new series; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], path, status_code).observe(time.perf_counter() - start)
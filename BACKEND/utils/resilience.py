@@ -0,0 +1,211 @@
+import contextvars
+import random
+import sys
+import threading
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+import requests
+from config.settings import settings
+from utils.metrics import CIRCUIT_OPEN, QUEUE_DEPTH, executor_queue_depth
+
+logger = logging.getLogger(__name__)
+
+# Hedged duplicates run here; the losing request is left to finish on its own
+_hedge_executor = ThreadPoolExecutor(max_workers=settings.HEDGE_THREADS, thread_name_prefix="hedge")
+QUEUE_DEPTH.labels("hedge_threads").set_function(executor_queue_depth(_hedge_executor))
+
+
+class UpstreamError(Exception):
+    """Non-success HTTP status from an upstream API"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the upstream while its circuit breaker is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable, retry after {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_transient(error):
+    """
+    Whether a failure is worth retrying and counts against the circuit breaker:
+    connection errors, timeouts, 5xx and 429. Other 4xx are the caller's fault.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code >= 500 or status_code == 429
+    return isinstance(error, (
+        requests.ConnectionError,
+        requests.Timeout,
+        ConnectionError,
+        TimeoutError,
+    )) or _is_groq_connection_error(error)
+
+
+def _is_groq_connection_error(error):
+    # groq is imported with the first LLM client; until then none of its errors can occur
+    groq = sys.modules.get("groq")
+    return groq is not None and isinstance(error, groq.APIConnectionError)  # Includes APITimeoutError
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive transient failures, failing
+    calls at once for reset_timeout seconds; then lets one trial call
+    through (half-open) and closes again if it succeeds.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless the call may proceed"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class ResiliencePolicy:
+    """
+    Timeouts, retries, hedging and a circuit breaker for one upstream.
+    Calls receive the (connect, read) timeout to pass to requests.
+    """
+
+    def __init__(self, name, connect_timeout, read_timeout, attempts=None, hedge_after=0,
+                 failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.attempts = attempts or settings.UPSTREAM_RETRY_ATTEMPTS
+        self.hedge_after = hedge_after
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold or settings.CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout or settings.CIRCUIT_RESET_SECONDS,
+        )
+        self.retries = 0
+        self.hedges = 0
+        CIRCUIT_OPEN.labels(name).set_function(lambda: int(self.breaker.state != "closed"))
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff before retry number attempt (1-based)"""
+        ceiling = min(settings.UPSTREAM_RETRY_MAX_DELAY, settings.UPSTREAM_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def _hedged(self, func):
+        """Run func; if it is slower than hedge_after, race a second copy and take the first success"""
+        # Each copy runs in a copy of the caller's context, so its log lines keep the request id
+        futures = [_hedge_executor.submit(contextvars.copy_context().run, func, self.timeout)]
+        try:
+            return futures[0].result(timeout=self.hedge_after)
+        except FutureTimeout:
+            pass
+        self.hedges += 1
+        futures.append(_hedge_executor.submit(contextvars.copy_context().run, func, self.timeout))
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, func, idempotent=True, hedge=False):
+        """
+        Call an upstream under this policy
+        Args:
+            func: Callable taking the (connect, read) timeout; raises on failure
+            idempotent (bool): Safe to retry transient failures
+            hedge (bool): Race a duplicate request after hedge_after seconds
+                          (idempotent, latency-critical calls only)
+        Returns:
+            The result of func
+        Raises:
+            CircuitOpenError: The upstream has been failing; not called
+        """
+        attempts = self.attempts if idempotent else 1
+        for attempt in range(1, attempts + 1):
+            self.breaker.before_call()
+            try:
+                if hedge and idempotent and self.hedge_after > 0:
+                    result = self._hedged(func)
+                else:
+                    result = func(self.timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    self.breaker.record_success()  # Upstream answered; the request was bad
+                    raise
+                self.breaker.record_failure()
+                if attempt == attempts:
+                    raise
+                self.retries += 1
+                delay = self.backoff(attempt)
+                logger.warning(f"{self.name} call failed ({e}), retry {attempt}/{attempts - 1} in {delay:.2f}s")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    def stats(self):
+        return {"circuit": self.breaker.state, "retries": self.retries, "hedges": self.hedges}
+
+
+# Global instances, one per upstream
+tts_policy = ResiliencePolicy(
+    "tts", settings.TTS_CONNECT_TIMEOUT, settings.TTS_READ_TIMEOUT, hedge_after=settings.TTS_HEDGE_AFTER
+)
+web_search_policy = ResiliencePolicy(
+    "web_search", settings.WEB_SEARCH_CONNECT_TIMEOUT, settings.WEB_SEARCH_READ_TIMEOUT,
+    hedge_after=settings.WEB_SEARCH_HEDGE_AFTER
+)
+# The Groq client applies its own timeouts and jittered retries; this adds the breaker
+llm_policy = ResiliencePolicy(
+    "llm", settings.LLM_CONNECT_TIMEOUT, settings.LLM_READ_TIMEOUT, attempts=1
+)
+# Chat titles have their own breaker: a title failure only costs the provisional title,
+# and must not open the breaker that chat turns depend on
+llm_title_policy = ResiliencePolicy(
+    "llm_title", settings.LLM_CONNECT_TIMEOUT, settings.CHAT_TITLE_TIMEOUT, attempts=1
+)
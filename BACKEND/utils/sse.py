@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.responses import StreamingResponse
+from config.settings import settings
+from utils.metrics import QUEUE_DEPTH, executor_queue_depth
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = ": ping\n\n"
+
+# Blocking upstream streams (Groq) are read here rather than in the shared
+# threadpool, so long generations don't starve run_in_threadpool callers
+_stream_executor = ThreadPoolExecutor(
+    max_workers=settings.SSE_STREAM_THREADS, thread_name_prefix="sse-stream"
+)
+QUEUE_DEPTH.labels("sse_stream_threads").set_function(executor_queue_depth(_stream_executor))
+
+_END = object()
+
+
+class _StreamError:
+    def __init__(self, error):
+        self.error = error
+
+
+def format_event(data, event=None, event_id=None):
+    """
+    Frame one Server-Sent Event
+    Args:
+        data (str): Payload; each line becomes its own data: field so
+                    newlines in LLM output survive the framing
+        event (str): Event type, omitted for the default "message"
+        event_id: Event id, sent back by the browser as Last-Event-ID
+    Returns:
+        str: Framed event ending in a blank line
+    """
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.extend(f"data: {line}" for line in str(data).split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_in_thread(iterable, flush_interval=None, heartbeat=None):
+    """
+    Consume a blocking iterator of text chunks without blocking the event loop.
+    The iterator runs on a stream thread and hands chunks over through a queue.
+    The first chunk is passed on at once; later chunks are coalesced for
+    flush_interval seconds so a burst of tokens becomes one write.
+
+    When the consumer stops (client disconnect cancels the response), the
+    thread stops pulling and closes the iterator, which closes the upstream
+    connection instead of generating to max_tokens.
+    Args:
+        iterable: Blocking iterable of str chunks, e.g. LLMService.generate_response_stream
+        flush_interval (float): Seconds to coalesce chunks (default settings.SSE_FLUSH_INTERVAL)
+        heartbeat (float): Seconds of silence before yielding None (default settings.SSE_HEARTBEAT_SECONDS)
+    Yields:
+        str: Coalesced text, or None when a heartbeat is due
+    """
+    if flush_interval is None:
+        flush_interval = settings.SSE_FLUSH_INTERVAL
+    if heartbeat is None:
+        heartbeat = settings.SSE_HEARTBEAT_SECONDS
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+    iterator = iter(iterable)
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            stopped.set()
+
+    def pump():
+        try:
+            for chunk in iterator:
+                if stopped.is_set():
+                    break
+                put(chunk)
+        except Exception as e:
+            put(_StreamError(e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning(f"Error closing upstream stream: {e}")
+            put(_END)
+
+    # Run in a copy of the caller's context, as asyncio.to_thread does, so the
+    # upstream's log lines keep the request and session ids
+    loop.run_in_executor(_stream_executor, contextvars.copy_context().run, pump)
+
+    first = True
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+
+            if not first and flush_interval > 0 and item is not _END:
+                await asyncio.sleep(flush_interval)
+            first = False
+
+            items = [item]
+            while not queue.empty():
+                items.append(queue.get_nowait())
+
+            text = []
+            for item in items:
+                if item is _END:
+                    if text:
+                        yield "".join(text)
+                    return
+                if isinstance(item, _StreamError):
+                    if text:
+                        yield "".join(text)
+                    raise item.error
+                text.append(item)
+            yield "".join(text)
+    finally:
+        stopped.set()
+
+
+def event_stream_response(events, headers=None):
+    """
+    Wrap an async generator of framed events in a StreamingResponse
+    Args:
+        events: Async generator of str produced with format_event / HEARTBEAT
+        headers (dict): Extra response headers
+    Returns:
+        StreamingResponse: text/event-stream response with proxy buffering disabled
+    """
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            **(headers or {}),
+        }
+    )
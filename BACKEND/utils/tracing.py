@@ -0,0 +1,299 @@
+import argparse
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Spans follow the OpenTelemetry data model and are exported one JSON object
+# per line with OTLP field names (traceId, spanId, parentSpanId, ...);
+# attributes are a flat {key: value} object rather than OTLP's typed list.
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = (
+        "tracer", "name", "trace_id", "span_id", "parent_span_id", "attributes",
+        "start_ns", "_start_perf", "end_ns", "status", "status_message", "_token",
+    )
+
+    def __init__(self, tracer, name, trace_id, parent_span_id=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.end_ns = None
+        self.status = "UNSET"
+        self.status_message = None
+        self._token = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def record_exception(self, error):
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            # Duration from the monotonic clock; only the start is wall time
+            self.end_ns = self.start_ns + time.perf_counter_ns() - self._start_perf
+            self.tracer.export(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.record_exception(exc)
+        self.end()
+
+    def to_dict(self):
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is off or there is no trace to join; every call does nothing"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class FileExporter:
+    """
+    Appends spans as JSON lines. Like the logging QueueListener
+    (config.logging_config), export() only enqueues the span; a background
+    thread serializes and writes, so spans ending on the event loop never
+    wait on the disk.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, span):
+        self._queue.put(span.to_dict())
+
+    def _write_loop(self):
+        while True:
+            # Take everything queued so a burst of spans costs one flush
+            spans = [self._queue.get()]
+            while True:
+                try:
+                    spans.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._file.writelines(json.dumps(span, default=str) + "\n" for span in spans if span is not None)
+                self._file.flush()
+            except Exception as e:
+                logger.warning(f"Could not write {len(spans)} spans to the trace file: {e}")
+            if None in spans:  # Sentinel from shutdown()
+                return
+
+    def shutdown(self):
+        """Write the queued spans, stop the writer thread and close the file"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if not self._file.closed:
+            self._file.close()
+
+
+class ConsoleExporter:
+    """Writes spans as JSON lines to stderr"""
+
+    def export(self, span):
+        print(json.dumps(span.to_dict(), default=str), file=sys.stderr)
+
+
+class Tracer:
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    def start_span(self, name, attributes=None, parent=None):
+        """
+        Start a span without making it current; call end() when done.
+        Starts a new trace unless a parent is given or a span is current.
+        Args:
+            name (str): Span name, e.g. "voice.session"
+            attributes (dict): Initial attributes
+            parent (Span): Explicit parent
+        Returns:
+            Span, or a no-op span when tracing is off
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+        parent = parent or _current_span.get()
+        if isinstance(parent, Span):
+            return Span(self, name, parent.trace_id, parent.span_id, attributes)
+        return Span(self, name, secrets.token_hex(16), None, attributes)
+
+    def span(self, name, attributes=None, parent=None):
+        """
+        Child span for a with block, current while the block runs. Only
+        recorded inside a trace: without a parent or current span it is a
+        no-op, so library code can open spans unconditionally.
+            with tracer.span("stt", {"audio_bytes": n}) as span:
+                ...
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+        parent = parent or _current_span.get()
+        if not isinstance(parent, Span):
+            return NOOP_SPAN
+        return Span(self, name, parent.trace_id, parent.span_id, attributes)
+
+    def export(self, span):
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.warning(f"Could not export span {span.name}: {e}")
+
+
+def current_span():
+    """The current span, or a no-op span outside a trace"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def create_exporter(name=None):
+    """
+    Create the span exporter
+    Args:
+        name (str): "file", "console" or "none"; defaults to settings.TRACE_EXPORTER
+    Returns:
+        Exporter, or None when tracing is off
+    """
+    name = name or settings.TRACE_EXPORTER
+    if name == "file":
+        return FileExporter(settings.TRACE_FILE)
+    if name == "console":
+        return ConsoleExporter()
+    if name != "none":
+        logger.warning(f"Unknown trace exporter {name!r}, tracing disabled")
+    return None
+
+# Global instance
+tracer = Tracer(create_exporter())
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(spans):
+    """
+    Latency breakdown of exported spans, grouped by their path of span names
+    Args:
+        spans (list): Span dicts as exported
+    Returns:
+        list: (path, durations in ms, share of the parent path's total time) in tree order
+    """
+    by_id = {span["spanId"]: span for span in spans}
+    paths = {}
+
+    def path_of(span):
+        if span["spanId"] not in paths:
+            parent = by_id.get(span.get("parentSpanId"))
+            prefix = path_of(parent) if parent else ()
+            paths[span["spanId"]] = prefix + (span["name"],)
+        return paths[span["spanId"]]
+
+    durations = defaultdict(list)  # Insertion order is first appearance
+    for span in sorted(spans, key=lambda s: s["startTimeUnixNano"]):
+        duration_ms = (span["endTimeUnixNano"] - span["startTimeUnixNano"]) / 1e6
+        durations[path_of(span)].append(duration_ms)
+
+    # Children under their parent, in the order the pipeline runs them
+    order = {path: i for i, path in enumerate(durations)}
+    rows = []
+    for path in sorted(durations, key=lambda p: tuple(order.get(p[:i], -1) for i in range(1, len(p) + 1))):
+        total = sum(durations[path])
+        parent_total = sum(durations.get(path[:-1], [])) if len(path) > 1 else 0
+        rows.append((path, durations[path], total / parent_total if parent_total else None))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a trace file into a latency breakdown table")
+    parser.add_argument("trace_file", nargs="?", default=settings.TRACE_FILE)
+    parser.add_argument("--trace-id", help="Only spans of this trace (e.g. one voice session)")
+    args = parser.parse_args()
+
+    spans = []
+    with open(args.trace_file, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                if args.trace_id is None or span["traceId"] == args.trace_id:
+                    spans.append(span)
+    if not spans:
+        print("No spans found")
+        raise SystemExit(1)
+
+    traces = len({span["traceId"] for span in spans})
+    errors = sum(1 for span in spans if span["status"]["code"] == "ERROR")
+    print(f"{len(spans)} spans in {traces} trace(s), {errors} with errors\n")
+    print(f"{'span':<36}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'of parent':>11}")
+    for path, durations, share in summarize(spans):
+        name = "  " * (len(path) - 1) + path[-1]
+        share_text = f"{share:.0%}" if share is not None else ""
+        print(f"{name:<36}{len(durations):>7}{_percentile(durations, 0.5):>10.1f}"
+              f"{_percentile(durations, 0.95):>10.1f}{max(durations):>10.1f}{share_text:>11}")
+
+
+if __name__ == "__main__":
+    main()